@@ -0,0 +1,52 @@
+"""
+Worker processes for drawing in parallel.
+
+PyQt holds the GIL while painting, so drawing in several threads doesn't use more CPU cores. Processes are used
+instead. They are started with the "spawn" method (forking a process which runs a Qt event loop in another thread
+is not safe), and are reused, so only the first call pays for starting them.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+__all__ = ['get_executor', 'shutdown_executors']
+
+_executors = {}
+_lock = threading.Lock()
+_app = None  # the QGuiApplication of a worker process
+
+
+def get_executor(workers: int) -> ProcessPoolExecutor:
+    """
+    Get the (shared) pool with the specified number of worker processes.
+
+    :param workers: the number of the worker processes
+    :return: the pool
+    """
+    with _lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                           initializer=_init_worker)
+            _executors[workers] = executor
+        return executor
+
+
+def shutdown_executors():
+    """
+    Stop all the worker processes.
+    """
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown()
+
+
+def _init_worker():
+    """ prepare Qt in a worker process. Fonts can't be used without a QGuiApplication. """
+    global _app
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5 import QtGui
+    _app = QtGui.QGuiApplication([])
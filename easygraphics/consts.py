@@ -272,6 +272,33 @@ class FillRule:
     """Specifies that the region is filled using the non zero winding rule. """
 
 
+class FloodFillMode:
+    """
+    These are the flood fill modes.
+    """
+    BORDER = 0
+    """Fill the area around the start point, until reaching the border color."""
+    SURFACE = 1
+    """Fill the area around the start point, which has the same color with the surface color."""
+
+
+class ImageFormat:
+    """
+    These are the pixel formats of the images.
+    """
+    ARGB32_PREMULTIPLIED = QtGui.QImage.Format_ARGB32_Premultiplied
+    """32 bit ARGB, premultiplied by alpha. Supports transparency. It's the default format."""
+    RGB32 = QtGui.QImage.Format_RGB32
+    """32 bit RGB (0xffRRGGBB). No transparency, faster to draw and to show on the screen."""
+    ARGB32 = QtGui.QImage.Format_ARGB32
+    """32 bit ARGB, not premultiplied. Slower to draw than ARGB32_PREMULTIPLIED."""
+    RGB16 = QtGui.QImage.Format_RGB16
+    """16 bit RGB (5-6-5). No transparency, uses half of the memory."""
+    GRAYSCALE8 = QtGui.QImage.Format_Grayscale8
+    """8 bit grayscale. No colors and transparency, uses a quarter of the memory."""
+    Values = (ARGB32_PREMULTIPLIED, RGB32, ARGB32, RGB16, GRAYSCALE8)
+
+
 class ShapeMode:
     """
     This flag controls how shapes will be drawn. The framework's default value is RADIUS.
@@ -1,5 +1,6 @@
 import ctypes
 import math
+import os
 import sys
 import threading
 import time
@@ -7,19 +8,22 @@ from functools import reduce
 from typing import List, Optional, Callable
 
 import apng
+import numpy as np
 import qimage2ndarray as q2n
 from PyQt5 import QtWidgets
 
-from ._utils import invoke_in_app_thread
+from ._utils import invoke_in_app_thread, process_pool
 from .consts import *
 from .graphwin import GraphWin, KeyMessage, MouseMessage
-from .image import Image
+from .image import Image, DisplayList, TiledImage, ImagePool, TextLayoutCache, _cached_color, _to_qcolor, \
+    _text_layout_cache
+from .recorder import APNGRecorder, GIFRecorder, FrameSink, _FrameRecorder
 from .utils3d import *
 
 __all__ = [
     # consts
     'Color', 'FillStyle', 'LineStyle', 'RenderMode', 'CompositionMode', 'TextFlags',
-    'MouseMessageType', 'FillRule', 'ShapeMode', 'VertexType',
+    'MouseMessageType', 'FillRule', 'FloodFillMode', 'ImageFormat', 'ShapeMode', 'VertexType',
     #  setting functions #
     'set_line_style', 'get_line_style', 'set_line_width', 'get_line_width',
     'get_color', 'set_color', 'get_fill_color', 'set_fill_color', 'get_fill_style', 'set_fill_style',
@@ -31,22 +35,25 @@ __all__ = [
     'reflect', 'flip', 'mirror', 'reset_transform', 'save_settings', 'restore_settings',
     'get_width', 'get_height', 'get_write_mode', 'set_write_mode', 'get_transform', 'set_transform',
     'push_transform', 'pop_transform', 'set_rect_mode', 'get_rect_mode', 'set_ellipse_mode', 'get_ellipse_mode',
-    'set_antialiasing',
+    'set_antialiasing', 'batch_draw',
     # drawing functions #
-    'draw_point', 'put_pixel', 'get_pixel', 'line', 'draw_line', 'move_to', 'move_rel', 'line_to', 'line_rel',
-    'circle', 'draw_circle', 'fill_circle', 'ellipse', 'draw_ellipse', 'fill_ellipse',
+    'draw_point', 'draw_points', 'put_pixel', 'get_pixel', 'pixels', 'to_ndarray', 'line', 'draw_line', 'move_to', 'move_rel', 'line_to', 'line_rel',
+    'circle', 'draw_circle', 'fill_circle', 'fill_circles', 'ellipse', 'draw_ellipse', 'fill_ellipse',
     'arc', 'draw_arc', 'pie', 'draw_pie', 'fill_pie', 'chord', 'draw_chord', 'fill_chord',
     'bezier', 'draw_bezier', 'lines', 'draw_lines', 'poly_line', 'draw_poly_line', 'polygon', 'draw_polygon',
-    'fill_polygon', 'rect', 'draw_rect', 'fill_rect', 'rounded_rect', 'draw_rounded_rect', 'fill_rounded_rect',
+    'fill_polygon', 'rect', 'draw_rect', 'fill_rect', 'fill_rects', 'rounded_rect', 'draw_rounded_rect', 'fill_rounded_rect',
     'flood_fill', 'draw_image', 'clear_device', 'clear_view_port',
     'quadratic', 'draw_quadratic', 'fill_image', 'clear', 'draw_curve', 'curve',
     'begin_shape', 'end_shape', 'vertex', 'bezier_vertex', 'quadratic_vertex', 'curve_vertex',
     'bezier_point','bezier_tangent','curve_point','curve_tangent',
     # text functions #
-    'draw_text', 'draw_rect_text', 'text_width', 'text_height',
+    'draw_text', 'draw_rect_text', 'draw_text_grid', 'text_width', 'text_height', 'get_text_layout_cache',
     # image functions #
-    'set_target', 'get_target', 'create_image','create_image_from_ndarray', 'save_image', 'close_image', 'load_image', 'put_image',
-    "create_image_from_file",'capture_screen', 'get_image',
+    'set_target', 'get_target', 'create_image', 'create_tiled_image', 'create_shared_image', 'create_image_from_buffer',
+    'acquire_image', 'release_image', 'get_image_pool',
+    'create_image_from_ndarray', 'save_image', 'save_image_async', 'close_image', 'load_image', 'put_image',
+    "create_image_from_file",'capture_screen', 'get_image', 'draw_sprites', 'record_display_list', 'draw_display_list',
+    'render_parallel', 'render_frames',
     # time control functions#
     'pause', 'delay', 'delay_fps', 'delay_jfps', 'is_run',
     # keyboard and mouse functions #
@@ -56,13 +63,13 @@ __all__ = [
     # init and close graph window #
     'init_graph', 'close_graph', 'set_caption', 'get_graphics_window', 'show_image',
     # animation
-    'begin_recording', 'save_recording', 'add_record', 'end_recording',
+    'begin_recording', 'save_recording', 'add_record', 'end_recording', 'open_frame_sink',
     # utility functions #
     'color_gray', 'color_rgb', 'color_cmyk', 'color_hsv', 'color_hsl','rgb', 'to_alpha', 'pol2cart', 'cart2pol',
     # utility functions for 3d
     'ortho_look_at', 'isometric_projection', 'cart2sphere', 'sphere2cart',
     # 'GraphWin',
-    'Image',
+    'Image', 'DisplayList', 'TiledImage', 'ImagePool', 'TextLayoutCache', 'APNGRecorder', 'GIFRecorder', 'FrameSink',
     # Easy run mode
     "easy_run","in_easy_run_mode", "register_for_clean_up",
 ]
@@ -85,6 +92,7 @@ _headless_mode = False # if easygraphics is working in headless mode
 _easy_run_mode = False # if easygraphics is working in easy_run mode (the default mode)
 
 _created_images = []
+_image_pool = ImagePool()
 _target_image = None
 _animation = None
 _start_event = None
@@ -825,6 +833,28 @@ def get_render_mode():
 
 # drawings
 
+def batch_draw(image: Image = None):
+    """
+    Draw in a batch on the specified image.
+
+    It\'s a context manager. The drawings in the batch won\'t cause the graphics window (or other
+    listeners) to update. They are updated once when the batch ends. Batches can be nested.
+
+    >>> from easygraphics import *
+    >>> init_graph(600,400)
+    >>> with batch_draw():
+    >>>     for i in range(100):
+    >>>         draw_line(0, i * 4, 600, i * 4)
+    >>> pause()
+    >>> close_graph()
+
+    :param image: the target image which will be painted on. None means it is the target image
+        (see set_target() and get_target()).
+    """
+    image = _get_target_image(image)
+    return image.batch()
+
+
 def draw_point(x: float, y: float, image: Image = None):
     """
     Draw a point at (x,y) on the specified image.
@@ -838,6 +868,27 @@ def draw_point(x: float, y: float, image: Image = None):
     image.draw_point(x, y)
 
 
+def draw_points(xy, image: Image = None):
+    """
+    Draw many points in one batch.
+
+    "xy" is a Nx2 array (i.e. a numpy ndarray), each row of which is the (x,y) coordinate of a point.
+
+    >>> from easygraphics import *
+    >>> import numpy as np
+    >>> init_graph(600,400)
+    >>> draw_points(np.random.rand(1000, 2) * (600, 400))
+    >>> pause()
+    >>> close_graph()
+
+    :param xy: Nx2 array of the points' coordinates
+    :param image: the target image which will be painted on. None means it is the target image
+        (see set_target() and get_target()).
+    """
+    image = _get_target_image(image)
+    image.draw_points(xy)
+
+
 def put_pixel(x: int, y: int, color, image: Image = None):
     """
     Set a pixel\'s color on the specified image.
@@ -866,6 +917,50 @@ def get_pixel(x: int, y: int, image: Image = None) -> QtGui.QColor:
     return image.get_pixel(x, y)
 
 
+def pixels(x: int = 0, y: int = 0, width: int = -1, height: int = -1, channels: bool = False, image: Image = None):
+    """
+    Access the pixels of the specified image directly as a writable numpy array.
+
+    It\'s a context manager. The array is a view of the image\'s buffer, so the changes on it are done
+    on the image. When the with block ends, the area is marked as drawn and the image is updated once.
+    See Image.pixels() for the layout of the array.
+
+    >>> from easygraphics import *
+    >>> import numpy as np
+    >>> init_graph(600,400)
+    >>> with pixels() as arr:
+    >>>     arr[:, :] = 0xff000000 | (np.arange(600, dtype=np.uint32) % 256)
+    >>> pause()
+    >>> close_graph()
+
+    :param x: left of the area
+    :param y: top of the area
+    :param width: width of the area. -1 means to the right border of the image
+    :param height: height of the area. -1 means to the bottom border of the image
+    :param channels: True to get a (height, width, 4) uint8 array, False to get a (height, width) uint32 array
+    :param image: the target image which will be painted on. None means it is the target image
+        (see set_target() and get_target()).
+    """
+    image = _get_target_image(image)
+    return image.pixels(x, y, width, height, channels)
+
+
+def to_ndarray(copy: bool = True, channels: bool = False, image: Image = None):
+    """
+    Get the pixels of the specified image as a numpy array.
+
+    See Image.to_ndarray().
+
+    :param copy: True to get a copy of the pixels, False to get a read-only view
+    :param channels: True to get a (height, width, 4) uint8 array, False to get a (height, width) uint32 array
+    :param image: the target image. None means it is the target image
+        (see set_target() and get_target()).
+    :return: the pixels array
+    """
+    image = _get_target_image(image)
+    return image.to_ndarray(copy, channels)
+
+
 def draw_line(x1, y1, x2, y2, image: Image = None):
     """
     Draw a line from (x1,y1) to (x2,y2) on the specified image.
@@ -1002,6 +1097,33 @@ def fill_circle(x: float, y: float, r: float, image: Image = None):
     image.set_ellipse_mode(old_mode)
 
 
+def fill_circles(xy, r, colors=None, image: Image = None):
+    """
+    Fill many circles in one batch.
+
+    The circles don\'t have outline.
+
+    "xy" is a Nx2 array (i.e. a numpy ndarray) of the circles\' centers. "r" is the radius of
+    all circles, or an array of N radiuses. "colors" is None (use the fill color), a color, a list
+    of N colors, or an ndarray of N ARGB values (as returned by QColor.rgba()).
+
+    >>> from easygraphics import *
+    >>> import numpy as np
+    >>> init_graph(600,400)
+    >>> fill_circles(np.random.rand(100, 2) * (600, 400), 10, [Color.RED, Color.BLUE] * 50)
+    >>> pause()
+    >>> close_graph()
+
+    :param xy: Nx2 array of the circles\' centers
+    :param r: radius (or N radiuses) of the circles
+    :param colors: fill colors of the circles
+    :param image: the target image which will be painted on. None means it is the target image
+        (see set_target() and get_target()).
+    """
+    image = _get_target_image(image)
+    image.fill_circles(xy, r, colors)
+
+
 def ellipse(x, y, radius_x, radius_y, image: Image = None):
     """
     Draw an ellipse outline centered at (x,y) , radius on x-axis is radius_x, radius on y-axis is radius_y.
@@ -1302,6 +1424,9 @@ def draw_lines(*points, image: Image = None):
     For examples , if points is [50,50,550,350, 50,150,550,450, 50,250,550,550], draw_lines() will draw 3 lines:
     (50,50) to (550,350), (50,150) to (550,450), (50,250) to (550,550)
 
+    "points" can also be a single Nx4 array (i.e. a numpy ndarray), each row of which is a line
+    (x1,y1,x2,y2). It\'s the fastest way to draw many lines.
+
     >>> from easygraphics import *
     >>> init_graph(600,600)
     >>> draw_lines(50, 50, 550, 350, 50, 150, 550, 450, 50, 250, 550, 550)
@@ -1480,6 +1605,26 @@ def fill_rect(left: float, top: float, right: float, bottom: float, image: Image
     image.fill_rect(left, top, right, bottom)
 
 
+def fill_rects(rects, colors=None, image: Image = None):
+    """
+    Fill many rectangles in one batch.
+
+    The rectangles don\'t have outline.
+
+    "rects" is a Nx4 array (i.e. a numpy ndarray), each row of which is a rectangle. The meaning of the 4
+    values is decided by the rect mode (see set_rect_mode()). In the default mode (ShapeMode.CORNERS),
+    they are (left, top, right, bottom). "colors" is None (use the fill color), a color, a list of N colors,
+    or an ndarray of N ARGB values (as returned by QColor.rgba()).
+
+    :param rects: Nx4 array of the rectangles
+    :param colors: fill colors of the rectangles
+    :param image: the target image which will be painted on. None means it is the target image
+        (see set_target() and get_target()).
+    """
+    image = _get_target_image(image)
+    image.fill_rects(rects, colors)
+
+
 def rounded_rect(left: float, top: float, right: float, bottom: float, round_x: float, round_y: float,
                  image: Image = None):
     """
@@ -1544,20 +1689,26 @@ def fill_rounded_rect(left: float, top: float, right: float, bottom: float, roun
     image.fill_rounded_rect(left, top, right, bottom, round_x, round_y)
 
 
-def flood_fill(x: int, y: int, border_color, image: Image = None):
+def flood_fill(x: int, y: int, border_color, image: Image = None, tolerance: int = 0, mode=FloodFillMode.BORDER):
     """
     Flood fill the image starting from(x,y) and ending at borders with border_color.
 
     The fill region border must be closed,or the whole image will be filled!
 
+    If mode is FloodFillMode.SURFACE, the connected area around (x,y) whose color is border_color
+    is filled instead. In this mode border_color can be None, which means the color of the
+    start point.
+
     :param x: x coordinate value of the start point
     :param y: y coordinate value of the start point
-    :param border_color: color of the fill region border
+    :param border_color: color of the fill region border (or the surface color in SURFACE mode)
     :param image: the target image which will be painted on. None means it is the target image
         (see set_target() and get_target()).
+    :param tolerance: max difference (0-255) of the color channels when comparing colors
+    :param mode: the fill mode. See FloodFillMode consts.
     """
     image = _get_target_image(image)
-    image.flood_fill(x, y, border_color)
+    image.flood_fill(x, y, border_color, tolerance, mode)
 
 
 def draw_image(x: int, y: int, src_image: Image, width:int=0, height:int=0, src_x: int = 0, src_y: int = 0, src_width: int = -1,
@@ -1600,6 +1751,220 @@ def draw_image(x: int, y: int, src_image: Image, width:int=0, height:int=0, src_
 
 put_image = draw_image
 
+
+def draw_sprites(atlas: Image, src_rects, dst_positions, rotations=None, scales=None, opacities=None,
+                 with_background=True, dst_image: Image = None):
+    """
+    Draw many parts (sprites) of the atlas image to the destination image (dst_image) with one call.
+
+    It\'s much faster than calling draw_image() for each sprite. See Image.draw_sprites().
+
+    >>> from easygraphics import *
+    >>> import numpy as np
+    >>> init_graph(600,400)
+    >>> atlas = create_image(32, 16)
+    >>> set_fill_color(Color.RED, atlas)
+    >>> fill_rect(0, 0, 15, 15, atlas)
+    >>> positions = np.random.rand(100, 2) * (584, 384)
+    >>> draw_sprites(atlas, [0, 0, 16, 16], positions, rotations=np.random.rand(100) * 360)
+    >>> pause()
+    >>> close_graph()
+
+    :param atlas: the image containing the sprites
+    :param src_rects: Nx4 array of the sprites\' rects (x, y, width, height) in the atlas, or one rect for all
+    :param dst_positions: Nx2 array of the top-left points of the sprites on the destination image
+    :param rotations: rotation angles (in degrees, clockwise) of the sprites. None means no rotation.
+    :param scales: scale factors of the sprites. It can be a N array, or a Nx2 array of (x, y) scales.
+        None means no scale.
+    :param opacities: opacities (0-1) of the sprites. None means fully opaque.
+    :param with_background: if the atlas\'s background should be drawn.
+    :param dst_image: the target image which will be painted on. None means it is the target image
+        (see set_target() and get_target()).
+    """
+    dst_image = _get_target_image(dst_image)
+    dst_image.draw_sprites(atlas, src_rects, dst_positions, rotations, scales, opacities, with_background)
+
+
+def render_parallel(draw_fn, tiles=(2, 2), workers: int = 2, image: Image = None):
+    """
+    Draw the specified image with several processes.
+
+    The image is split into tiles, and draw_fn(tile_image, tile_rect) is called for each tile in worker processes.
+    draw_fn should draw the scene (in the image\'s pixel coordinates) on the tile image it gets, and only on it.
+    The workers are started with the "spawn" method, so draw_fn must be picklable (a module level function, not a
+    lambda or a nested function), and the main script must be guarded by "if __name__ == \'__main__\':", because
+    each worker imports it again. See Image.render_parallel().
+
+    >>> from easygraphics import *
+    >>> def draw(tile, rect):
+    >>>     for i in range(0, 800, 4):
+    >>>         tile.draw_line(i, 0, 800 - i, 600)
+    >>> if __name__ == "__main__":
+    >>>     init_graph(800, 600)
+    >>>     render_parallel(draw, tiles=(4, 2))
+    >>>     pause()
+    >>>     close_graph()
+
+    :param draw_fn: the function to draw a tile
+    :param tiles: the number of the tiles in columns and rows
+    :param workers: the number of the worker processes. If it's 1, the tiles are drawn in this process.
+    :param image: the target image which will be painted on. None means it is the target image
+        (see set_target() and get_target()).
+    """
+    image = _get_target_image(image)
+    image.render_parallel(draw_fn, tiles, workers)
+
+
+def render_frames(frame_fn, frame_count: int, width: int, height: int, processes: int = None, output=None,
+                  track_background: bool = True, format=ImageFormat.ARGB32_PREMULTIPLIED):
+    """
+    Render frames with several headless worker processes.
+
+    frame_fn(i) is called for each frame i (0 to frame_count-1) in a worker process, to draw the frame on the
+    worker\'s target image (with the drawing functions, like in headless mode). Each frame begins with a white
+    image and the default drawing settings.
+
+    The frames are returned in order. The output can be:
+
+    * **None** (default): a list of the frames\' PNG bytes.
+    * **a file name pattern** (e.g. "frames/{:05d}.png"): each frame is saved by the worker to the file
+      pattern.format(i), and the list of the file names is returned.
+    * **"ndarray"**: the frames are written to shared memory by the workers, and returned as a numpy array
+      of shape (frame_count, height, width). Its elements are the pixel values (see to_ndarray()).
+
+    The worker processes are started with the "spawn" method, and each of them imports the main script again,
+    so frame_fn must be importable at module level (a module level function, not a lambda or a nested function),
+    and the main script must be guarded by "if __name__ == \'__main__\':". The worker processes are started
+    once and reused by later calls.
+
+    >>> from easygraphics import *
+    >>> def draw_frame(i):
+    >>>     set_fill_color(Color.RED)
+    >>>     fill_circle(10 + i * 5, 100, 20)
+    >>> if __name__ == "__main__":
+    >>>     render_frames(draw_frame, 100, 640, 200, output="frames/{:03d}.png")
+
+    :param frame_fn: the function to draw a frame
+    :param frame_count: the number of the frames
+    :param width: width of the frames
+    :param height: height of the frames
+    :param processes: the number of the worker processes. None means the number of the CPU cores.
+    :param output: how to return the frames (see above)
+    :param track_background: if the frame images should track their background
+    :param format: the pixel format of the frame images
+    :return: the frames
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    block = None
+    dtype = None
+    if output is None:
+        spec = ("png", None)
+    elif output == "ndarray":
+        from multiprocessing import shared_memory
+        dtype = {8: np.uint8, 16: np.uint16, 32: np.uint32}[QtGui.QImage.toPixelFormat(format).bitsPerPixel()]
+        block = shared_memory.SharedMemory(create=True,
+                                           size=max(1, frame_count * width * height * np.dtype(dtype).itemsize))
+        spec = ("ndarray", block.name)
+    else:
+        spec = ("file", output)
+    try:
+        executor = process_pool.get_executor(processes)
+        args = (frame_fn, width, height, track_background, format, spec)
+        chunk_size = max(1, frame_count // (processes * 4))
+        results = list(executor.map(_render_frame_in_worker, [args] * frame_count, range(frame_count),
+                                    chunksize=chunk_size))
+        if block is not None:
+            results = np.frombuffer(block.buf, dtype=dtype, count=frame_count * width * height).reshape(
+                frame_count, height, width).copy()  # the block is released below
+        return results
+    finally:
+        if block is not None:
+            block.close()
+            block.unlink()
+
+
+_frame_image = None  # the target image of a render_frames() worker process
+
+
+def _render_frame_in_worker(args, index: int):
+    """ draw the frame of render_frames() in a worker process """
+    global _frame_image, _target_image, _headless_mode, _is_run
+    frame_fn, width, height, track_background, format, (kind, target) = args
+    image = _frame_image
+    if image is not None and (image.get_width(), image.get_height(), image.is_tracking_background(),
+                              image.get_image().format()) == (width, height, track_background, format):
+        image._recycle()
+    else:
+        if image is not None:
+            image.close()
+        image = Image.create(width, height, track_background, format)
+        _frame_image = image
+    _headless_mode = True
+    _is_run = True
+    _target_image = image
+    frame_fn(index)
+    if kind == "png":
+        return image.to_bytes()
+    if kind == "file":
+        filename = target.format(index)
+        image.save(filename)
+        return filename
+    from multiprocessing import shared_memory
+    block = shared_memory.SharedMemory(target)
+    try:
+        pixels = image.to_ndarray(copy=False)
+        frame = np.frombuffer(block.buf, dtype=pixels.dtype, count=pixels.size, offset=index * pixels.nbytes)
+        frame.reshape(pixels.shape)[:] = pixels
+        del frame  # release the buffer before closing the block
+    finally:
+        block.close()
+    return None
+
+
+def record_display_list(image: Image = None):
+    """
+    Record the drawings on the specified image to a display list.
+
+    It\'s a context manager which returns the display list. The drawings in the with block are not drawn
+    on the image, but recorded. Use draw_display_list() to draw them many times, with a single call.
+    See Image.record_display_list().
+
+    >>> from easygraphics import *
+    >>> init_graph(600,400)
+    >>> with record_display_list() as grid:
+    >>>     for i in range(0, 600, 20):
+    >>>         draw_line(i, 0, i, 400)
+    >>> for i in range(100):
+    >>>     clear()
+    >>>     draw_display_list(grid)
+    >>>     fill_circle(i * 5, 200, 20)
+    >>>     delay(50)
+    >>> close_graph()
+
+    :param image: the target image whose drawings will be recorded. None means it is the target image
+        (see set_target() and get_target()).
+    """
+    image = _get_target_image(image)
+    return image.record_display_list()
+
+
+def draw_display_list(display_list: DisplayList, transform: QtGui.QTransform = None, image: Image = None):
+    """
+    Draw (replay) the display list on the specified image.
+
+    The image\'s current transform is not used. The display list is drawn as it was recorded, then transformed
+    by the transform (in device coordinates).
+
+    :param display_list: the display list to draw
+    :param transform: the transform applied to the display list. None means no transform.
+    :param image: the target image which will be painted on. None means it is the target image
+        (see set_target() and get_target()).
+    """
+    image = _get_target_image(image)
+    image.draw_display_list(display_list, transform)
+
+
 def capture_screen(left: int, top: int, width: int, height: int, target_img: Image):
     """
     Capture specified region on the graphics windows to target image.
@@ -1853,6 +2218,31 @@ def draw_rect_text(x: int, y: int, width: int, height: int, *args, flags=QtCore.
     image.draw_rect_text(x, y, width, height, flags, *args, sep=sep)
 
 
+def draw_text_grid(chars, fg_colors=None, bg_colors=None, origin=(0, 0), cell_size=None, font: QtGui.QFont = None,
+                   image: Image = None):
+    """
+    Draw a grid of characters (like a text terminal) with one call.
+
+    It's much faster than calling draw_text() for each character. See Image.draw_text_grid().
+
+    >>> chars = np.random.randint(65, 91, (30, 80))
+    >>> draw_text_grid(chars, fg_colors=Color.GREEN, bg_colors=Color.BLACK)
+
+    :param chars: (rows, columns) array of the characters' code points (or of single-character strings)
+    :param fg_colors: colors of the characters: a color, or an ndarray of ARGB values of the grid's shape.
+        None means the foreground color.
+    :param bg_colors: background colors of the cells: a color, or an ndarray of ARGB values of the grid's shape.
+        None means the cells' backgrounds are not drawn.
+    :param origin: (x, y) of the grid's upper left corner
+    :param cell_size: (width, height) of the cells. None means the width of "M" and the height of the font.
+    :param font: the font. None means the font of the image.
+    :param image: the target image which will be painted on. None means it is the target image
+        (see set_target() and get_target()).
+    """
+    image = _get_target_image(image)
+    image.draw_text_grid(chars, fg_colors, bg_colors, origin, cell_size, font)
+
+
 def text_width(text: str, image: Image = None) -> int:
     """
     Return width of the text.
@@ -1878,6 +2268,18 @@ def text_height(image: Image = None) -> int:
     return image.text_height()
 
 
+def get_text_layout_cache() -> TextLayoutCache:
+    """
+    Get the cache of the text layouts used by draw_text() and draw_rect_text().
+
+    Use its get_hits() and get_misses() to check if the texts drawn are found in the cache, and set_max_size()
+    to keep more layouts when many different texts are drawn again and again.
+
+    :return: the cache
+    """
+    return _text_layout_cache
+
+
 # image processing #
 def set_target(image: Image = None):
     """
@@ -1904,15 +2306,120 @@ def get_target() -> Optional[Image]:
     return _target_image
 
 
-def create_image(width, height) -> Image:
+def create_image(width, height, track_background: bool = True, format=ImageFormat.ARGB32_PREMULTIPLIED) -> Image:
     """
     Create a new image.
 
+    If track_background is False, the image won\'t have a background mask. Drawing on it is faster
+    and it uses less memory, but set_background_color() and copying/saving it without
+    background can\'t be used.
+
+    The format is the pixel format of the image (see ImageFormat consts). Use RGB32 for opaque
+    images, or RGB16/GRAYSCALE8 to save memory.
+
+    :param width: width of the new image
+    :param height: height of the new image
+    :param track_background: if the image should track its background
+    :param format: the pixel format of the image
+    :return: the created image
+    """
+    return Image.create(width, height, track_background, format)
+
+def create_tiled_image(width, height, tile_size: int = 1024, track_background: bool = True) -> TiledImage:
+    """
+    Create a new tiled image.
+
+    A tiled image is split into tiles, which are created only when something is drawn on them, so
+    very large images (posters, maps, etc.) can be drawn without allocating the whole buffer. It has
+    the same drawing functions as Image, and can be used as the target image (see set_target()).
+    See TiledImage for more information.
+
+    >>> from easygraphics import *
+    >>> init_graph(headless=True)
+    >>> poster = create_tiled_image(20000, 20000)
+    >>> set_target(poster)
+    >>> fill_circle(10000, 10000, 5000)
+    >>> poster.save("poster.png")
+    >>> close_graph()
+
     :param width: width of the new image
     :param height: height of the new image
+    :param tile_size: width and height of the tiles
+    :param track_background: if the image should track its background
+    :return: the created image
+    """
+    return TiledImage(width, height, tile_size, track_background)
+
+
+def create_shared_image(width, height, name: str = None, track_background: bool = True) -> Image:
+    """
+    Create an image whose pixels are stored in a shared memory block, so several processes can draw
+    on it and read it without copying.
+
+    If name is None or no block has this name, a new block is created. Otherwise the existing block is
+    attached. See Image.create_shared().
+
+    :param width: width of the image
+    :param height: height of the image
+    :param name: name of the shared memory block (see Image.get_shared_name())
+    :param track_background: if the image should track its background
+    :return: the created image
+    """
+    return Image.create_shared(width, height, name, track_background)
+
+
+def create_image_from_buffer(buffer, width, height, format=ImageFormat.ARGB32_PREMULTIPLIED,
+                             bytes_per_line: int = None, track_background: bool = True) -> Image:
+    """
+    Create an image which uses the (writable) buffer (a bytearray, numpy array, np.memmap, etc.) to store
+    its pixels, without copying. See Image.from_buffer().
+
+    :param buffer: the buffer
+    :param width: width of the image
+    :param height: height of the image
+    :param format: the pixel format (QImage.Format) of the buffer
+    :param bytes_per_line: bytes of each line in the buffer. None means the lines are not padded.
+    :param track_background: if the image should track its background
     :return: the created image
     """
-    return Image.create(width, height)
+    return Image.from_buffer(buffer, width, height, format, bytes_per_line, track_background)
+
+
+def acquire_image(width, height, track_background: bool = True, format=ImageFormat.ARGB32_PREMULTIPLIED) -> Image:
+    """
+    Get a (white) image from the image pool, or create a new one if there is no idle image of this size and format.
+
+    Use it for temporary images, and put them back with release_image() when they are not used anymore.
+    See ImagePool.
+
+    :param width: width of the image
+    :param height: height of the image
+    :param track_background: if the image should track its background
+    :param format: the pixel format of the image
+    :return: the image
+    """
+    return _image_pool.acquire(width, height, track_background, format)
+
+
+def release_image(image: Image):
+    """
+    Put the image (got by acquire_image()) back to the image pool. Don't use the image after it's released.
+
+    :param image: the image
+    """
+    _image_pool.release(image)
+
+
+def get_image_pool() -> ImagePool:
+    """
+    Get the image pool used by acquire_image() and release_image().
+
+    Use ImagePool.set_max_bytes() to change the max memory used by its idle images.
+
+    :return: the image pool
+    """
+    return _image_pool
+
 
 def create_image_from_ndarray(array) -> Image:
     """
@@ -1939,7 +2446,7 @@ def load_image(filename: str) -> Image:
     return Image.create_from_file(filename)
 
 
-def save_image(filename: str, with_background=True, image: Image = None):
+def save_image(filename: str, with_background=True, image: Image = None, format: str = None, quality: int = -1):
     """
     Save image to file.
 
@@ -1951,9 +2458,33 @@ def save_image(filename: str, with_background=True, image: Image = None):
     :param with_background: True to save the background together. False not
     :param image: the target image which will be saved. None means it is the target image
         (see set_target() and get_target()).
+    :param format: format of the file (e.g. "PNG", "JPG"). None means to guess it from the file name.
+    :param quality: quality (0-100) of the saved image. For PNG files it\'s the compression level
+        (0 is the smallest file). -1 means the default.
     """
     image = _get_target_image(image)
-    image.save(filename, with_background)
+    image.save(filename, with_background, format, quality)
+
+
+def save_image_async(filename: str, with_background=True, format: str = None, quality: int = -1,
+                     image: Image = None):
+    """
+    Save image to file in the background, so drawing is not blocked. See Image.save_async().
+
+    >>> future = save_image_async("frame.png")
+    >>> ... # continue drawing
+    >>> future.result()  # wait until it\'s saved
+
+    :param filename: path of the file
+    :param with_background: True to save the background together. False not
+    :param format: format of the file (e.g. "PNG", "JPG"). None means to guess it from the file name.
+    :param quality: quality (0-100) of the saved image. -1 means the default. (see save_image())
+    :param image: the target image which will be saved. None means it is the target image
+        (see set_target() and get_target()).
+    :return: a future whose result is the file name
+    """
+    image = _get_target_image(image)
+    return image.save_async(filename, with_background, format, quality)
 
 
 def show_image(image: Image = None):
@@ -1978,24 +2509,28 @@ def color_gray(gray: int, alpha: int = 255) -> QtGui.QColor:
     """
     Create a gray color.
 
+    The color is cached and shared, don't change it (see color_rgb()).
+
     :param gray: gray value
     :param alpha: alpha channel value of the color. 255 means fully opaque
     :return: the color
     """
-    return QtGui.QColor(gray, gray, gray, alpha)
+    return _cached_color(QtGui.QColor, gray, gray, gray, alpha)
 
 
 def color_rgb(red: int, green: int, blue: int, alpha: int = 255) -> QtGui.QColor:
     """
     Create a color with RGB color values r,g,b.
 
+    The color is cached and shared with the other callers, so don't change it (copy it with QColor() first).
+
     :param red: red value
     :param green: green value
     :param blue: blue value
     :param alpha: alpha channel value of the color. 255 means fully opaque
     :return: the color
     """
-    return QtGui.QColor(red, green, blue, alpha)
+    return _cached_color(QtGui.QColor, red, green, blue, alpha)
 
 
 rgb = color_rgb
@@ -2006,6 +2541,8 @@ def color_cmyk(c: int, m: int, y: int, k: int, alpha: int = 255) -> QtGui.QColor
     """
     Create a color with CMYK color values c,m,y,k.
 
+    The color is cached and shared, don't change it (see color_rgb()).
+
     :param c: cyan value
     :param m: magenta value
     :param y: yellow value
@@ -2013,49 +2550,58 @@ def color_cmyk(c: int, m: int, y: int, k: int, alpha: int = 255) -> QtGui.QColor
     :param alpha: alpha channel value of the color. 255 means fully opaque
     :return: the color
     """
-    return QtGui.QColor.fromCmyk(c, m, y, k, alpha)
+    return _cached_color(QtGui.QColor.fromCmyk, c, m, y, k, alpha)
 
 def color_hsl(h: int, s: int, l: int, alpha: int = 255) -> QtGui.QColor:
     """
     Create a color with HSL color values h,s,l.
 
+    The color is cached and shared, don't change it (see color_rgb()).
+
     :param h: hue value
     :param s: saturation value
     :param l: lightness value
     :param alpha: alpha channel value of the color. 255 means fully opaque
     :return: the color
     """
-    return QtGui.QColor.fromHsl(h, s, l, alpha)
+    return _cached_color(QtGui.QColor.fromHsl, h, s, l, alpha)
 
 
 def color_hsv(h: int, s: int, v: int, alpha: int = 255) -> QtGui.QColor:
     """
     Create a color with HSV color values h,s,v.
 
+    The color is cached and shared, don't change it (see color_rgb()).
+
     :param h: hue value
     :param s: saturation value
     :param v: Value
     :param alpha: alpha channel value of the color. 255 means fully opaque
     :return: the color
     """
-    return QtGui.QColor.fromHsv(h, s, v, alpha)
+    return _cached_color(QtGui.QColor.fromHsv, h, s, v, alpha)
 
 
 def to_alpha(new_color, alpha: int = None) -> QtGui.QColor:
     """
     Get new color based on the given color and alpha.
 
+    The color is cached and shared, don't change it (see color_rgb()).
+
     :param new_color: the base color
     :param alpha:  new color's alpha
     :return: new color with base color and the given alpha value
     """
-    """
-    """
-    new_color = QtGui.QColor(new_color)
-    if not new_color.isValid():
+    base_color = _to_qcolor(new_color)
+    if not base_color.isValid():
         raise ValueError(str(new_color) + " is not a valid color!")
-    new_color.setAlpha(alpha)
-    return new_color
+    return _cached_color(_color_with_alpha, base_color.rgba(), alpha)
+
+
+def _color_with_alpha(rgba: int, alpha: int) -> QtGui.QColor:
+    color = QtGui.QColor.fromRgba(rgba)
+    color.setAlpha(alpha)
+    return color
 
 
 def cart2pol(x, y):
@@ -2366,10 +2912,10 @@ def set_caption(title: str):
 
 
 @invoke_in_app_thread.invoke_in_thread()
-def _init_graph_in_thread(width:int ,height:int,headless:bool):
-    _init_graph(width,height,headless)
+def _init_graph_in_thread(width:int ,height:int,headless:bool,track_background:bool,format):
+    _init_graph(width,height,headless,track_background,format)
 
-def _init_graph(width:int ,height:int,headless:bool):
+def _init_graph(width:int ,height:int,headless:bool,track_background:bool,format):
     """
     Init the graphics context
     """
@@ -2377,9 +2923,9 @@ def _init_graph(width:int ,height:int,headless:bool):
     _is_run = True
     _headless_mode = headless
     if headless:
-        _target_image = create_image(width, height)
+        _target_image = create_image(width, height, track_background, format)
     else:
-        _win = GraphWin(width, height)
+        _win = GraphWin(width, height, track_background, format)
         _target_image = _win.get_canvas()
         _win.show()
         _win.setWindowTitle("Python Easy Graphics")
@@ -2389,7 +2935,8 @@ def _init_graph(width:int ,height:int,headless:bool):
     else:
         _get_target_image = _get_target_image_normal
 
-def init_graph(width: int = 800, height: int = 600, headless: bool = False):
+def init_graph(width: int = 800, height: int = 600, headless: bool = False, track_background: bool = True,
+               format=ImageFormat.ARGB32_PREMULTIPLIED):
     """
     Init the easygraphics system and show the graphics window.
 
@@ -2397,9 +2944,18 @@ def init_graph(width: int = 800, height: int = 600, headless: bool = False):
     there will be no graphics window. Use this mode if you want to draw and
     save image to files.
 
+    If "track_background" is False, the graphics window (or the headless target image)
+    won\'t track its background. Drawing is faster, but set_background_color() and
+    saving without background can\'t be used. (see create_image())
+
+    "format" is the pixel format of the graphics window (or the headless target image).
+    (see ImageFormat consts)
+
     :param width: width of the graphics window (in pixels)
     :param height:  height of the graphics window (in pixels)
     :param headless: True to run in headless mode.
+    :param track_background: False to turn off background tracking.
+    :param format: the pixel format
 
     >>> from easygraphics import *
     >>> init_graph(800,600) #prepare and show a 800*600 window
@@ -2408,7 +2964,7 @@ def init_graph(width: int = 800, height: int = 600, headless: bool = False):
     if _is_run:
         raise RuntimeError("The Graphics Windows is already inited!")
     if _easy_run_mode:
-        _init_graph_in_thread(width,height,headless)
+        _init_graph_in_thread(width,height,headless,track_background,format)
         return
 
     # prepare Events
@@ -2416,7 +2972,7 @@ def init_graph(width: int = 800, height: int = 600, headless: bool = False):
     _start_event.clear()
     # start GUI thread
     _close_event.clear()
-    thread = threading.Thread(target=__graphics_thread_func, args=(width, height, headless))
+    thread = threading.Thread(target=__graphics_thread_func, args=(width, height, headless, track_background, format))
     thread.start()
     # wait GUI initiation finished
     _start_event.wait()
@@ -2439,6 +2995,9 @@ def _cleanup():
     for image in _created_images:
         image.close()
     _created_images.clear()
+    _image_pool.clear()
+    _text_layout_cache.clear()
+    process_pool.shutdown_executors()
     for obj in _for_clean_ups:
         obj.close()
     _for_clean_ups.clear()
@@ -2492,14 +3051,28 @@ def _get_target_image_normal(image: Image) -> Image:
 _get_target_image = _get_target_image_normal
 
 
-def begin_recording():
+def begin_recording(filename: str = None, num_plays: int = 0, max_queue: int = 8):
     """
     Start recording png animation
+
+    If filename is given, the frames are encoded in a background thread and written to the file as they are added
+    (see APNGRecorder), and the animation is finished by end_recording(). If the filename ends with ".gif", the
+    animation is saved as a GIF file (see GIFRecorder). Otherwise the frames are kept in memory until
+    save_recording() is called.
+
+    :param filename: the file to write the animation to. None means keeping the animation in memory.
+    :param num_plays: (only used when filename is given) number of times to play the animation. 0 means infinitely.
+    :param max_queue: (only used when filename is given) max number of the frames waiting to be encoded
     """
     global _animation
     if _animation is not None:
         raise RuntimeError("There is a png in use!")
-    _animation = apng.APNG()
+    if filename is None:
+        _animation = apng.APNG()
+    elif filename.lower().endswith(".gif"):
+        _animation = GIFRecorder(filename, num_plays, max_queue)
+    else:
+        _animation = APNGRecorder(filename, num_plays, max_queue)
 
 
 def add_record(image: Image = None, **options):
@@ -2507,30 +3080,59 @@ def add_record(image: Image = None, **options):
     Add one frame to the recording animation
 
     :param image: the target image whose content will be captured. None means it is the target image (see set_target() and get_target()).
+    :param options: the frame's options, such as delay and delay_den (the frame is shown for delay/delay_den seconds)
     """
     if _animation is None:
         raise RuntimeError("There's no animation in recording!")
     image = _get_target_image(image)
-    _animation.append(apng.PNG.from_bytes(image.to_bytes("PNG")), **options)
+    if isinstance(_animation, _FrameRecorder):
+        _animation.add_frame(image, **options)
+    else:
+        _animation.append(apng.PNG.from_bytes(image.to_bytes()), **options)
 
 
 def save_recording(filename: str):
     """
     Save the recording animation in PNG format.
 
+    Can't be used when the animation is written to a file while recording (see begin_recording()).
+
     :param filename: the filename of the save file.
     """
     if _animation is None:
         raise RuntimeError("There's no animation in recording!")
+    if isinstance(_animation, _FrameRecorder):
+        raise RuntimeError("The animation is written to its file while recording!")
     _animation.save(filename)
 
 
 def end_recording():
     """
     End the recording of the animation.
+
+    If the animation is written to a file while recording, the file is finished.
     """
     global _animation
-    _animation = None
+    animation, _animation = _animation, None
+    if isinstance(animation, _FrameRecorder):
+        animation.close()
+
+
+def open_frame_sink(target, format: str = "y4m", fps: int = 25, fps_den: int = 1) -> FrameSink:
+    """
+    Open a sink to write raw video frames to a file, a pipe or stdout (see FrameSink).
+
+    Use sink.write(image) to write a frame, and sink.close() to close it.
+
+    >>> sink = open_frame_sink(sys.stdout.buffer, "y4m", fps=30)  # python draw.py | ffmpeg -i - out.mp4
+
+    :param target: the file name, the file descriptor, or the (binary) file object to write to
+    :param format: the format of the frames ("y4m", "rgba" or "ppm")
+    :param fps: numerator of the frame rate (only used by y4m)
+    :param fps_den: denominator of the frame rate (only used by y4m)
+    :return: the sink
+    """
+    return FrameSink(target, format, fps, fps_den)
 
 
 def _validate_image(image: Image):
@@ -2546,13 +3148,14 @@ def _validate_image(image: Image):
 
 
 
-def __graphics_thread_func(width: int, height: int, headless=False):
+def __graphics_thread_func(width: int, height: int, headless=False, track_background=True,
+                           format=ImageFormat.ARGB32_PREMULTIPLIED):
     global _app, _win, _target_image, _is_run, _headless_mode
     _headless_mode = headless
     _app = QtWidgets.QApplication([])
     _app.setQuitOnLastWindowClosed(True)
     invoke_in_app_thread.init_invoke_in_app()
-    _init_graph(width,height,headless)
+    _init_graph(width,height,headless,track_background,format)
     _is_run = True
     # init finished, can draw now
     _start_event.set()
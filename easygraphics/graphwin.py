@@ -7,7 +7,7 @@ from PyQt5 import QtCore
 from PyQt5 import QtGui
 
 from easygraphics.image import Image
-from easygraphics.consts import Color, MouseMessageType
+from easygraphics.consts import MouseMessageType, ImageFormat
 
 __all__ = ['GraphWin']
 
@@ -26,12 +26,17 @@ class GraphWin(QtWidgets.QWidget):
     if we are in manual refresh mode (RENDER_MANUAL, self._immediate=False), \
     we use another image object( self._device_image) as an intermediary .\
     The contents on this object is painted to the window  and this object is synced with self._canvas manually
+
+    only the dirty area of the canvas (see Image.get_dirty_rect()) is synced and repainted.
     """
 
-    def __init__(self, width: int, height: int):
+    def __init__(self, width: int, height: int, track_background: bool = True,
+                 format=ImageFormat.ARGB32_PREMULTIPLIED):
         super().__init__(flags=QtCore.Qt.Window | QtCore.Qt.MSWindowsFixedSizeDialogHint)
         self._width = width
         self._height = height
+        self._track_background = track_background
+        self._format = format
         self.setFixedWidth(width)
         self.setFixedHeight(height)
         self._wait_event = threading.Event()
@@ -65,22 +70,22 @@ class GraphWin(QtWidgets.QWidget):
         return self._height
 
     def _init_screen(self, width, height):
-        screen_image = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32_Premultiplied)
-        screen_image.fill(Color.WHITE)
-        self._canvas = Image(screen_image)
-        self._device_image = screen_image.copy()
+        self._canvas = Image.create(width, height, self._track_background, self._format)
+        # the intermediary image has the same format as the canvas, so syncing them is a plain copy
+        self._device_image = self._canvas.get_image().copy()
         self.real_update()
 
     def get_canvas(self):
         return self._canvas
 
     def paintEvent(self, e):
+        rect = e.rect()
         if self._immediate:
-            self._canvas.draw_to_device(self)
+            self._canvas.draw_to_device(self, rect)
         else:
             p = QtGui.QPainter()
             p.begin(self)
-            p.drawImage(0, 0, self._device_image)
+            p.drawImage(rect, self._device_image, rect)
             p.end()
 
     def set_immediate(self, immediate: bool):
@@ -98,16 +103,16 @@ class GraphWin(QtWidgets.QWidget):
         """
         self._immediate = immediate
         if immediate:
-            self._canvas.add_updated_listener(self.update)
+            self._canvas.add_updated_rect_listener(self.update)
         else:
-            self._canvas.remove_updated_listener(self.update)
+            self._canvas.remove_updated_rect_listener(self.update)
 
     def close(self):
         self._key_msg_queue.queue.clear()
         self._key_char_msg_queue.queue.clear()
         self._mouse_msg_queue.queue.clear()
         if self._immediate:
-            self._canvas.remove_updated_listener(self.update)
+            self._canvas.remove_updated_rect_listener(self.update)
         self._is_run = False
         self._wait_event.set()
 
@@ -149,7 +154,8 @@ class GraphWin(QtWidgets.QWidget):
                             QtCore.Qt.ShiftModifier |
                             QtCore.Qt.AltModifier):
                 self._capture_count += 1
-                self._canvas.save(self._capture_dir + os.sep + "save{0}.png".format(self._capture_count))
+                # encoded by the encoder thread, so the GUI thread is not blocked
+                self._canvas.save_async(self._capture_dir + os.sep + "save{0}.png".format(self._capture_count))
         if e.key() < 127 or e.key() == QtCore.Qt.Key_Return:
             # ascii char key pressed
             key_char_msg = _KeyCharMsg(e)
@@ -179,14 +185,21 @@ class GraphWin(QtWidgets.QWidget):
     def is_run(self) -> bool:
         return self._is_run
 
-    def real_update(self):
+    def real_update(self, full: bool = False):
         """
         really update and repaint the window
 
-        the intermediary image (self._device_image) is synced with the canvas
+        the dirty area of the intermediary image (self._device_image) is synced with the canvas
+
+        :param full: True to sync and repaint the whole window
         """
-        self._canvas.draw_to_device(self._device_image)
-        self.update()
+        if full:
+            self._canvas.mark_dirty()
+        rect = self._canvas.take_dirty_rect()
+        if rect.isEmpty():
+            return
+        self._canvas.draw_to_device(self._device_image, rect)
+        self.update(rect)
 
     def delay(self, milliseconds: float):
         """
@@ -1,11 +1,19 @@
-from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
 from typing import Union, Callable
 import math
+import struct
+import threading
+import zlib
 
-from PyQt5 import QtGui, QtCore
+import numpy as np
+from PyQt5 import QtGui, QtCore, sip
 
-from easygraphics.consts import FillStyle, Color, LineStyle, CompositionMode, FillRule, ShapeMode, VertexType
+from easygraphics.consts import FillStyle, Color, LineStyle, CompositionMode, FillRule, ShapeMode, VertexType, \
+    FloodFillMode, ImageFormat
 import qimage2ndarray as qn
 
 _in_ipython = False
@@ -17,7 +25,7 @@ try:
 except NameError:
     pass
 
-__all__ = ['Image']
+__all__ = ['Image', 'DisplayList', 'TiledImage', 'ImagePool', 'TextLayoutCache']
 
 
 class Image:
@@ -29,12 +37,51 @@ class Image:
     Note that the painter is keep and reused, if you want to draw on the image by yourself,
     please use get_painter() to get the painter and draw.And also note there is a mask image
     for background processing. You should get the mask right or you will get wrong result
-    with set_background_color() and draw_image(with_background=False).
+    with set_background_color() and draw_image(with_background=False). The mask is a grayscale
+    (Format_Grayscale8) image, background pixels are white and drawn pixels are not.
+
+    If the image is created with track_background=False, the mask image is not created and
+    nothing is drawn on it, which makes drawing faster and saves memory. But the functions which
+    need the background information (set_background_color(), draw_image(with_background=False),
+    save(with_background=False), etc.) can't be used on such images.
     """
 
-    def __init__(self, image: QtGui.QImage):
+    def __init__(self, image: QtGui.QImage, track_background: bool = True):
         self._image = image
         self._image_view = None
+        self._reset_settings()
+        if track_background:
+            self._mask = QtGui.QImage(image.width(), image.height(), QtGui.QImage.Format_Grayscale8)
+            self._mask_view = qn.raw_view(self._mask)
+            self._mask.fill(MASK_WHITE_VALUE)
+            self._mask_painter = QtGui.QPainter()
+        else:
+            self._mask = None
+            self._mask_view = None
+            self._mask_painter = _NullPainter()
+        self._painter = QtGui.QPainter()
+        self._init_painter()
+        self._init_mask_painter()
+        self._updated_listeners = []
+        self._updated_rect_listeners = []
+        self._batch_level = 0
+        self._batch_dirty_rect = None
+        self._dirty_rect = image.rect()
+        self._dirty_rect_used = False  # the exact dirty areas are only computed after the dirty rect is read
+        self._recording = None  # the display list being recorded
+        self._content_generation = 0  # bumped when the image is changed
+        self._pixmap = None
+        self._pixmap_key = None
+        self._foreground = None
+        self._foreground_generation = None
+        self._buffer = None  # the external buffer holding the pixels
+        self._shared_memory = None
+        self._owns_shared_memory = False
+        self._parent = None  # the image whose pixels are shown by this view
+        self._parent_offset = None
+
+    def _reset_settings(self):
+        """ set the drawing settings (except the painters' states) to the defaults """
         self._color = _to_qcolor(Color.BLACK)
         self._line_style = LineStyle.SOLID_LINE
         self._line_width = 1
@@ -42,23 +89,21 @@ class Image:
         self._fill_style = FillStyle.SOLID_FILL
         self._fill_rule = FillRule.ODD_EVEN_FILL
         self._background_color = _to_qcolor(Color.WHITE)
-        self._mask = QtGui.QImage(image.width(), image.height(), QtGui.QImage.Format_ARGB32_Premultiplied)
-        self._mask_view = qn.raw_view(self._mask)
-        self._mask.fill(MASK_WHITE)
         self._pen = QtGui.QPen()
         self._pen.setColor(Color.BLACK)
         self._pen.setCapStyle(QtCore.Qt.RoundCap)
         self._pen.setJoinStyle(QtCore.Qt.RoundJoin)
         self._pen.setCosmetic(True)
         self._brush = QtGui.QBrush(Color.WHITE, FillStyle.SOLID_FILL)
+        # the pen and brush last set to the painters, to avoid setting them again when they are not changed
+        self._painter_state = None
+        self._state_generation = 0  # bumped by the setters which change the pen or brush
+        # if the pen or brush is shared with the caller (by get_pen()/set_pen() etc.), it may be changed in place,
+        # so it's compared by value
+        self._style_shared = False
         self._x = 0
         self._y = 0
         self._flip_y = False
-        self._painter = QtGui.QPainter()
-        self._mask_painter = QtGui.QPainter()
-        self._init_painter()
-        self._init_mask_painter()
-        self._updated_listeners = []
         self._transform_stack = []
         self._rect_mode = ShapeMode.CORNERS
         self._ellipse_mode = ShapeMode.RADIUS
@@ -78,6 +123,30 @@ class Image:
         self._shape_transformed_vertices = []
         self._is_curve_shape = False
 
+    def _recycle(self):
+        """
+        Reset the image to the state of a newly created one (used by ImagePool).
+
+        The painters are restarted, so their states (transforms, clip, font, composition mode, etc.) are reset too.
+        """
+        self._painter.end()
+        self._mask_painter.end()
+        self._reset_settings()
+        self._image.fill(_to_pixel_value(self._background_color, self._image.format()))
+        self._image_view = None
+        if self._mask is not None:
+            self._mask.fill(MASK_WHITE_VALUE)
+            self._mask_view = qn.raw_view(self._mask)
+        self._init_painter()
+        self._init_mask_painter()
+        self._updated_listeners.clear()
+        self._updated_rect_listeners.clear()
+        self._batch_level = 0
+        self._batch_dirty_rect = None
+        self._dirty_rect = self._image.rect()
+        self._dirty_rect_used = False
+        self._content_generation += 1
+
     def _init_painter(self):
         p = self._painter
         p.begin(self._image)
@@ -94,6 +163,8 @@ class Image:
         self._painter.setRenderHint(QtGui.QPainter.Antialiasing,anti)
 
     def _init_mask_painter(self):
+        if self._mask is None:
+            return
         p = self._mask_painter
         p.begin(self._mask)
         p.setCompositionMode(CompositionMode.SOURCE)
@@ -127,12 +198,36 @@ class Image:
         """
         return self._image.height()
 
+    def is_tracking_background(self) -> bool:
+        """
+        Test if the image tracks its background (has a background mask).
+
+        :return: False if the image is created with track_background=False, True otherwise
+        """
+        return self._mask is not None
+
+    def _share_style(self):
+        """ the pen and brush are shared with the caller from now on """
+        self._style_shared = True
+        self._painter_state = None
+
+    def _check_not_recording(self):
+        if self._recording is not None:
+            raise RuntimeError("Can't change the pixels directly when recording a display list!")
+
+    def _check_tracking_background(self):
+        if self._mask is None:
+            raise RuntimeError("The image doesn't track its background (created with track_background=False)!")
+
     def get_pen(self) -> QtGui.QPen:
         """
         Get the pen of the image
 
+        The returned pen is the one used internally, changes on it take effect in the next drawing.
+
         :return: pen
         """
+        self._share_style()
         return self._pen
 
     def set_pen(self, pen: QtGui.QPen):
@@ -143,13 +238,17 @@ class Image:
         :return:
         """
         self._pen = pen
+        self._share_style()
 
     def get_brush(self) -> QtGui.QBrush:
         """
         Get brush of the image
 
+        The returned brush is the one used internally, changes on it take effect in the next drawing.
+
         :return: the brush
         """
+        self._share_style()
         return self._brush
 
     def set_brush(self, brush: QtGui.QBrush):
@@ -159,6 +258,7 @@ class Image:
         :param brush: the brush
         """
         self._brush = brush
+        self._share_style()
 
     def get_color(self):
         """
@@ -168,7 +268,7 @@ class Image:
 
         :return: foreground color
         """
-        return self._color
+        return QtGui.QColor(self._color)  # the color may be shared (cached), so return a copy
 
     def set_color(self, color):
         """
@@ -185,6 +285,7 @@ class Image:
         color = _to_qcolor(color)
         self._color = color
         self._pen.setColor(color)
+        self._state_generation += 1
 
     def get_fill_color(self):
         """
@@ -194,7 +295,7 @@ class Image:
 
         :return: fill color
         """
-        return self._fill_color
+        return QtGui.QColor(self._fill_color)
 
     def set_fill_color(self, fill_color):
         """
@@ -211,6 +312,7 @@ class Image:
         fill_color = _to_qcolor(fill_color)
         self._fill_color = fill_color
         self._brush.setColor(fill_color)
+        self._state_generation += 1
 
     def set_fill_rule(self, rule):
         """
@@ -234,7 +336,7 @@ class Image:
 
         :return: background color
         """
-        return self._background_color
+        return QtGui.QColor(self._background_color)
 
     def set_background_color(self, background_color):
         """
@@ -247,10 +349,13 @@ class Image:
         :param background_color: background color
         """
 
+        self._check_not_recording()
         background_color = _to_qcolor(background_color)
+        foreground = self._get_foreground()
         self._background_color = background_color
-        foreground = _get_foreground(self)
-        self._image.fill(background_color)
+        # filling with the pixel value won't begin another painter on the image (like fill(QColor) does for
+        # some formats)
+        self._image.fill(_to_pixel_value(background_color, self._image.format()))
         self._painter.save()
         self._painter.resetTransform()
         self._painter.setCompositionMode(CompositionMode.SOURCE_OVER)
@@ -279,6 +384,7 @@ class Image:
         """
         self._line_style = line_style
         self._pen.setStyle(line_style)
+        self._state_generation += 1
 
     def get_line_width(self) -> float:
         """
@@ -303,6 +409,7 @@ class Image:
             self._pen.setWidth(width)
         else:
             self._pen.setWidthF(width)
+        self._state_generation += 1
 
     def get_fill_style(self):
         """
@@ -325,6 +432,7 @@ class Image:
         """
         self._fill_style = fill_style
         self._brush.setStyle(fill_style)
+        self._state_generation += 1
 
     def set_view_port(self, left: int, top: int, right: int, bottom: int):
         """
@@ -657,16 +765,24 @@ class Image:
 
     def _prepare_painter(self, pen: QtGui.QPen, brush: QtGui.QBrush) -> QtGui.QPainter:
         p = self._painter
+        state = self._painter_state  # (pen, brush, mask state, generation or copies of the pen and brush)
+        if state is not None and state[0] is pen and state[1] is brush:
+            if self._style_shared:
+                # the pen and brush may be changed in place, compare them by value
+                if state[3] == (pen, brush):
+                    return p
+            elif state[3] == self._state_generation:
+                return p
         p.setPen(pen)
         p.setBrush(brush)
-        if self._no_pen():
-            self._mask_painter.setPen(LineStyle.NO_PEN)
+        mask_state = (self._no_pen(), self._no_brush())
+        if state is None or state[2] != mask_state:
+            self._mask_painter.setPen(LineStyle.NO_PEN if mask_state[0] else MASK_BLACK)
+            self._mask_painter.setBrush(FillStyle.NULL_FILL if mask_state[1] else MASK_BLACK)
+        if self._style_shared:
+            self._painter_state = (pen, brush, mask_state, (_copy_style(pen), _copy_style(brush)))
         else:
-            self._mask_painter.setPen(MASK_BLACK)
-        if self._no_brush():
-            self._mask_painter.setBrush(FillStyle.NULL_FILL)
-        else:
-            self._mask_painter.setBrush(MASK_BLACK)
+            self._painter_state = (pen, brush, mask_state, self._state_generation)
         return p
 
     def _prepare_painter_for_draw_outline(self) -> QtGui.QPainter:
@@ -692,7 +808,25 @@ class Image:
         point = QtCore.QPointF(x, y)
         p.drawPoint(point)
         self._mask_painter.drawPoint(point)
-        self._updated()
+        self._updated_logical_rect(QtCore.QRectF(point, point))
+
+    def draw_points(self, xy):
+        """
+        Draw many points in one batch.
+
+        "xy" is a Nx2 array (i.e. a numpy ndarray), each row of which is the (x,y) coordinate of a point.
+        All points are drawn by one call, so it's much faster than calling draw_point() in a loop.
+
+        :param xy: Nx2 array of the points' coordinates
+        """
+        points = _to_coords_array(xy, 2)
+        if len(points) == 0:
+            return
+        polygon = _to_qpolygonf(points)
+        p = self._prepare_painter_for_draw_outline()
+        p.drawPoints(polygon)
+        self._mask_painter.drawPoints(polygon)
+        self._updated_logical_rect(polygon.boundingRect())
 
     def _no_pen(self):
         return self._painter.pen().style() == LineStyle.NO_PEN
@@ -714,7 +848,7 @@ class Image:
         p2 = QtCore.QPointF(x2, y2)
         p.drawLine(p1, p2)
         self._mask_painter.drawLine(p1, p2)
-        self._updated()
+        self._updated_logical_rect(QtCore.QRectF(p1, p2))
 
     line = draw_line
 
@@ -730,13 +864,14 @@ class Image:
         :param y2: radius on y-axis of the ellipse
         """
         p = self._prepare_painter_for_draw_outline()
-        self._draw_ellipse(p, x1, y1, x2, y2)
-        self._updated()
+        rect = self._draw_ellipse(p, x1, y1, x2, y2)
+        self._updated_logical_rect(rect)
 
     def _draw_ellipse(self, p, x1, y1, x2, y2):
         rect = _calc_rect(x1, y1, x2, y2, self._ellipse_mode)
         p.drawEllipse(rect)
         self._mask_painter.drawEllipse(rect)
+        return rect
 
     def draw_ellipse(self, x1: float, y1: float, x2: float, y2: float):
         """
@@ -750,8 +885,8 @@ class Image:
         :param y2: radius on y-axis of the ellipse
         """
         p = self._prepare_painter_for_draw()
-        self._draw_ellipse(p, x1, y1, x2, y2)
-        self._updated()
+        rect = self._draw_ellipse(p, x1, y1, x2, y2)
+        self._updated_logical_rect(rect)
 
     def fill_ellipse(self, x1: float, y1: float, x2: float, y2: float):
         """
@@ -765,8 +900,60 @@ class Image:
         :param y2: radius on y-axis of the ellipse
         """
         p = self._prepare_painter_for_fill()
-        self._draw_ellipse(p, x1, y1, x2, y2)
-        self._updated()
+        rect = self._draw_ellipse(p, x1, y1, x2, y2)
+        self._updated_logical_rect(rect)
+
+    def fill_circles(self, xy, r, colors=None):
+        """
+        Fill many circles in one batch.
+
+        The circles don't have outline.
+
+        "xy" is a Nx2 array (i.e. a numpy ndarray) of the circles' centers. "r" is the radius of
+        all circles, or an array of N radiuses. "colors" is None (use the fill color), a color, a list
+        of N colors, or an ndarray of N ARGB values (as returned by QColor.rgba()).
+
+        Circles with the same radius and color are drawn by one call, so it's much faster than
+        calling fill_ellipse() in a loop.
+
+        :param xy: Nx2 array of the circles' centers
+        :param r: radius (or N radiuses) of the circles
+        :param colors: fill colors of the circles
+        """
+        centers = _to_coords_array(xy, 2)
+        n = len(centers)
+        if n == 0 or self._fill_style == FillStyle.NULL_FILL:
+            return
+        keys = np.empty(n, dtype=[('r', np.float64), ('c', np.uint32)])
+        keys['r'] = np.broadcast_to(np.asarray(r, dtype=np.float64), (n,))
+        keys['c'] = 0 if colors is None else _to_rgba_array(colors, n)
+        groups, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        p = self._prepare_painter_for_fill()
+        # a point drawn by a round cap pen is a filled circle whose diameter is the pen width
+        pen = QtGui.QPen(QtCore.Qt.SolidLine)
+        pen.setCapStyle(QtCore.Qt.RoundCap)
+        mask_pen = QtGui.QPen(MASK_BLACK)
+        mask_pen.setCapStyle(QtCore.Qt.RoundCap)
+        for i, (radius, rgba) in enumerate(groups.tolist()):
+            if radius <= 0:
+                continue
+            if colors is None:
+                pen.setBrush(self._brush)
+            else:
+                pen.setBrush(QtGui.QBrush(QtGui.QColor.fromRgba(rgba), self._fill_style))
+            pen.setWidthF(2 * radius)
+            mask_pen.setWidthF(2 * radius)
+            polygon = _to_qpolygonf(centers[inverse == i])
+            p.setPen(pen)
+            p.drawPoints(polygon)
+            self._mask_painter.setPen(mask_pen)
+            self._mask_painter.drawPoints(polygon)
+        self._painter_state = None
+        max_radius = max(keys['r'].max(), 0)
+        left, top = centers.min(axis=0) - max_radius
+        right, bottom = centers.max(axis=0) + max_radius
+        self._updated_logical_rect(QtCore.QRectF(QtCore.QPointF(left, top), QtCore.QPointF(right, bottom)))
 
     def draw_arc(self, x1: float, y1: float, start_angle: float, end_angle: float, x2: float, y2: float):
         """
@@ -790,7 +977,7 @@ class Image:
         al = angle_len * 16
         p.drawArc(rect, s, al)
         self._mask_painter.drawArc(rect, s, al)
-        self._updated()
+        self._updated_logical_rect(rect)
 
     arc = draw_arc
 
@@ -818,7 +1005,7 @@ class Image:
         al = angle_len * 16
         p.drawPie(rect, s, al)
         self._mask_painter.drawPie(rect, s, al)
-        self._updated()
+        self._updated_logical_rect(rect)
 
     def draw_pie(self, x1: float, y1: float, start_angle: float, end_angle: float, x2: float, y2: float):
         """
@@ -844,7 +1031,7 @@ class Image:
         al = angle_len * 16
         p.drawPie(rect, s, al)
         self._mask_painter.drawPie(rect, s, al)
-        self._updated()
+        self._updated_logical_rect(rect)
 
     def fill_pie(self, x1: float, y1: float, start_angle: float, end_angle: float, x2: float, y2: float):
         """
@@ -870,7 +1057,7 @@ class Image:
         al = angle_len * 16
         p.drawPie(rect, s, al)
         self._mask_painter.drawPie(rect, s, al)
-        self._updated()
+        self._updated_logical_rect(rect)
 
     def chord(self, x1: float, y1: float, start_angle: float, end_angle: float, x2: float, y2: float):
         """
@@ -896,7 +1083,7 @@ class Image:
         al = angle_len * 16
         p.drawChord(rect, s, al)
         self._mask_painter.drawChord(rect, s, al)
-        self._updated()
+        self._updated_logical_rect(rect)
 
     def draw_chord(self, x1: float, y1: float, start_angle: float, end_angle: float, x2: float, y2: float):
         """
@@ -922,7 +1109,7 @@ class Image:
         al = angle_len * 16
         p.drawChord(rect, s, al)
         self._mask_painter.drawChord(rect, s, al)
-        self._updated()
+        self._updated_logical_rect(rect)
 
     def fill_chord(self, x1: float, y1: float, start_angle: float, end_angle: float, x2: float, y2: float):
         """
@@ -948,7 +1135,7 @@ class Image:
         al = angle_len * 16
         p.drawChord(rect, s, al)
         self._mask_painter.drawChord(rect, s, al)
-        self._updated()
+        self._updated_logical_rect(rect)
 
     def draw_bezier(self, x0: float, y0: float, x1: float, y1: float, x2: float, y2: float, x3: float, y3: float):
         """
@@ -970,7 +1157,7 @@ class Image:
         p = self._prepare_painter_for_draw_outline()
         p.drawPath(path)
         self._mask_painter.drawPath(path)
-        self._updated()
+        self._updated_logical_rect(path.controlPointRect())
 
     bezier = draw_bezier
 
@@ -1011,7 +1198,7 @@ class Image:
         p = self._prepare_painter_for_draw_outline()
         p.drawPath(path)
         self._mask_painter.drawPath(path)
-        self._updated()
+        self._updated_logical_rect(path.controlPointRect())
 
     quadratic = draw_quadratic
 
@@ -1026,18 +1213,30 @@ class Image:
         For examples , if points is [50,50,550,350, 50,150,550,450, 50,250,550,550], draw_lines() will draw 3 lines:
         (50,50) to (550,350), (50,150) to (550,450), (50,250) to (550,550)
 
+        "points" can also be a single Nx4 array (i.e. a numpy ndarray), each row of which is a line
+        (x1,y1,x2,y2). The array is passed to Qt without creating a python object for each line,
+        so it's the fastest way to draw many lines.
+
         :param points: point value list
         """
-        numpoints = len(points) // 2
-        if numpoints < 2:
-            raise ValueError
-        qlines = []
-        for i in range(0, numpoints, 2):
-            qlines.append(QtCore.QLineF(*points[i * 2:i * 2 + 4]))
+        if len(points) == 1 and isinstance(points[0], np.ndarray):
+            segments = _to_coords_array(points[0], 4)
+            if len(segments) == 0:
+                return
+            qlines = _to_qpolygonf(segments.reshape(-1, 2))
+            rect = qlines.boundingRect()
+        else:
+            numpoints = len(points) // 2
+            if numpoints < 2:
+                raise ValueError
+            qlines = []
+            for i in range(0, numpoints, 2):
+                qlines.append(QtCore.QLineF(*points[i * 2:i * 2 + 4]))
+            rect = QtGui.QPolygonF(self._convert_to_qpoints(points)).boundingRect()
         p = self._prepare_painter_for_draw_outline()
         p.drawLines(qlines)
         self._mask_painter.drawLines(qlines)
-        self._updated()
+        self._updated_logical_rect(rect)
 
     lines = draw_lines
 
@@ -1058,7 +1257,7 @@ class Image:
         p = self._prepare_painter_for_draw_outline()
         p.drawPolyline(*qpoints)
         self._mask_painter.drawPolyline(*qpoints)
-        self._updated()
+        self._updated_logical_rect(QtGui.QPolygonF(qpoints).boundingRect())
 
     poly_line = draw_poly_line
 
@@ -1095,7 +1294,7 @@ class Image:
         p = self._prepare_painter_for_draw_outline()
         p.drawPolygon(polygon, self._fill_rule)
         self._mask_painter.drawPolygon(polygon, self._fill_rule)
-        self._updated()
+        self._updated_logical_rect(polygon.boundingRect())
 
     def draw_polygon(self, *vertices):
         """
@@ -1115,7 +1314,7 @@ class Image:
         p = self._prepare_painter_for_draw()
         p.drawPolygon(polygon, self._fill_rule)
         self._mask_painter.drawPolygon(polygon, self._fill_rule)
-        self._updated()
+        self._updated_logical_rect(polygon.boundingRect())
 
     def _convert_to_qpolygon(self, vertices):
         qpoints = self._convert_to_qpoints(vertices)
@@ -1140,7 +1339,7 @@ class Image:
         p = self._prepare_painter_for_fill()
         p.drawPolygon(polygon, self._fill_rule)
         self._mask_painter.drawPolygon(polygon, self._fill_rule)
-        self._updated()
+        self._updated_logical_rect(polygon.boundingRect())
 
     def path(self, path: QtGui.QPainterPath):
         """
@@ -1151,7 +1350,7 @@ class Image:
         p = self._prepare_painter_for_draw_outline()
         p.drawPath(path)
         self._mask_painter.drawPath(path)
-        self._updated()
+        self._updated_logical_rect(path.controlPointRect())
 
     def draw_path(self, path: QtGui.QPainterPath):
         """
@@ -1162,7 +1361,7 @@ class Image:
         p = self._prepare_painter_for_draw()
         p.drawPath(path)
         self._mask_painter.drawPath(path)
-        self._updated()
+        self._updated_logical_rect(path.controlPointRect())
 
     def fill_path(self, path: QtGui.QPainterPath):
         """
@@ -1174,12 +1373,13 @@ class Image:
         self._prepare_painter_for_fill()
         p.fillPath(path, p.brush())
         self._mask_painter.fillPath(path, self._mask_painter.brush())
-        self._updated()
+        self._updated_logical_rect(path.controlPointRect())
 
     def _draw_rect(self, p, x1, y1, x2, y2):
         rect = _calc_rect(x1, y1, x2, y2, self._rect_mode)
         p.drawRect(rect)
         self._mask_painter.drawRect(rect)
+        return rect
 
     def rect(self, x1: float, y1: float, x2: float, y2: float):
         """
@@ -1193,8 +1393,8 @@ class Image:
         :param y2: y coordinate value of the lower right corner
         """
         p = self._prepare_painter_for_draw_outline()
-        self._draw_rect(p, x1, y1, x2, y2)
-        self._updated()
+        rect = self._draw_rect(p, x1, y1, x2, y2)
+        self._updated_logical_rect(rect)
 
     def draw_rect(self, x1: float, y1: float, x2: float, y2: float):
         """
@@ -1208,8 +1408,8 @@ class Image:
         :param y2: y coordinate value of the lower right corner
         """
         p = self._prepare_painter_for_draw()
-        self._draw_rect(p, x1, y1, x2, y2)
-        self._updated()
+        rect = self._draw_rect(p, x1, y1, x2, y2)
+        self._updated_logical_rect(rect)
 
     def fill_rect(self, x1: float, y1: float, x2: float, y2: float):
         """
@@ -1223,13 +1423,55 @@ class Image:
         :param y2: y coordinate value of the lower right corner
         """
         p = self._prepare_painter_for_fill()
-        self._draw_rect(p, x1, y1, x2, y2)
-        self._updated()
+        rect = self._draw_rect(p, x1, y1, x2, y2)
+        self._updated_logical_rect(rect)
+
+    def fill_rects(self, rects, colors=None):
+        """
+        Fill many rectangles in one batch.
+
+        The rectangles don't have outline.
+
+        "rects" is a Nx4 array (i.e. a numpy ndarray), each row of which is a rectangle. The meaning of the 4
+        values is decided by the rect mode (see set_rect_mode()), just like the parameters of fill_rect().
+        "colors" is None (use the fill color), a color, a list of N colors, or an ndarray of N ARGB values
+        (as returned by QColor.rgba()).
+
+        Rectangles with the same color are drawn by one call, so it's much faster than calling
+        fill_rect() in a loop.
+
+        :param rects: Nx4 array of the rectangles
+        :param colors: fill colors of the rectangles
+        """
+        rects = _calc_rects(_to_coords_array(rects, 4), self._rect_mode)
+        n = len(rects)
+        if n == 0:
+            return
+        p = self._prepare_painter_for_fill()
+        if colors is None:
+            qrects = [QtCore.QRectF(*rect) for rect in rects.tolist()]
+            p.drawRects(qrects)
+            self._mask_painter.drawRects(qrects)
+        else:
+            rgbas = _to_rgba_array(colors, n)
+            brush = QtGui.QBrush(self._brush)
+            for rgba in np.unique(rgbas).tolist():
+                qrects = [QtCore.QRectF(*rect) for rect in rects[rgbas == rgba].tolist()]
+                brush.setColor(QtGui.QColor.fromRgba(rgba))
+                p.setBrush(brush)
+                p.drawRects(qrects)
+                self._mask_painter.drawRects(qrects)
+            self._painter_state = None
+        corners = np.concatenate((rects[:, :2], rects[:, :2] + rects[:, 2:]))
+        left, top = corners.min(axis=0)
+        right, bottom = corners.max(axis=0)
+        self._updated_logical_rect(QtCore.QRectF(QtCore.QPointF(left, top), QtCore.QPointF(right, bottom)))
 
     def _draw_rounded_rect(self, p, x1, y1, x2, y2, round_x, round_y):
         rect = _calc_rect(x1, y1, x2, y2, self._rect_mode)
         p.drawRoundedRect(rect, round_x, round_y)
         self._mask_painter.drawRoundedRect(rect, round_x, round_y)
+        return rect
 
     def rounded_rect(self, x1: float, y1: float, x2: float, y2: float, round_x: float, round_y: float):
         """
@@ -1247,8 +1489,8 @@ class Image:
         :param round_y: radius on y-axis of the corner ellipse arc
         """
         p = self._prepare_painter_for_draw_outline()
-        self._draw_rounded_rect(p, x1, y1, x2, y2, round_x, round_y)
-        self._updated()
+        rect = self._draw_rounded_rect(p, x1, y1, x2, y2, round_x, round_y)
+        self._updated_logical_rect(rect)
 
     def draw_rounded_rect(self, x1: float, y1: float, x2: float, y2: float, round_x: float, round_y: float):
         """
@@ -1265,8 +1507,8 @@ class Image:
         :param round_y: radius on y-axis of the corner ellipse arc
         """
         p = self._prepare_painter_for_draw()
-        self._draw_rounded_rect(p, x1, y1, x2, y2, round_x, round_y)
-        self._updated()
+        rect = self._draw_rounded_rect(p, x1, y1, x2, y2, round_x, round_y)
+        self._updated_logical_rect(rect)
 
     def fill_rounded_rect(self, x1: float, y1: float, x2: float, y2: float, round_x: float, round_y: float):
         """
@@ -1283,15 +1525,17 @@ class Image:
         :param round_y: radius on y-axis of the corner ellipse arc
         """
         p = self._prepare_painter_for_fill()
-        self._draw_rounded_rect(p, x1, y1, x2, y2, round_x, round_y)
-        self._updated()
+        rect = self._draw_rounded_rect(p, x1, y1, x2, y2, round_x, round_y)
+        self._updated_logical_rect(rect)
 
     def clear(self):
         """
         Clear the image to show the background.
         """
-        self._image.fill(self._background_color)
-        self._mask.fill(MASK_WHITE)
+        self._check_not_recording()
+        self._image.fill(_to_pixel_value(self._background_color, self._image.format()))
+        if self._mask is not None:
+            self._mask.fill(MASK_WHITE_VALUE)
         self._updated()
 
     def fill_image(self, color):
@@ -1349,7 +1593,11 @@ class Image:
         img = _prepare_image_for_copy(image, with_background)
         if width<1 or height<1:
             p.drawImage(x, y, img, src_x, src_y, src_width, src_height)
-            self._mask_painter.fillRect(x, y, src_width, src_height, QtCore.Qt.color0)
+            if src_width < 1:
+                src_width = img.width() - src_x
+            if src_height < 1:
+                src_height = img.height() - src_y
+            target = QtCore.QRectF(x, y, src_width, src_height)
         else:
             if src_width<1:
                 src_width = img.width() - x
@@ -1358,76 +1606,248 @@ class Image:
             target = QtCore.QRectF(x,y,width,height)
             source = QtCore.QRectF(src_x,src_y,src_width,src_height)
             p.drawImage(target,img,source)
-            self._mask_painter.fillRect(x, y, width, height, QtCore.Qt.color0)
+        self._mask_painter.fillRect(target, MASK_BLACK)
         if composition_mode is not None:
             p.setCompositionMode(old_mode)
-        self._updated()
+        self._updated(p.combinedTransform().mapRect(target).toAlignedRect().adjusted(-1, -1, 1, 1))
+
+    def draw_sprites(self, atlas: "Image", src_rects, dst_positions, rotations=None, scales=None, opacities=None,
+                     with_background=True):
+        """
+        Draw many parts (sprites) of the atlas image with one call.
+
+        It's much faster than calling draw_image() for each sprite. The atlas is converted to a pixmap once and
+        reused, until it's changed.
+
+        Sprite i is the src_rects[i] part of the atlas, drawn with its top-left at dst_positions[i],
+        scaled by scales[i] and rotated by rotations[i] degrees around its center.
+
+        :param atlas: the image containing the sprites
+        :param src_rects: Nx4 array of the sprites' rects (x, y, width, height) in the atlas, or one rect for all
+        :param dst_positions: Nx2 array of the top-left points of the sprites on this image
+        :param rotations: rotation angles (in degrees, clockwise) of the sprites. None means no rotation.
+        :param scales: scale factors of the sprites. It can be a N array, or a Nx2 array of (x, y) scales.
+            None means no scale.
+        :param opacities: opacities (0-1) of the sprites. None means fully opaque.
+        :param with_background: if the atlas's background should be drawn.
+        """
+        positions = _to_coords_array(dst_positions, 2)
+        n = len(positions)
+        if n == 0:
+            return
+        rects = np.broadcast_to(_to_coords_array(src_rects, 4), (n, 4))
+        if scales is None:
+            scales = np.ones((n, 2))
+        else:
+            scales = np.asarray(scales, dtype=np.float64)
+            if scales.ndim < 2:
+                scales = scales[..., np.newaxis]
+            scales = np.broadcast_to(scales, (n, 2))
+        fragments, data = _create_pixmap_fragments(rects, positions, scales, rotations, opacities)
+        sizes = rects[:, 2:] * scales
+        p = self._painter
+        p.drawPixmapFragments(fragments, atlas._get_pixmap(with_background))
+        self._mask_painter.drawPixmapFragments(fragments, _mask_pixmap(atlas.get_width(), atlas.get_height()))
+        radius = np.hypot(sizes[:, 0], sizes[:, 1]).max() / 2
+        left, top = data[:, 0:2].min(axis=0) - radius
+        right, bottom = data[:, 0:2].max(axis=0) + radius
+        target = QtCore.QRectF(QtCore.QPointF(left, top), QtCore.QPointF(right, bottom))
+        self._updated(p.combinedTransform().mapRect(target).toAlignedRect().adjusted(-1, -1, 1, 1))
+
+    def draw_text_grid(self, chars, fg_colors=None, bg_colors=None, origin=(0, 0), cell_size=None, font=None):
+        """
+        Draw a grid of characters (like a text terminal) with one call.
+
+        It's much faster than calling draw_text() for each character. The glyphs of the font are drawn in
+        an atlas when they are first used, and the whole grid is drawn from the atlas with one batched sprite draw
+        for each foreground color.
+
+        "chars" is a (rows, columns) array of the characters' code points (or of single-character strings).
+        Spaces and control characters are not drawn. "fg_colors" and "bg_colors" are None, a color, or an
+        ndarray of ARGB values (as returned by QColor.rgba()) of the grid's shape.
+
+        Each glyph is drawn at the left of its cell, with the font's ascent above its baseline, and is clipped
+        to the cell.
+
+        :param chars: (rows, columns) array of the characters
+        :param fg_colors: colors of the characters. None means the foreground color.
+        :param bg_colors: background colors of the cells. None means the cells' backgrounds are not drawn.
+        :param origin: (x, y) of the grid's upper left corner
+        :param cell_size: (width, height) of the cells. None means the width of "M" and the height of the font.
+        :param font: the font. None means the font of the image.
+        """
+        codes = np.asarray(chars)
+        if codes.dtype.kind == 'U':
+            codes = codes.astype('U1').view(np.uint32)
+        if codes.ndim != 2:
+            raise ValueError("chars should be a 2-d array!")
+        rows, columns = codes.shape
+        if font is None:
+            font = self._painter.font()
+        if cell_size is None:
+            metrics = QtGui.QFontMetrics(font, self._image)
+            cell_size = (metrics.horizontalAdvance("M"), metrics.height())
+        cell_width, cell_height = int(cell_size[0]), int(cell_size[1])
+        x, y = origin
+        height = rows * cell_height
+        if self._flip_y:
+            transform = self._painter.transform()
+            self.reflect(1, 0)
+            y = -(y + height)
+        cells_y, cells_x = np.mgrid[0:rows, 0:columns]
+        cells_x = cells_x * cell_width + x
+        cells_y = cells_y * cell_height + y
+        p = self._painter
+        if bg_colors is not None:
+            # cells of the same color next to each other in a row are filled together
+            bg = _to_rgba_array(bg_colors, rows * columns).reshape(rows, columns)
+            starts = np.ones((rows, columns), dtype=bool)
+            starts[:, 1:] = bg[:, 1:] != bg[:, :-1]
+            start_rows, start_columns = np.nonzero(starts)
+            run_lengths = np.diff(np.append(np.flatnonzero(starts.ravel()), rows * columns))
+            for row, column, length, rgba in zip(start_rows.tolist(), start_columns.tolist(), run_lengths.tolist(),
+                                                 bg[starts].tolist()):
+                rect = QtCore.QRectF(x + column * cell_width, y + row * cell_height, length * cell_width,
+                                     cell_height)
+                p.fillRect(rect, QtGui.QColor.fromRgba(rgba))
+                self._mask_painter.fillRect(rect, MASK_BLACK)
+        visible = codes > 32
+        count = int(np.count_nonzero(visible))
+        if count > 0:
+            fg = _to_rgba_array(self._color if fg_colors is None else fg_colors, rows * columns)
+            fg = fg.reshape(rows, columns)[visible]
+            positions = np.column_stack((cells_x[visible], cells_y[visible])).astype(np.float64)
+            with _glyph_atlas_lock:
+                atlas = _get_glyph_atlas(font, self._image.logicalDpiY(), cell_width, cell_height)
+                slots = atlas.get_slots(codes[visible])
+                rects = np.column_stack((slots % _GlyphAtlas.Columns * cell_width,
+                                         slots // _GlyphAtlas.Columns * cell_height,
+                                         np.full(count, cell_width), np.full(count, cell_height))
+                                        ).astype(np.float64)
+                for rgba in np.unique(fg).tolist():
+                    selected = fg == rgba
+                    fragments, _ = _create_pixmap_fragments(rects[selected], positions[selected])
+                    p.drawPixmapFragments(fragments, atlas.get_pixmap(rgba))
+                # the mask pixmap is transparent outside of the glyphs, which shouldn't replace the mask's pixels
+                fragments, _ = _create_pixmap_fragments(rects, positions)
+                self._mask_painter.setCompositionMode(CompositionMode.SOURCE_OVER)
+                self._mask_painter.drawPixmapFragments(fragments, atlas.get_mask_pixmap())
+                self._mask_painter.setCompositionMode(CompositionMode.SOURCE)
+        self._updated_logical_rect(QtCore.QRectF(x, y, columns * cell_width, height))
+        if self._flip_y:
+            self._painter.setTransform(transform)
+            self._mask_painter.setTransform(transform)
+
+    def _get_foreground(self) -> QtGui.QImage:
+        """
+        Get the foreground (the drawn pixels, with transparent background) of the image.
+
+        The result is cached until the image is changed, so don't change it.
+        """
+        self._check_tracking_background()
+        generation = self._get_content_generation()
+        if self._foreground_generation == generation:
+            return self._foreground
+        image = self._image
+        if image.format() != QtGui.QImage.Format_ARGB32_Premultiplied:
+            image = image.convertToFormat(QtGui.QImage.Format_ARGB32_Premultiplied)
+        foreground = QtGui.QImage(self._image.width(), self._image.height(), QtGui.QImage.Format_ARGB32_Premultiplied)
+        foreground.fill(Color.TRANSPARENT)
+        np.copyto(qn.raw_view(foreground), qn.raw_view(image), where=self._mask_view != MASK_WHITE_VALUE)
+        self._foreground = foreground
+        self._foreground_generation = generation
+        return foreground
+
+    def _get_pixmap(self, with_background=True) -> QtGui.QPixmap:
+        """ get the (cached) pixmap of the image """
+        key = (self._get_content_generation(), with_background)
+        if self._pixmap_key != key:
+            self._pixmap = QtGui.QPixmap.fromImage(_prepare_image_for_copy(self, with_background))
+            self._pixmap_key = key
+        return self._pixmap
 
     def get_mask(self) -> QtGui.QImage:
         """
         Get background mask image.
 
+        The mask is a Format_Grayscale8 image. Its pixels are white (255) for the background, and not white
+        (usually black) for the drawn pixels.
+
+        Raise RuntimeError if the image doesn't track its background.
+
         :return: background mask
         """
+        self._check_tracking_background()
         return self._mask
 
-    def draw_to_device(self, device: QtGui.QPaintDevice):
+    def draw_to_device(self, device: QtGui.QPaintDevice, rect: QtCore.QRect = None):
         """
-        Draw the whole image to the specified device.
+        Draw the image to the specified device.
 
         :param device: the device to be drawn on
+        :param rect: the area to be drawn. None means the whole image.
         """
         p = QtGui.QPainter()
         p.begin(device)
         p.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
-        p.drawImage(0, 0, self._image)
+        if rect is None:
+            p.drawImage(0, 0, self._image)
+        else:
+            p.drawImage(rect, self._image, rect)
         p.end()
 
-    def flood_fill(self, x: int, y: int, border_color):
+    def flood_fill(self, x: int, y: int, border_color, tolerance: int = 0, mode=FloodFillMode.BORDER):
         """
         Flood fill the image starting from(x,y) and ending at borders with border_color.
 
         The fill region border must be closed,or the whole image will be filled!
 
+        If mode is FloodFillMode.SURFACE, the connected area around (x,y) whose color is border_color
+        is filled instead. In this mode border_color can be None, which means the color of the
+        start point.
+
+        Colors are compared channel by channel. If the difference of every channel (alpha, red, green, blue)
+        is not greater than the tolerance, the two colors are considered the same.
+
         :param x: x coordinate value of the start point
         :param y: y coordinate value of the start point
-        :param border_color: color of the fill region border
+        :param border_color: color of the fill region border (or the surface color in SURFACE mode)
+        :param tolerance: max difference (0-255) of the color channels when comparing colors
+        :param mode: the fill mode. See FloodFillMode consts.
         """
         if self._fill_style == FillStyle.NULL_FILL:  # no need to fill
             return
+        self._check_not_recording()
         if self._image_view is None:
             self._image_view = qn.raw_view(self._image)
-        queue = deque()
         transform = self._painter.combinedTransform()
-        new_pos = transform.map(QtCore.QPoint(x, y))
-        queue.append((new_pos.x(), new_pos.y()))
-        bc = _to_qcolor(border_color).rgba()
-        fc = _to_qcolor(self._fill_color).rgba()
-        flags = [0] * (self._image.width() * self._image.height())
-        r = None
+        seed = transform.map(QtCore.QPoint(x, y))
+        area = self._image.rect()
         if self._painter.hasClipping():
-            r = self._painter.clipBoundingRect()
-            r = transform.mapRect(r)
-        self._mask_painter.setPen(QtCore.Qt.color0)
-        while len(queue) > 0:
-            x, y = queue.popleft()
-            if x < 0 or y < 0 or x >= self._image.width() or y >= self._image.height():
-                continue
-            if r is not None and not r.contains(x, y):
-                continue
-            if flags[self._image.width() * y + x] == 1:
-                continue
-            pc = self._image.pixel(x, y)
-            if bc == pc:
-                continue
-            flags[self._image.width() * y + x] = 1
-            self._image_view[y, x] = fc
-            self._mask_view[y, x] = MASK_BLACK.rgba()
-            queue.append((x + 1, y))
-            queue.append((x - 1, y))
-            queue.append((x, y + 1))
-            queue.append((x, y - 1))
-        self._updated()
+            clip_rect = transform.mapRect(self._painter.clipBoundingRect()).toAlignedRect()
+            area = area.intersected(clip_rect)
+        if not area.contains(seed):
+            return
+        left, top = area.left(), area.top()
+        view = self._image_view[top:top + area.height(), left:left + area.width()]
+        seed_x, seed_y = seed.x() - left, seed.y() - top
+        image_format = self._image.format()
+        if mode == FloodFillMode.SURFACE:
+            if border_color is None:
+                surface = view[seed_y, seed_x]
+            else:
+                surface = _to_pixel_value(_to_qcolor(border_color), image_format)
+            fillable = _same_color(view, surface, tolerance, image_format)
+        else:
+            border = _to_pixel_value(_to_qcolor(border_color), image_format)
+            fillable = ~_same_color(view, border, tolerance, image_format)
+        region, bounding = _span_fill(fillable, seed_x, seed_y)
+        if region is None:
+            return
+        view[region] = _to_pixel_value(self._fill_color, image_format)
+        if self._mask_view is not None:
+            self._mask_view[top:top + area.height(), left:left + area.width()][region] = MASK_BLACK_VALUE
+        self._updated(bounding.translated(left, top))
 
     def get_pixel(self, x: int, y: int) -> QtGui.QColor:
         """
@@ -1447,10 +1867,12 @@ class Image:
         :param y: y coordinate value of the pixel
         :param color: the color
         """
+        self._check_not_recording()
         qcolor = _to_qcolor(color)
         self._image.setPixel(x, y, qcolor.rgba())
-        self._mask.setPixel(x, y, MASK_BLACK.rgba())
-        self._updated()
+        if self._mask is not None:
+            self._mask.setPixel(x, y, MASK_BLACK.rgba())
+        self._updated(QtCore.QRect(x, y, 1, 1))
 
     def draw_text(self, x: int, y: int, *args, sep=' '):
         """
@@ -1464,18 +1886,30 @@ class Image:
         msgs = map(str, args)
         msg = sep.join(msgs)
         p = self._prepare_painter_for_draw()
+        static_text, rect, ascent, height = self._get_text_layout(msg)
         if self._flip_y:
             transform = self._painter.transform()
             self.reflect(1, 0)
-            y = -(y - self.text_height())
-            p.drawText(x, y, msg)
-            self._mask_painter.drawText(x, y, msg)
+            y = -(y - height)
+            self._draw_text_at(p, x, y, msg, static_text, ascent)
+            self._updated_logical_rect(rect.translated(x, y))
             self._painter.setTransform(transform)
             self._mask_painter.setTransform(transform)
+        else:
+            self._draw_text_at(p, x, y, msg, static_text, ascent)
+            self._updated_logical_rect(rect.translated(x, y))
+
+    def _draw_text_at(self, p: QtGui.QPainter, x: int, y: int, msg: str, static_text: QtGui.QStaticText,
+                      ascent: float):
+        """ draw the text with its baseline starting at (x,y) """
+        if p.transform().type() <= QtGui.QTransform.TxTranslate:
+            # static texts are drawn exactly the same as drawText() only when not rotated or scaled
+            top_left = QtCore.QPointF(x, y - ascent)
+            p.drawStaticText(top_left, static_text)
+            self._mask_painter.drawStaticText(top_left, static_text)
         else:
             p.drawText(x, y, msg)
             self._mask_painter.drawText(x, y, msg)
-        self._updated()
 
     def draw_rect_text(self, x: int, y: int, width: int, height: int, flags=QtCore.Qt.AlignCenter, *args, sep=' '):
         """
@@ -1494,18 +1928,68 @@ class Image:
         msgs = map(str, args)
         msg = sep.join(msgs)
         p = self._prepare_painter_for_draw()
+        static_text, text_rect = self._get_rect_text_layout(width, height, flags, msg)
         if self._flip_y:
             transform = self._painter.transform()
             self.reflect(1, 0)
             y = -(y + height)
-            p.drawText(x, y, width, height, flags, msg)
-            self._mask_painter.drawText(x, y, width, height, flags, msg)
+            self._draw_text_in(p, x, y, width, height, flags, msg, static_text, text_rect)
+            self._updated_logical_rect(text_rect.translated(x, y).united(QtCore.QRectF(x, y, width, height)))
             self._painter.setTransform(transform)
             self._mask_painter.setTransform(transform)
+        else:
+            self._draw_text_in(p, x, y, width, height, flags, msg, static_text, text_rect)
+            self._updated_logical_rect(text_rect.translated(x, y).united(QtCore.QRectF(x, y, width, height)))
+
+    def _draw_text_in(self, p: QtGui.QPainter, x: int, y: int, width: int, height: int, flags, msg: str,
+                      static_text: QtGui.QStaticText, text_rect: QtCore.QRectF):
+        """ draw the text in the rectangle """
+        if static_text is not None and p.transform().type() <= QtGui.QTransform.TxTranslate:
+            top_left = text_rect.topLeft() + QtCore.QPointF(x, y)
+            p.drawStaticText(top_left, static_text)
+            self._mask_painter.drawStaticText(top_left, static_text)
         else:
             p.drawText(x, y, width, height, flags, msg)
             self._mask_painter.drawText(x, y, width, height, flags, msg)
-        self._updated()
+
+    def _get_text_layout(self, msg: str) -> tuple:
+        """
+        Get the layout of the text drawn by draw_text() (from the cache).
+
+        :return: the static text, bounding rect of the text (relative to the start point), ascent and height
+            of the font
+        """
+        font = self._painter.font()
+        key = (msg, font.key(), self._image.logicalDpiY())
+        layout = _text_layout_cache.get(key)
+        if layout is None:
+            metrics = self._painter.fontMetrics()
+            layout = (_create_static_text(msg), QtCore.QRectF(metrics.boundingRect(msg)),
+                      QtGui.QFontMetricsF(font, self._image).ascent(), metrics.height())
+            _text_layout_cache.put(key, layout)
+        return layout
+
+    def _get_rect_text_layout(self, width: int, height: int, flags, msg: str) -> tuple:
+        """
+        Get the layout of the text drawn by draw_rect_text() (from the cache).
+
+        :return: the static text (None if it can't be drawn as a static text), and bounding rect of the text
+            (relative to the rectangle)
+        """
+        key = (msg, self._painter.font().key(), self._image.logicalDpiY(), int(flags), width, height)
+        layout = _text_layout_cache.get(key)
+        if layout is None:
+            rect = QtCore.QRectF(0, 0, width, height)
+            text_rect = self._painter.boundingRect(rect, flags, msg)
+            # drawText() clips the text to the rectangle, and lays out multiple lines itself
+            if int(flags) & ~int(QtCore.Qt.AlignHorizontal_Mask | QtCore.Qt.AlignVertical_Mask) == 0 \
+                    and "\n" not in msg and "\t" not in msg and rect.contains(text_rect):
+                static_text = _create_static_text(msg)
+            else:
+                static_text = None
+            layout = (static_text, text_rect)
+            _text_layout_cache.put(key, layout)
+        return layout
 
     def begin_shape(self, type=VertexType.POLY_LINE):
         """
@@ -1762,22 +2246,47 @@ class Image:
         if self._mask_painter is not None and self._mask_painter.isActive():
             self._mask_painter.end()
         self._mask_painter = None
+        self._pixmap = None
+        self._foreground = None
         self._updated_listeners.clear()
+        self._updated_rect_listeners.clear()
+        if self._buffer is not None:
+            # release the image and the views on the buffer before closing the shared memory
+            self._image = QtGui.QImage()
+            self._image_view = None
+            self._buffer = None
+        if self._parent is not None:
+            self._mask = None
+            self._mask_view = None
+            self._parent = None
+        if self._shared_memory is not None:
+            self._shared_memory.close()
+            if self._owns_shared_memory:
+                _unlink_shared_memory(self._shared_memory)
+            self._shared_memory = None
 
     def get_painter(self) -> QtGui.QPainter:
         """
         Get the QPainter instance for drawing the image.
 
+        Call mark_dirty() after drawing with it, or the drawings may not be shown in the graphics window.
+
         :return: the painter used internally
         """
+        self._painter_state = None
+        self._invalidate_caches()
         return self._painter
 
     def get_mask_painter(self) -> QtGui.QPainter:
         """
         Get the QPainter instance for drawing the mask.
 
+        If the image doesn't track its background, the returned painter paints nothing.
+
         :return: the mask painter used internally
         """
+        self._painter_state = None
+        self._invalidate_caches()
         return self._mask_painter
 
     def save_settings(self):
@@ -1812,6 +2321,7 @@ class Image:
         """
         self._painter.restore()
         self._mask_painter.restore()
+        self._painter_state = None
         self._flip_y = self._old_flip_y
         self._rect_mode = self._old_rect_mode
         self._ellipse_mode = self._old_ellipse_mode
@@ -1823,36 +2333,81 @@ class Image:
         self._fill_rule = self._old_fill_rule
         self._background_color = self._old_background_color
 
-    def save(self, filename: str, with_background=True):
+    def save(self, filename: str, with_background=True, format: str = None, quality: int = -1):
         """
         Save image to file.
 
         Set with_background to False to get a transparent background image.
 
         Note that JPEG format doesn\'t support transparent. Use PNG format if you want a transparent background.
-        
+
+        The quality (0-100) is used by the lossy formats (like JPEG). For PNG format it\'s the compression
+        level: 0 is the smallest file, and 100 is the fastest (not compressed). -1 means the default.
+
         :param filename: path of the file
         :param with_background: True to save the background together. False not
+        :param format: format of the file (e.g. "PNG", "JPG"). None means to guess it from the file name.
+        :param quality: quality of the saved image
         """
         img = _prepare_image_for_copy(self, with_background)
-        img.save(filename)
+        img.save(filename, format, quality)
 
-    def to_bytes(self, with_background=True, format: str = "PNG") -> bytes:
+    def to_bytes(self, with_background=True, format: str = "PNG", quality: int = -1) -> bytes:
         """
         Convert the image to the specified format (i.e. PNG format) bytes.
 
         :param with_background:  True to save the background together. False not
         :param format: format of the bytes content
+        :param quality: quality of the image (see save())
         :return: bytes in the specified format
         """
         ba = QtCore.QByteArray()
         buffer = QtCore.QBuffer(ba)
         buffer.open(QtCore.QIODevice.ReadWrite)
         img = _prepare_image_for_copy(self, with_background)
-        img.save(buffer, "PNG")
+        img.save(buffer, format, quality)
         buffer.close()
         return ba.data()
 
+    def save_async(self, filename: str, with_background=True, format: str = None, quality: int = -1) -> Future:
+        """
+        Save image to file in the background.
+
+        A snapshot of the image is taken, and it\'s encoded and saved by an encoder thread (Qt releases the GIL
+        while encoding). So the image can be drawn on again at once, and the drawing is not blocked.
+
+        See save() for the parameters.
+
+        :return: a future whose result is the file name. It raises IOError if the file can\'t be saved.
+        """
+        snapshot = _take_snapshot(_prepare_image_for_copy(self, with_background))
+
+        def save_snapshot():
+            if not snapshot.save(filename, format, quality):
+                raise IOError(f"Can't save the image to {filename}!")
+            return filename
+
+        return _get_encoder().submit(save_snapshot)
+
+    def to_bytes_async(self, with_background=True, format: str = "PNG", quality: int = -1) -> Future:
+        """
+        Convert the image to the specified format bytes in the background. See save_async() and to_bytes().
+
+        :return: a future whose result is the bytes. It raises IOError if the image can\'t be converted.
+        """
+        snapshot = _take_snapshot(_prepare_image_for_copy(self, with_background))
+
+        def encode_snapshot():
+            ba = QtCore.QByteArray()
+            buffer = QtCore.QBuffer(ba)
+            buffer.open(QtCore.QIODevice.ReadWrite)
+            if not snapshot.save(buffer, format, quality):
+                raise IOError(f"Can't convert the image to {format}!")
+            buffer.close()
+            return ba.data()
+
+        return _get_encoder().submit(encode_snapshot)
+
     def copy(self,x:int,y:int,width:int,height:int) -> "Image":
         """
         Create an copy of the image.
@@ -1864,7 +2419,15 @@ class Image:
         :return: new copy
         """
         new_image = self._image.copy(x,y,width,height)
-        return Image(new_image)
+        image = Image(new_image, self.is_tracking_background())
+        image._background_color = QtGui.QColor(self._background_color)
+        if self._mask is not None:
+            # the parts outside of the image are background
+            rect = QtCore.QRect(x, y, width, height).intersected(self._image.rect())
+            top, left = rect.top(), rect.left()
+            bottom, right = top + rect.height(), left + rect.width()
+            image._mask_view[top - y:bottom - y, left - x:right - x] = self._mask_view[top:bottom, left:right]
+        return image
 
     def scaled(self,width:int,height:int) -> "Image":
         """
@@ -1874,7 +2437,180 @@ class Image:
         :return: new copy
         """
         new_image =  self._image.scaled(width,height,QtCore.Qt.IgnoreAspectRatio, QtCore.Qt.SmoothTransformation)
-        return Image(new_image)
+        image = Image(new_image, self.is_tracking_background())
+        image._background_color = QtGui.QColor(self._background_color)
+        if self._mask is not None:
+            # not smoothed, so the mask pixels are still either background or drawn
+            mask = self._mask.scaled(width, height, QtCore.Qt.IgnoreAspectRatio, QtCore.Qt.FastTransformation)
+            image._mask_view[:, :] = qn.raw_view(mask.convertToFormat(QtGui.QImage.Format_Grayscale8))
+        return image
+
+    def view(self, x: int, y: int, width: int, height: int) -> "Image":
+        """
+        Create an image which shows the specified area of this image, without copying the pixels.
+
+        The view shares its pixels and background mask with this image: drawings on the view are done on this
+        image, and changes of this image's area are seen by the view. The view has its own drawing settings
+        (color, transforms, etc.), and its coordinates begin at the area's left-top.
+
+        The area must be inside the image. Don't use the view after this image is closed.
+
+        :param x: left of the area
+        :param y: top of the area
+        :param width: width of the area
+        :param height: height of the area
+        :return: the view
+        """
+        rect = QtCore.QRect(x, y, width, height)
+        if rect.isEmpty() or not self._image.rect().contains(rect):
+            raise ValueError("The area must be inside the image!")
+        image_format = self._image.format()
+        depth = self._image.depth()
+        if depth % 8 != 0:
+            raise ValueError("Can't create views of images whose pixels are not byte aligned!")
+        bytes_per_line = self._image.bytesPerLine()
+        address = int(self._image.bits()) + y * bytes_per_line + x * depth // 8
+        qimage = QtGui.QImage(sip.voidptr(address), width, height, bytes_per_line, image_format)
+        image = Image(qimage, False)
+        image._buffer = self._image  # keeps the pixels alive
+        image._parent = self
+        image._parent_offset = QtCore.QPoint(x, y)
+        image._background_color = QtGui.QColor(self._background_color)
+        if self._mask is not None:
+            mask_bytes_per_line = self._mask.bytesPerLine()
+            image._use_mask_buffer(int(self._mask.bits()) + y * mask_bytes_per_line + x, mask_bytes_per_line)
+        return image
+
+    def render_parallel(self, draw_fn: Callable[["Image", QtCore.QRect], None], tiles=(2, 2), workers: int = 2):
+        """
+        Draw the image with several processes.
+
+        The image is split into tiles (columns x rows), and draw_fn(tile_image, tile_rect) is called for each
+        tile. So expensive scenes (e.g. tens of thousands of paths) can use all the CPU cores. PyQt holds the GIL
+        while painting, so the tiles are drawn in worker processes (not threads), on the image's pixels and
+        background mask copied to shared memory. If workers is 1, the tiles are drawn in this process.
+
+        Each tile image has the image's color, fill color, line style/width, fill style/rule, font,
+        composition mode and antialiasing settings, and a transform which maps the image's (pixel) coordinates
+        to the tile. So draw_fn can draw the whole scene on each tile, and the drawings outside of it are clipped.
+        The updated event listeners are notified once, after all the tiles are drawn.
+
+        The worker processes are started with the "spawn" method, so:
+
+        * draw_fn is pickled and sent to them. It must be picklable: a module level function (not a lambda, a nested
+          function or a bound method of an unpicklable object), and it must only draw on the tile image it gets.
+        * each worker process imports the main script again, so its main code must be guarded by
+          ``if __name__ == '__main__':``.
+
+        >>> def draw_map(tile, rect):
+        >>>     for path in load_paths():
+        >>>         if path.controlPointRect().intersects(QtCore.QRectF(rect)):
+        >>>             tile.draw_path(path)
+        >>> image.render_parallel(draw_map, tiles=(4, 4))
+
+        :param draw_fn: the function to draw a tile
+        :param tiles: the number of the tiles in columns and rows
+        :param workers: the number of the worker processes. If it's 1, the tiles are drawn in this process.
+        """
+        self._check_not_recording()
+        columns, rows = tiles
+        if columns <= 0 or rows <= 0:
+            raise ValueError("The tiles must be positive!")
+        width, height = self._image.width(), self._image.height()
+        rects = []
+        for row in range(rows):
+            top, bottom = height * row // rows, height * (row + 1) // rows
+            for col in range(columns):
+                left, right = width * col // columns, width * (col + 1) // columns
+                if right > left and bottom > top:
+                    rects.append(QtCore.QRect(left, top, right - left, bottom - top))
+        try:
+            if workers <= 1:
+                for rect in rects:
+                    tile = self._create_tile_view(rect, self._get_tile_settings())
+                    try:
+                        draw_fn(tile, rect)
+                    finally:
+                        tile.close()
+            else:
+                self._render_tiles_in_processes(draw_fn, rects, workers)
+        finally:
+            self._updated()
+
+    def _render_tiles_in_processes(self, draw_fn, rects, workers: int):
+        from multiprocessing import shared_memory
+        from easygraphics._utils.process_pool import get_executor
+        images = [self._image] if self._mask is None else [self._image, self._mask]
+        blocks = []
+        try:
+            for qimage in images:
+                shm = shared_memory.SharedMemory(create=True, size=qimage.sizeInBytes())
+                blocks.append(shm)
+                np.frombuffer(shm.buf, dtype=np.uint8)[:] = _bytes_view(qimage)
+            layout = (self._image.width(), self._image.height(), int(self._image.format()),
+                      self._image.bytesPerLine(), None if self._mask is None else self._mask.bytesPerLine())
+            names = [shm.name for shm in blocks]
+            executor = get_executor(workers)
+            futures = [executor.submit(_render_tile_in_worker, draw_fn, names, layout, self._get_tile_settings(),
+                                       (rect.x(), rect.y(), rect.width(), rect.height())) for rect in rects]
+            for future in futures:
+                future.result()
+            for qimage, shm in zip(images, blocks):
+                _bytes_view(qimage)[:] = np.frombuffer(shm.buf, dtype=np.uint8)
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+    def _get_tile_settings(self) -> tuple:
+        """ the drawing settings passed to the tiles of render_parallel() (can be pickled) """
+        return (self._color.rgba(), self._fill_color.rgba(), int(self._line_style), self._line_width,
+                int(self._fill_style), int(self._fill_rule), self._background_color.rgba(),
+                self._painter.font().toString(), int(self._painter.compositionMode()),
+                self._painter.testRenderHint(QtGui.QPainter.Antialiasing))
+
+    def _create_tile_view(self, rect: QtCore.QRect, settings: tuple) -> "Image":
+        """ create the view of the area for render_parallel(), with the drawing settings """
+        color, fill_color, line_style, line_width, fill_style, fill_rule, background_color, font, \
+            composition_mode, antialiasing = settings
+        tile = self.view(rect.x(), rect.y(), rect.width(), rect.height())
+        tile._parent = None  # render_parallel() notifies the listeners of the image
+        tile.set_color(QtGui.QColor.fromRgba(color))
+        tile.set_fill_color(QtGui.QColor.fromRgba(fill_color))
+        tile.set_line_style(line_style)
+        tile.set_line_width(line_width)
+        tile.set_fill_style(fill_style)
+        tile.set_fill_rule(fill_rule)
+        tile._background_color = QtGui.QColor.fromRgba(background_color)
+        qfont = QtGui.QFont()
+        qfont.fromString(font)
+        tile.set_font(qfont)
+        tile.set_composition_mode(composition_mode)
+        tile.set_antialiasing(antialiasing)
+        tile.translate(-rect.x(), -rect.y())
+        return tile
+
+    def _use_mask_buffer(self, address: int, bytes_per_line: int):
+        """ use the (Grayscale8) pixels at the address as the background mask """
+        self._mask = QtGui.QImage(sip.voidptr(address), self._image.width(), self._image.height(), bytes_per_line,
+                                  QtGui.QImage.Format_Grayscale8)
+        self._mask_view = qn.raw_view(self._mask)
+        self._mask_painter = QtGui.QPainter()
+        self._init_mask_painter()
+        self._painter_state = None
+
+    def _invalidate_caches(self):
+        """ drop the cached foreground and pixmap, the image may be changed by the painters handed out """
+        image = self
+        while image is not None:
+            image._content_generation += 1
+            image = image._parent
+
+    def _get_content_generation(self):
+        """ a key which changes when the image (or its parent, if it's a view) is changed """
+        if self._parent is None:
+            return self._content_generation
+        return self._content_generation, self._parent._get_content_generation()
 
     def set_rect_mode(self, mode):
         self._rect_mode = mode
@@ -1888,9 +2624,258 @@ class Image:
     def get_ellipse_mode(self):
         return self._ellipse_mode
 
-    def _updated(self):
+    def _updated(self, rect: QtCore.QRect = None):
+        """
+        Notify the listeners that the image is updated.
+
+        :param rect: the updated area (in device coordinates). None means the whole image.
+        """
+        if self._recording is not None:  # nothing is drawn on the image
+            self._recording._add_bounds(rect)
+            return
+        self._content_generation += 1
+        if rect is None:
+            rect = self._image.rect()
+        else:
+            rect = rect.intersected(self._image.rect())
+            if rect.isEmpty():
+                return
+        self._dirty_rect = self._dirty_rect.united(rect)
+        if self._parent is not None:
+            self._parent._updated(rect.translated(self._parent_offset))
+        if self._batch_level > 0:
+            if self._batch_dirty_rect is None:
+                self._batch_dirty_rect = rect
+            else:
+                self._batch_dirty_rect = self._batch_dirty_rect.united(rect)
+            return
         for listener in self._updated_listeners:
             listener()
+        for listener in self._updated_rect_listeners:
+            listener(rect)
+
+    def _updated_logical_rect(self, rect: QtCore.QRectF):
+        """
+        Notify the listeners that the area (in logical coordinates) is drawn by the painter.
+
+        The area is enlarged by the painter's pen width, and mapped to device coordinates.
+        """
+        if not (self._dirty_rect_used or self._updated_rect_listeners) and self._parent is None \
+                and self._recording is None:
+            # nobody uses the exact area (no window and no rect listener), don't compute it
+            self._updated()
+            return
+        p = self._painter
+        pen = p.pen()
+        pad = 1  # for antialiasing and rounding errors
+        rect = rect.normalized()
+        if pen.style() != LineStyle.NO_PEN:
+            # use the whole pen width, because the miter joins may go further than half of it
+            width = max(pen.widthF(), 1)
+            if pen.isCosmetic():
+                pad += math.ceil(width)
+            else:
+                rect.adjust(-width, -width, width, width)
+        device_rect = p.combinedTransform().mapRect(rect).toAlignedRect()
+        self._updated(device_rect.adjusted(-pad, -pad, pad, pad))
+
+    def get_dirty_rect(self) -> QtCore.QRect:
+        """
+        Get the dirty area of the image.
+
+        The dirty area is the bounding rectangle (in device coordinates) of all the things drawn
+        since the last call of take_dirty_rect(). It's used to repaint only the changed area
+        of the graphics window.
+
+        Note that drawings done by the painter returned by get_painter() are not tracked. Call mark_dirty()
+        after them.
+
+        The exact areas are only computed after the dirty rect is read for the first time (or when there are
+        listeners added by add_updated_rect_listener()). Before that, each drawing marks the whole image as dirty.
+
+        :return: the dirty area. It's an empty rect if nothing is drawn.
+        """
+        self._dirty_rect_used = True
+        return QtCore.QRect(self._dirty_rect)
+
+    def take_dirty_rect(self) -> QtCore.QRect:
+        """
+        Get the dirty area of the image, and reset it to empty.
+
+        :return: the dirty area. It's an empty rect if nothing is drawn.
+        """
+        self._dirty_rect_used = True
+        rect = self._dirty_rect
+        self._dirty_rect = QtCore.QRect()
+        return rect
+
+    def mark_dirty(self, rect: QtCore.QRect = None):
+        """
+        Mark the area (in device coordinates) as dirty, and notify the updated event listeners.
+
+        :param rect: the area to be marked. None means the whole image, which will force a full repaint.
+        """
+        self._updated(rect)
+
+    @contextmanager
+    def batch(self):
+        """
+        Draw in a batch.
+
+        The updated event listeners won't be notified for the drawings in the batch. When the batch
+        ends, they are notified only once, with the area containing all the drawings.
+
+        Batches can be nested. Only the outermost batch sends the notification.
+
+        >>> with image.batch():
+        >>>     for i in range(100):
+        >>>         image.draw_line(0, i * 5, 500, i * 5)
+        """
+        self._batch_level += 1
+        try:
+            yield self
+        finally:
+            self._batch_level -= 1
+            if self._batch_level == 0 and self._batch_dirty_rect is not None:
+                rect = self._batch_dirty_rect
+                self._batch_dirty_rect = None
+                self._updated(rect)
+
+    @contextmanager
+    def record_display_list(self):
+        """
+        Record the drawings on the image to a display list.
+
+        It's a context manager which returns the display list. The drawings in the with block are not drawn
+        on the image, but recorded in the display list. Use draw_display_list() (or DisplayList.replay()) to
+        draw them once with a single call.
+
+        The drawings are recorded with the image's current transform, so replaying the display list without
+        a transform gets the same result as drawing them directly. Transforms, fonts and clippings changed in
+        the block only take effect in the recording.
+
+        Functions changing the pixels directly (put_pixel(), flood_fill(), clear(), pixels(), etc.) can't be
+        used when recording.
+
+        >>> with image.record_display_list() as grid:
+        >>>     for i in range(0, 600, 20):
+        >>>         image.draw_line(i, 0, i, 400)
+        >>> image.draw_display_list(grid)
+
+        :return: the display list
+        """
+        if self._recording is not None:
+            raise RuntimeError("The image is already recording a display list!")
+        display_list = DisplayList()
+        painter, mask_painter, flip_y = self._painter, self._mask_painter, self._flip_y
+        self._painter = display_list._begin(display_list._picture, painter, CompositionMode.SOURCE_OVER)
+        self._mask_painter = display_list._begin(display_list._mask_picture, painter, CompositionMode.SOURCE)
+        self._painter.setRenderHints(painter.renderHints())
+        self._painter_state = None
+        self._recording = display_list
+        try:
+            yield display_list
+        finally:
+            self._painter.end()
+            self._mask_painter.end()
+            self._painter, self._mask_painter, self._flip_y = painter, mask_painter, flip_y
+            self._painter_state = None
+            self._recording = None
+
+    def draw_display_list(self, display_list: "DisplayList", transform: QtGui.QTransform = None):
+        """
+        Draw (replay) the display list on the image.
+
+        The image's current transform is not used. The display list is drawn as it was recorded, then transformed
+        by the transform (in device coordinates), so the recorded drawings can be moved, rotated or scaled without
+        recording again.
+
+        :param display_list: the display list to draw
+        :param transform: the transform applied to the display list. None means no transform.
+        """
+        if transform is None:
+            transform = QtGui.QTransform()
+        for p, picture in ((self._painter, display_list._picture), (self._mask_painter, display_list._mask_picture)):
+            p.save()
+            p.setViewTransformEnabled(False)
+            p.setWorldTransform(transform)
+            p.drawPicture(0, 0, picture)
+            p.restore()
+        rect = display_list._bounds
+        if rect is None:  # the area of some recorded drawings is unknown
+            self._updated()
+        elif not rect.isEmpty():
+            self._updated(transform.mapRect(rect).adjusted(-1, -1, 1, 1))
+
+    @contextmanager
+    def pixels(self, x: int = 0, y: int = 0, width: int = -1, height: int = -1, channels: bool = False):
+        """
+        Access the pixels of the image directly as a writable numpy array.
+
+        It's a context manager. The array is a view of the image's buffer (not a copy), so the changes on it
+        are done on the image. When the with block ends, the area is marked as drawn in the background mask,
+        and the updated event listeners are notified only once.
+
+        By default the array's shape is (height, width) and its dtype is uint32. Each element is the
+        pixel's value in the image's format (0xAARRGGBB premultiplied by alpha, for the images created
+        by easygraphics). If channels is True, the array's shape is (height, width, 4) and its dtype is uint8,
+        the channels are in the memory order (B, G, R, A on little endian machines).
+
+        For RGB16 images the dtype is uint16 (and there are 2 bytes per pixel when channels is True), for
+        GRAYSCALE8 images the dtype is uint8 (and there is 1 byte per pixel).
+
+        The coordinates are in pixels of the image, transforms are not used. Don't use the array outside the
+        with block.
+
+        >>> with image.pixels() as arr:
+        >>>     arr[:, :] = 0xff000000 | (np.arange(arr.shape[1], dtype=np.uint32) % 256)
+
+        :param x: left of the area
+        :param y: top of the area
+        :param width: width of the area. -1 means to the right border of the image
+        :param height: height of the area. -1 means to the bottom border of the image
+        :param channels: True to get a (height, width, 4) uint8 array, False to get a (height, width) uint32 array
+        """
+        self._check_not_recording()
+        if width < 0:
+            width = self._image.width() - x
+        if height < 0:
+            height = self._image.height() - y
+        rect = QtCore.QRect(x, y, width, height).intersected(self._image.rect())
+        if channels:
+            view = qn.byte_view(self._image)
+        else:
+            if self._image_view is None:
+                self._image_view = qn.raw_view(self._image)
+            view = self._image_view
+        top, bottom, left, right = rect.top(), rect.top() + rect.height(), rect.left(), rect.left() + rect.width()
+        try:
+            yield view[top:bottom, left:right]
+        finally:
+            if self._mask_view is not None:
+                self._mask_view[top:bottom, left:right] = MASK_BLACK_VALUE
+            self._updated(rect)
+
+    def to_ndarray(self, copy: bool = True, channels: bool = False) -> np.ndarray:
+        """
+        Get the pixels of the image as a numpy array.
+
+        The array has the same layout as the one of pixels(). If copy is False, the array is a read-only view
+        of the image's buffer, so it's changed with the image. Don't use it after the image is closed.
+
+        :param copy: True to get a copy of the pixels, False to get a read-only view
+        :param channels: True to get a (height, width, 4) uint8 array, False to get a (height, width) uint32 array
+        :return: the pixels array
+        """
+        if channels:
+            view = qn.byte_view(self._image)
+        else:
+            view = qn.raw_view(self._image)
+        if copy:
+            return view.copy()
+        view = view.view()
+        view.flags.writeable = False
+        return view
 
     def add_updated_listener(self, listener: Callable[[], None]):
         """
@@ -1911,6 +2896,28 @@ class Image:
         except ValueError:
             pass
 
+    def add_updated_rect_listener(self, listener: Callable[[QtCore.QRect], None]):
+        """
+        Add a listener for updated event, which is called with the updated area.
+
+        The listener is called with the updated area (a QRect in device coordinates) of the image,
+        so QWidget.update can be used as the listener directly.
+
+        :param listener: the listener to add
+        """
+        self._updated_rect_listeners.append(listener)
+
+    def remove_updated_rect_listener(self, listener: Callable[[QtCore.QRect], None]):
+        """
+        Remove a updated event listener added by add_updated_rect_listener().
+
+        :param listener: the listener to remove
+        """
+        try:
+            self._updated_rect_listeners.remove(listener)
+        except ValueError:
+            pass
+
     if _in_ipython:
         def display_in_ipython(self):
             image = self.to_bytes(True)
@@ -1920,39 +2927,914 @@ class Image:
         self.close()
 
     @staticmethod
-    def create(width: int, height: int) -> "Image":
+    def create(width: int, height: int, track_background: bool = True,
+               format=ImageFormat.ARGB32_PREMULTIPLIED) -> "Image":
         """
         Create a new image.
 
+        If track_background is False, the image won't have a background mask. Drawing on it is faster,
+        but set_background_color() and copying/saving it without background can't be used.
+
+        The format is the pixel format of the image (see ImageFormat consts). Opaque formats (RGB32, RGB16,
+        GRAYSCALE8) can't store transparent pixels, but RGB16 and GRAYSCALE8 images use less memory.
+
         :param width: width of the new image
         :param height: height of the new image
+        :param track_background: if the image should track its background
+        :param format: the pixel format of the image
         :return: the created image
         """
-        qimage = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32_Premultiplied)
+        if format not in ImageFormat.Values:
+            raise ValueError("Unsupported image format: {}".format(format))
+        qimage = QtGui.QImage(width, height, format)
         qimage.fill(Color.WHITE)
-        image = Image(qimage)
+        image = Image(qimage, track_background)
         return image
 
     @staticmethod
-    def create_from_file(filename: str) -> "Image":
+    def from_buffer(buffer, width: int, height: int, format=ImageFormat.ARGB32_PREMULTIPLIED,
+                    bytes_per_line: int = None, track_background: bool = True) -> "Image":
         """
-        Load a image from the file.
+        Create an image which uses the (writable) buffer to store its pixels.
 
-        :param filename: the image file
-        :return: the loaded image
+        The buffer can be any object supporting the buffer protocol, such as a bytearray, a numpy array (np.memmap)
+        or the buf of a multiprocessing.shared_memory.SharedMemory. The pixels are not copied: drawings on the image
+        are written to the buffer directly, and changes on the buffer are seen by the image.
+
+        The buffer must be kept unchanged (not resized or released) until the image is closed. The background mask
+        is not stored in the buffer, and the buffer's content is used as it is (all pixels are treated as background).
+
+        :param buffer: the buffer
+        :param width: width of the image
+        :param height: height of the image
+        :param format: the pixel format (QImage.Format) of the buffer
+        :param bytes_per_line: bytes of each line in the buffer. None means the lines are not padded.
+        :param track_background: if the image should track its background
+        :return: the created image
         """
-        p = Path(filename)
-        if not p.exists():
-            raise ValueError(f"File {filename} not exists.")
-        image = QtGui.QImage(filename)
-        return Image(image)
+        array = np.frombuffer(buffer, dtype=np.uint8)
+        if not array.flags.writeable:
+            raise ValueError("The buffer must be writable!")
+        if bytes_per_line is None:
+            bits_per_line = QtGui.QImage.toPixelFormat(format).bitsPerPixel() * width
+            bytes_per_line = (bits_per_line + 7) // 8
+        if array.nbytes < bytes_per_line * height:
+            raise ValueError(f"The buffer is too small ({array.nbytes} bytes) for the image!")
+        qimage = QtGui.QImage(sip.voidptr(array.ctypes.data), width, height, bytes_per_line, format)
+        image = Image(qimage, track_background)
+        image._buffer = array
+        return image
 
+    @staticmethod
+    def create_shared(width: int, height: int, name: str = None, track_background: bool = True) -> "Image":
+        """
+        Create an image whose pixels are stored in a shared memory block (multiprocessing.shared_memory).
 
-def _calc_rect(x1: float, y1: float, x2: float, y2: float, mode) -> QtCore.QRectF:
-    if mode == ShapeMode.RADIUS:
-        p1 = QtCore.QPointF(x1 - x2, y1 - y2)
-        p2 = QtCore.QPointF(x1 + x2, y1 + y2)
-        rect = QtCore.QRectF(p1, p2)
+        If name is None or no block has this name, a new block is created and filled with white. Otherwise the
+        existing block is attached, so several processes can draw on the same image, and read its pixels
+        (with to_ndarray(copy=False) or pixels()) without copying. Use get_shared_name() to get the block's name.
+
+        Each process has its own background mask. The block created by this function is released (unlinked) when
+        the image is closed.
+
+        :param width: width of the image
+        :param height: height of the image
+        :param name: name of the shared memory block
+        :param track_background: if the image should track its background
+        :return: the created image
+        """
+        from multiprocessing import shared_memory
+        size = width * height * 4
+        shm = None
+        if name is not None:
+            try:
+                shm = _attach_shared_memory(name)
+            except FileNotFoundError:
+                pass
+        created = shm is None
+        if created:
+            shm = shared_memory.SharedMemory(name, create=True, size=size)
+            _created_shared_memory.add(shm.name)
+        try:
+            if shm.size < size:
+                raise ValueError(f"The shared memory block {shm.name} is too small ({shm.size} bytes) for the image!")
+            if created:
+                np.frombuffer(shm.buf, dtype=np.uint32, count=width * height)[:] = QtGui.QColor(Color.WHITE).rgba()
+            image = Image.from_buffer(shm.buf, width, height, track_background=track_background)
+        except BaseException:
+            shm.close()
+            if created:
+                _unlink_shared_memory(shm)
+            raise
+        image._shared_memory = shm
+        image._owns_shared_memory = created
+        return image
+
+    def get_shared_name(self) -> str:
+        """
+        Get the name of the shared memory block storing the pixels (see create_shared()).
+
+        :return: the name, or None if the image is not stored in a shared memory block
+        """
+        if self._shared_memory is None:
+            return None
+        return self._shared_memory.name
+
+    @staticmethod
+    def create_from_file(filename: str) -> "Image":
+        """
+        Load a image from the file.
+
+        :param filename: the image file
+        :return: the loaded image
+        """
+        p = Path(filename)
+        if not p.exists():
+            raise ValueError(f"File {filename} not exists.")
+        image = QtGui.QImage(filename)
+        return Image(image)
+
+
+class DisplayList:
+    """
+    Drawings recorded by Image.record_display_list().
+
+    The recorded drawing commands (and the commands to draw the background mask) are kept in QPictures.
+    They can be drawn on any image many times, with Image.draw_display_list() or replay().
+    """
+
+    def __init__(self):
+        self._picture = QtGui.QPicture()
+        self._mask_picture = QtGui.QPicture()
+        # the area (in device coordinates) of the recorded drawings, None if it's unknown. It's tracked like the
+        # dirty rect of an image, because the bounding rects of the QPictures don't include the texts.
+        self._bounds = QtCore.QRect()
+
+    def _add_bounds(self, rect: QtCore.QRect = None):
+        """ add the area of a recorded drawing. None means the area is unknown. """
+        if rect is None:
+            self._bounds = None
+        elif self._bounds is not None:
+            self._bounds = self._bounds.united(rect)
+
+    @staticmethod
+    def _begin(picture: QtGui.QPicture, painter: QtGui.QPainter, composition_mode) -> QtGui.QPainter:
+        """ begin recording on the picture, with the painter's transform, font and clipping """
+        p = QtGui.QPainter()
+        p.begin(picture)
+        p.setCompositionMode(composition_mode)
+        p.setFont(painter.font())
+        if painter.hasClipping():
+            p.setClipRegion(painter.combinedTransform().map(painter.clipRegion()))
+        p.setTransform(painter.combinedTransform())
+        return p
+
+    def replay(self, image: Image, transform: QtGui.QTransform = None):
+        """
+        Draw the display list on the image.
+
+        See Image.draw_display_list().
+
+        :param image: the image to draw on
+        :param transform: the transform applied to the display list. None means no transform.
+        """
+        image.draw_display_list(self, transform)
+
+    def get_bounding_rect(self) -> QtCore.QRect:
+        """
+        Get the bounding rect (in device coordinates, without transform) of the recorded drawings.
+
+        :return: the bounding rect
+        """
+        if self._bounds is None:
+            return self._picture.boundingRect().united(self._mask_picture.boundingRect())
+        return QtCore.QRect(self._bounds)
+
+    def is_empty(self) -> bool:
+        """
+        Test if nothing is recorded.
+
+        :return: True if nothing is recorded, False if not
+        """
+        return self._picture.isNull()
+
+
+class TiledImage:
+    """
+    A (very large) image whose surface is split into tiles.
+
+    Each tile is an Image, which is created only when something is drawn on it. So a huge poster or map
+    only uses the memory of the areas really drawn.
+
+    It has the same drawing API as Image (draw_line(), fill_rect(), draw_text(), draw_image(), set_color(),
+    translate(), ...). Each drawing is recorded to a display list (see Image.record_display_list()), and replayed
+    only on the tiles its bounding rect touches. It can be used as the target image of the module level
+    drawing functions (see set_target()).
+
+    Functions which need the whole image buffer (get_image(), pixels(), flood_fill(), view port and window
+    functions, etc.) are not supported. Use copy() to get a part of the image as an Image.
+    """
+
+    def __init__(self, width: int, height: int, tile_size: int = 1024, track_background: bool = True):
+        self._width = width
+        self._height = height
+        self._tile_size = tile_size
+        self._track_background = track_background
+        self._tiles = {}
+        # the proxy keeps the drawing settings, its drawings are recorded and replayed on the tiles
+        proxy_image = QtGui.QImage(1, 1, QtGui.QImage.Format_ARGB32_Premultiplied)
+        self._proxy = Image(proxy_image, False)
+        self._background_color = _to_qcolor(Color.WHITE)
+
+    def __getattr__(self, name):
+        if name in _TILED_DRAWING_METHODS:
+            return lambda *args, **kwargs: self._draw(name, *args, **kwargs)
+        if name in _TILED_SETTING_METHODS:
+            return getattr(self._proxy, name)
+        raise AttributeError(f"'TiledImage' object has no attribute '{name}'")
+
+    def _draw(self, method_name: str, *args, **kwargs):
+        with self._proxy.record_display_list() as display_list:
+            result = getattr(self._proxy, method_name)(*args, **kwargs)
+        rect = display_list._bounds
+        if rect is None:  # the area of the drawing is unknown, replay it on all the tiles
+            rect = QtCore.QRect(0, 0, self._width, self._height)
+        else:
+            rect = rect.adjusted(-1, -1, 1, 1)
+        for (col, row) in self._tiles_in(rect, True):
+            transform = QtGui.QTransform.fromTranslate(-col * self._tile_size, -row * self._tile_size)
+            self._tiles[col, row].draw_display_list(display_list, transform)
+        return result
+
+    def _tiles_in(self, rect: QtCore.QRect, allocate: bool = False):
+        """ get (col, row) of the tiles which the rect touches """
+        rect = rect.intersected(QtCore.QRect(0, 0, self._width, self._height))
+        if rect.isEmpty():
+            return []
+        size = self._tile_size
+        tiles = [(col, row)
+                 for row in range(rect.top() // size, rect.bottom() // size + 1)
+                 for col in range(rect.left() // size, rect.right() // size + 1)]
+        if allocate:
+            for col, row in tiles:
+                self._get_tile(col, row)
+            return tiles
+        return [tile for tile in tiles if tile in self._tiles]
+
+    def _get_tile(self, col: int, row: int) -> Image:
+        tile = self._tiles.get((col, row))
+        if tile is None:
+            size = self._tile_size
+            width = min(size, self._width - col * size)
+            height = min(size, self._height - row * size)
+            qimage = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32_Premultiplied)
+            qimage.fill(self._background_color)
+            tile = Image(qimage, self._track_background)
+            tile._background_color = self._background_color
+            tile.set_antialiasing(self._proxy._painter.testRenderHint(QtGui.QPainter.Antialiasing))
+            self._tiles[col, row] = tile
+        return tile
+
+    def get_width(self) -> int:
+        """
+        Get the width of the image.
+
+        :return: image width
+        """
+        return self._width
+
+    def get_height(self) -> int:
+        """
+        Get the height of the image.
+
+        :return: image height
+        """
+        return self._height
+
+    def get_tile_size(self) -> int:
+        """
+        Get the size (width and height) of the tiles.
+
+        :return: tile size
+        """
+        return self._tile_size
+
+    def get_allocated_tile_count(self) -> int:
+        """
+        Get how many tiles are created (drawn).
+
+        :return: count of the created tiles
+        """
+        return len(self._tiles)
+
+    def is_tracking_background(self) -> bool:
+        """
+        Test if the image tracks its background (has a background mask).
+
+        :return: True if the image tracks its background, False if not
+        """
+        return self._track_background
+
+    def get_background_color(self):
+        """
+        Get the background color of the image.
+
+        :return: background color
+        """
+        return QtGui.QColor(self._background_color)
+
+    def set_background_color(self, background_color):
+        """
+        Set and change the background color.
+
+        :param background_color: background color
+        """
+        if not self._track_background:
+            raise RuntimeError("The image doesn't track its background (created with track_background=False)!")
+        background_color = _to_qcolor(background_color)
+        self._background_color = background_color
+        for tile in self._tiles.values():
+            tile.set_background_color(background_color)
+
+    def clear(self):
+        """
+        Clear the image to show the background. All the tiles are released.
+        """
+        for tile in self._tiles.values():
+            tile.close()
+        self._tiles.clear()
+
+    def fill_image(self, color):
+        """
+        Fill the whole image with the specified color.
+
+        Note that all the tiles are created.
+
+        :param color: the fill color
+        """
+        self._proxy.save_settings()
+        self._proxy.reset_transform()
+        self._proxy.set_rect_mode(ShapeMode.CORNER)
+        self._proxy.set_fill_color(color)
+        self._draw("fill_rect", -1, -1, self._width + 2, self._height + 2)
+        self._proxy.restore_settings()
+
+    def get_pixel(self, x: int, y: int) -> QtGui.QColor:
+        """
+        Get a pixel's color.
+
+        :param x: x coordinate value of the pixel
+        :param y: y coordinate value of the pixel
+        :return: color of the pixel
+        """
+        size = self._tile_size
+        tile = self._tiles.get((x // size, y // size))
+        if tile is None:
+            return QtGui.QColor(self._background_color)
+        return tile.get_pixel(x % size, y % size)
+
+    def put_pixel(self, x: int, y: int, color):
+        """
+        Set a pixel's color.
+
+        :param x: x coordinate value of the pixel
+        :param y: y coordinate value of the pixel
+        :param color: the color
+        """
+        if not (0 <= x < self._width and 0 <= y < self._height):
+            return
+        size = self._tile_size
+        self._get_tile(x // size, y // size).put_pixel(x % size, y % size, color)
+
+    def copy(self, x: int, y: int, width: int, height: int) -> Image:
+        """
+        Create an copy of the part of the image. Only the tiles in the part are used.
+
+        :param x: left-top of the copied area
+        :param y: left-top of the copied area
+        :param width: width of the copy area
+        :param height:  height of the copy area
+        :return: new copy (an Image)
+        """
+        qimage = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32_Premultiplied)
+        qimage.fill(self._background_color)
+        new_image = Image(qimage, self._track_background)
+        new_image._background_color = self._background_color
+        image_view = qn.raw_view(qimage)
+        area = QtCore.QRect(x, y, width, height)
+        size = self._tile_size
+        for col, row in self._tiles_in(area):
+            tile = self._tiles[col, row]
+            tile_rect = QtCore.QRect(col * size, row * size, tile.get_width(), tile.get_height())
+            part = tile_rect.intersected(area)
+            src = np.s_[part.top() - tile_rect.top():part.bottom() + 1 - tile_rect.top(),
+                        part.left() - tile_rect.left():part.right() + 1 - tile_rect.left()]
+            dst = np.s_[part.top() - y:part.bottom() + 1 - y, part.left() - x:part.right() + 1 - x]
+            image_view[dst] = qn.raw_view(tile.get_image())[src]
+            if self._track_background:
+                new_image._mask_view[dst] = tile._mask_view[src]
+        new_image.mark_dirty()
+        return new_image
+
+    def save(self, filename: str, with_background=True):
+        """
+        Save image to file.
+
+        PNG files are written band by band (a row of tiles at a time), so the whole image is never in the memory.
+        Other formats are saved by copying the whole image first.
+
+        :param filename: path of the file
+        :param with_background: True to save the background together. False not
+        """
+        if Path(filename).suffix.lower() != ".png":
+            image = self.copy(0, 0, self._width, self._height)
+            image.save(filename, with_background)
+            image.close()
+            return
+        with open(filename, "wb") as f:
+            _write_png(f, self._width, self._height, self._iter_bands(with_background))
+
+    def _iter_bands(self, with_background: bool):
+        """ yield the rows of the image as (rows, width, 4) RGBA uint8 arrays, a row of tiles at a time """
+        size = self._tile_size
+        for row in range((self._height + size - 1) // size):
+            band_height = min(size, self._height - row * size)
+            band = QtGui.QImage(self._width, band_height, QtGui.QImage.Format_ARGB32_Premultiplied)
+            band.fill(self._background_color if with_background else Color.TRANSPARENT)
+            painter = QtGui.QPainter()
+            painter.begin(band)
+            painter.setCompositionMode(CompositionMode.SOURCE)
+            for col in range((self._width + size - 1) // size):
+                tile = self._tiles.get((col, row))
+                if tile is not None:
+                    painter.drawImage(col * size, 0, _prepare_image_for_copy(tile, with_background))
+            painter.end()
+            band = band.convertToFormat(QtGui.QImage.Format_RGBA8888)
+            yield qn.byte_view(band)
+
+    def close(self):
+        """
+        Close the image and release all the tiles.
+        """
+        self.clear()
+        self._proxy.close()
+
+
+class ImagePool:
+    """
+    A pool of reusable images.
+
+    Creating an image allocates its pixels and mask, and starts two painters. If temporary images of the same
+    size are created and closed again and again (e.g. in each frame), acquire them from a pool and release
+    them back when they are not used anymore.
+
+    A released image is kept idle in the pool, and is reset (cleared to white, with the default drawing settings
+    and a clean background mask) when it's acquired again. If the idle images use more memory than max_bytes,
+    the least recently released ones are closed.
+
+    >>> pool = ImagePool()
+    >>> image = pool.acquire(800, 600)
+    >>> image.draw_line(0, 0, 100, 100)
+    >>> pool.release(image)
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Create a pool.
+
+        :param max_bytes: max memory (in bytes) used by the idle images in the pool
+        """
+        self._max_bytes = max_bytes
+        self._idle = []  # least recently released first
+        self._idle_bytes = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, width: int, height: int, track_background: bool = True,
+                format=ImageFormat.ARGB32_PREMULTIPLIED) -> Image:
+        """
+        Get an image from the pool, or create a new one if there is no idle image of this size and format.
+
+        :param width: width of the image
+        :param height: height of the image
+        :param track_background: if the image should track its background
+        :param format: the pixel format of the image
+        :return: the image
+        """
+        key = (width, height, track_background, format)
+        with self._lock:
+            for i in range(len(self._idle) - 1, -1, -1):
+                if _pool_key(self._idle[i]) == key:
+                    image = self._idle.pop(i)
+                    self._idle_bytes -= _image_bytes(image)
+                    break
+            else:
+                image = None
+        if image is None:
+            return Image.create(width, height, track_background, format)
+        image._recycle()
+        return image
+
+    def release(self, image: Image):
+        """
+        Put the image back to the pool. Don't use the image after it's released.
+
+        Images which can't be reused (closed images, views, and images using external buffers) are closed.
+
+        :param image: the image
+        """
+        if image._painter is None:  # closed
+            return
+        image._check_not_recording()
+        if image._buffer is not None or image._shared_memory is not None:
+            image.close()
+            return
+        size = _image_bytes(image)
+        evicted = []
+        with self._lock:
+            if any(idle is image for idle in self._idle):
+                return
+            self._idle.append(image)
+            self._idle_bytes += size
+            while self._idle_bytes > self._max_bytes:
+                evicted_image = self._idle.pop(0)
+                self._idle_bytes -= _image_bytes(evicted_image)
+                evicted.append(evicted_image)
+        for evicted_image in evicted:
+            evicted_image.close()
+
+    def clear(self):
+        """
+        Close all the idle images in the pool.
+        """
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+            self._idle_bytes = 0
+        for image in idle:
+            image.close()
+
+    def get_max_bytes(self) -> int:
+        """
+        Get the max memory (in bytes) used by the idle images in the pool.
+
+        :return: the max memory
+        """
+        return self._max_bytes
+
+    def set_max_bytes(self, max_bytes: int):
+        """
+        Set the max memory (in bytes) used by the idle images in the pool.
+
+        The least recently released images are closed if the idle images use more memory.
+
+        :param max_bytes: the max memory
+        """
+        with self._lock:
+            self._max_bytes = max_bytes
+            evicted = []
+            while self._idle_bytes > self._max_bytes:
+                image = self._idle.pop(0)
+                self._idle_bytes -= _image_bytes(image)
+                evicted.append(image)
+        for image in evicted:
+            image.close()
+
+    def get_idle_bytes(self) -> int:
+        """
+        Get the memory (in bytes) used by the idle images in the pool.
+
+        :return: the memory used
+        """
+        return self._idle_bytes
+
+    def get_idle_count(self) -> int:
+        """
+        Get the number of the idle images in the pool.
+
+        :return: the number of the idle images
+        """
+        return len(self._idle)
+
+
+
+class TextLayoutCache:
+    """
+    A LRU cache of the text layouts used by draw_text() and draw_rect_text().
+
+    Laying out a text is much slower than drawing it. The layouts (QStaticText objects and bounding rectangles)
+    of the recently drawn texts are kept in the cache, keyed by the text, the font, and the flags and size of the
+    rectangle, so labels and counters drawn again in each frame are only laid out once.
+
+    All images share one cache, see get_text_layout_cache().
+    """
+
+    def __init__(self, max_size: int = 512):
+        """
+        Create a cache.
+
+        :param max_size: max number of the layouts in the cache
+        """
+        self._max_size = max_size
+        self._layouts = OrderedDict()  # least recently used first
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Get the layout of the key.
+
+        :param key: the key
+        :return: the layout, or None if it's not in the cache
+        """
+        with self._lock:
+            layout = self._layouts.get(key)
+            if layout is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._layouts.move_to_end(key)
+            return layout
+
+    def put(self, key, layout):
+        """
+        Put the layout in the cache.
+
+        The least recently used layouts are removed if there are more than max size layouts.
+
+        :param key: the key
+        :param layout: the layout
+        """
+        with self._lock:
+            self._layouts[key] = layout
+            while len(self._layouts) > self._max_size:
+                self._layouts.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all the layouts in the cache, and reset the hit and miss counts.
+        """
+        with self._lock:
+            self._layouts.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def get_hits(self) -> int:
+        """
+        Get the number of the texts whose layouts were found in the cache.
+
+        :return: the number of the hits
+        """
+        return self._hits
+
+    def get_misses(self) -> int:
+        """
+        Get the number of the texts which were laid out because they were not in the cache.
+
+        :return: the number of the misses
+        """
+        return self._misses
+
+    def get_size(self) -> int:
+        """
+        Get the number of the layouts in the cache.
+
+        :return: the number of the layouts
+        """
+        return len(self._layouts)
+
+    def get_max_size(self) -> int:
+        """
+        Get the max number of the layouts in the cache.
+
+        :return: the max size
+        """
+        return self._max_size
+
+    def set_max_size(self, max_size: int):
+        """
+        Set the max number of the layouts in the cache.
+
+        :param max_size: the max size
+        """
+        with self._lock:
+            self._max_size = max_size
+            while len(self._layouts) > self._max_size:
+                self._layouts.popitem(last=False)
+
+
+_text_layout_cache = TextLayoutCache()
+
+
+class _GlyphAtlas:
+    """
+    The glyphs of a font, each drawn in a cell of an image, used by Image.draw_text_grid().
+
+    The glyphs are white with transparent background. They are tinted to the drawing colors with numpy, and
+    the tinted pixmaps are cached.
+    """
+    Columns = 64  # number of the cells in a row of the atlas
+    MaxPixmaps = 32  # max number of the (colors of the) cached pixmaps
+
+    def __init__(self, font: QtGui.QFont, dpi: int, cell_width: int, cell_height: int):
+        self._font = QtGui.QFont(font)
+        self._dpi = dpi
+        self._cell_width = cell_width
+        self._cell_height = cell_height
+        self._slots = {}  # code point -> index of its cell
+        self._coverage = None  # alpha values of the glyphs
+        self._pixmaps = OrderedDict()  # rgba -> tinted pixmap, least recently used first
+        self._mask_pixmap = None
+        self._add_glyphs(range(33, 127))
+
+    def get_slots(self, codes: np.ndarray) -> np.ndarray:
+        """ get the cell indices of the code points, the glyphs not in the atlas are added """
+        uniques, inverse = np.unique(codes, return_inverse=True)
+        uniques = uniques.tolist()
+        new_codes = [code for code in uniques if code not in self._slots]
+        if new_codes:
+            self._add_glyphs(new_codes)
+        return np.array([self._slots[code] for code in uniques], dtype=np.int64)[inverse.reshape(-1)]
+
+    def get_pixmap(self, rgba: int) -> QtGui.QPixmap:
+        """ get the glyphs drawn with the color """
+        pixmap = self._pixmaps.get(rgba)
+        if pixmap is None:
+            premultiplied = QtGui.qPremultiply(rgba)
+            coverage = self._coverage.astype(np.uint32)
+            pixels = np.zeros(coverage.shape, dtype=np.uint32)
+            for shift in (0, 8, 16, 24):
+                channel = (premultiplied >> shift) & 0xff
+                pixels |= ((coverage * channel + 127) // 255) << shift
+            pixmap = QtGui.QPixmap.fromImage(_image_from_pixels(pixels))
+            self._pixmaps[rgba] = pixmap
+            if len(self._pixmaps) > _GlyphAtlas.MaxPixmaps:
+                self._pixmaps.popitem(last=False)
+        else:
+            self._pixmaps.move_to_end(rgba)
+        return pixmap
+
+    def get_mask_pixmap(self) -> QtGui.QPixmap:
+        """ get the glyphs drawn with the mask's black (opaque wherever the glyphs cover) """
+        if self._mask_pixmap is None:
+            pixels = np.where(self._coverage > 0, np.uint32(0xff000000), np.uint32(0))
+            self._mask_pixmap = QtGui.QPixmap.fromImage(_image_from_pixels(pixels))
+        return self._mask_pixmap
+
+    def _add_glyphs(self, codes):
+        for code in codes:
+            self._slots[code] = len(self._slots)
+        count = len(self._slots)
+        columns = min(count, _GlyphAtlas.Columns)
+        rows = (count + _GlyphAtlas.Columns - 1) // _GlyphAtlas.Columns
+        image = QtGui.QImage(columns * self._cell_width, rows * self._cell_height,
+                             QtGui.QImage.Format_ARGB32_Premultiplied)
+        dots_per_meter = round(self._dpi / 0.0254)
+        image.setDotsPerMeterX(dots_per_meter)
+        image.setDotsPerMeterY(dots_per_meter)
+        image.fill(Color.TRANSPARENT)
+        painter = QtGui.QPainter(image)
+        painter.setRenderHint(QtGui.QPainter.TextAntialiasing)
+        painter.setFont(self._font)
+        painter.setPen(QtGui.QColor(Color.WHITE))
+        ascent = painter.fontMetrics().ascent()
+        for code, slot in self._slots.items():
+            left = slot % _GlyphAtlas.Columns * self._cell_width
+            top = slot // _GlyphAtlas.Columns * self._cell_height
+            painter.setClipRect(left, top, self._cell_width, self._cell_height)
+            painter.drawText(left, top + ascent, chr(code))
+        painter.end()
+        self._coverage = qn.alpha_view(image).copy()
+        self._pixmaps.clear()
+        self._mask_pixmap = None
+
+
+_glyph_atlases = OrderedDict()  # (font key, dpi, cell width, cell height) -> atlas, least recently used first
+_glyph_atlas_lock = threading.Lock()
+_MAX_GLYPH_ATLASES = 8
+
+
+def _get_glyph_atlas(font: QtGui.QFont, dpi: int, cell_width: int, cell_height: int) -> _GlyphAtlas:
+    """ get the (cached) glyph atlas of the font. _glyph_atlas_lock should be held. """
+    key = (font.key(), dpi, cell_width, cell_height)
+    atlas = _glyph_atlases.get(key)
+    if atlas is None:
+        atlas = _GlyphAtlas(font, dpi, cell_width, cell_height)
+        _glyph_atlases[key] = atlas
+        if len(_glyph_atlases) > _MAX_GLYPH_ATLASES:
+            _glyph_atlases.popitem(last=False)
+    else:
+        _glyph_atlases.move_to_end(key)
+    return atlas
+
+
+def _image_from_pixels(pixels: np.ndarray) -> QtGui.QImage:
+    """ create a Format_ARGB32_Premultiplied image from the (height, width) uint32 pixel values """
+    image = QtGui.QImage(pixels.shape[1], pixels.shape[0], QtGui.QImage.Format_ARGB32_Premultiplied)
+    qn.raw_view(image)[:] = pixels
+    return image
+
+def _create_static_text(msg: str) -> QtGui.QStaticText:
+    static_text = QtGui.QStaticText(msg)
+    static_text.setTextFormat(QtCore.Qt.PlainText)
+    return static_text
+
+# Image methods which draw on the image, they are recorded and replayed on the tiles by TiledImage
+_TILED_DRAWING_METHODS = {
+    'draw_point', 'draw_points', 'draw_line', 'line', 'line_to', 'line_rel', 'ellipse', 'draw_ellipse',
+    'fill_ellipse', 'fill_circles', 'draw_arc', 'arc', 'pie', 'draw_pie', 'fill_pie', 'chord', 'draw_chord',
+    'fill_chord', 'draw_bezier', 'bezier', 'draw_curve', 'curve', 'draw_quadratic', 'quadratic', 'draw_lines',
+    'lines', 'draw_poly_line', 'poly_line', 'polygon', 'draw_polygon', 'fill_polygon', 'path', 'draw_path',
+    'fill_path', 'rect', 'draw_rect', 'fill_rect', 'fill_rects', 'rounded_rect', 'draw_rounded_rect',
+    'fill_rounded_rect', 'draw_image', 'draw_sprites', 'draw_text', 'draw_rect_text', 'draw_text_grid', 'curve_vertex',
+    'vertex',
+    'bezier_vertex', 'quadratic_vertex', 'end_shape', 'draw_display_list',
+}
+
+# Image methods which only use or change the drawing settings, TiledImage calls them directly
+_TILED_SETTING_METHODS = {
+    'set_antialiasing', 'get_pen', 'set_pen', 'get_brush', 'set_brush', 'get_color', 'set_color',
+    'get_fill_color', 'set_fill_color', 'set_fill_rule', 'get_fill_rule', 'get_line_style', 'set_line_style',
+    'get_line_width', 'set_line_width', 'get_fill_style', 'set_fill_style', 'set_clip_rect', 'set_clipping',
+    'translate', 'rotate', 'scale', 'shear', 'skew', 'reflect', 'flip', 'mirror', 'set_flip_y', 'get_transform',
+    'set_transform', 'push_transform', 'pop_transform', 'reset_transform', 'set_composition_mode',
+    'get_composition_mode', 'move_to', 'move_rel', 'get_x', 'get_y', 'begin_shape', 'set_font', 'get_font',
+    'set_font_size', 'get_font_size', 'text_width', 'text_height', 'save_settings', 'restore_settings',
+    'set_rect_mode', 'get_rect_mode', 'set_ellipse_mode', 'get_ellipse_mode',
+}
+
+
+def _write_png(file, width: int, height: int, bands):
+    """
+    Write a (RGBA, 8 bit) png file, whose rows are given band by band, so the whole image is not needed.
+
+    :param file: the binary file to write
+    :param width: width of the image
+    :param height: height of the image
+    :param bands: iterable of (rows, width, 4) uint8 arrays
+    """
+
+    def write_chunk(tag: bytes, data: bytes):
+        file.write(struct.pack(">I", len(data)))
+        file.write(tag)
+        file.write(data)
+        file.write(struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff))
+
+    file.write(b"\x89PNG\r\n\x1a\n")
+    write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+    compressor = zlib.compressobj()
+    for band in bands:
+        data = compressor.compress(_filter_png_rows(band))
+        if data:
+            write_chunk(b"IDAT", data)
+    write_chunk(b"IDAT", compressor.flush())
+    write_chunk(b"IEND", b"")
+
+
+def _filter_png_rows(band: np.ndarray) -> bytes:
+    """
+    Get the filtered png rows (to be compressed) of the pixels.
+
+    :param band: (rows, width, 4) uint8 array of RGBA pixels
+    :return: the rows, each begins with the filter type
+    """
+    pixels = band.reshape(band.shape[0], -1)
+    rows = np.empty((pixels.shape[0], pixels.shape[1] + 1), dtype=np.uint8)
+    rows[:, 0] = 1  # the "sub" filter: store the difference with the left pixel
+    rows[:, 1:5] = pixels[:, :4]
+    np.subtract(pixels[:, 4:], pixels[:, :-4], out=rows[:, 5:])
+    return rows.tobytes()
+
+
+_encoder = None
+_encoder_lock = threading.Lock()
+_created_shared_memory = set()  # names of the shared memory blocks created (and not unlinked yet) by this process
+
+
+def _take_snapshot(image: QtGui.QImage) -> QtGui.QImage:
+    """
+    Get a snapshot of the image, which won't be changed by the later drawings.
+
+    Copying an image which is being painted makes a deep copy (the painter writes to the buffer directly).
+    Other images are shared until one of them is changed (copy on write).
+    """
+    return QtGui.QImage(image)
+
+
+def _get_encoder() -> ThreadPoolExecutor:
+    """ the thread pool used by Image.save_async() and Image.to_bytes_async() """
+    global _encoder
+    with _encoder_lock:
+        if _encoder is None:
+            _encoder = ThreadPoolExecutor(max_workers=2, thread_name_prefix="easygraphics-encoder")
+        return _encoder
+
+
+def _calc_rect(x1: float, y1: float, x2: float, y2: float, mode) -> QtCore.QRectF:
+    if mode == ShapeMode.RADIUS:
+        p1 = QtCore.QPointF(x1 - x2, y1 - y2)
+        p2 = QtCore.QPointF(x1 + x2, y1 + y2)
+        rect = QtCore.QRectF(p1, p2)
     elif mode == ShapeMode.CENTER:
         p1 = QtCore.QPointF(x1 - x2 / 2, y1 - y2 / 2)
         p2 = QtCore.QPointF(x1 + x2 / 2, y1 + y2 / 2)
@@ -1966,33 +3848,295 @@ def _calc_rect(x1: float, y1: float, x2: float, y2: float, mode) -> QtCore.QRect
     return rect
 
 
-def _to_qcolor(val: Union[int, str, QtGui.QColor]) -> Union[QtGui.QColor, int]:
-    if isinstance(val, type(QtGui.QColor)):
-        color = val
+class _NullPainter:
+    """
+    A painter which paints nothing.
+
+    It's used as the mask painter of the images which don't track their background. Only the QPainter methods
+    used on the mask painter are provided.
+    """
+
+    def isActive(self) -> bool:
+        return False
+
+    def brush(self) -> QtGui.QBrush:
+        return QtGui.QBrush()
+
+    def _do_nothing(self, *args, **kwargs):
+        pass
+
+    drawArc = drawChord = drawEllipse = drawLine = drawLines = drawPath = drawPicture = drawPie = \
+        drawPixmapFragments = drawPoint = drawPoints = drawPolygon = drawPolyline = drawRect = drawRects = \
+        drawRoundedRect = drawStaticText = drawText = fillPath = fillRect = _do_nothing
+    setBrush = setClipping = setClipRect = setCompositionMode = setFont = setPen = setTransform = \
+        setViewport = setViewTransformEnabled = setWindow = setWorldTransform = _do_nothing
+    resetTransform = rotate = scale = shear = translate = save = restore = end = _do_nothing
+
+
+def _calc_rects(rects: np.ndarray, mode) -> np.ndarray:
+    """ vectorized version of _calc_rect(), returns a Nx4 array of (left, top, width, height) """
+    x1, y1, x2, y2 = rects.T
+    if mode == ShapeMode.RADIUS:
+        return np.column_stack((x1 - x2, y1 - y2, 2 * x2, 2 * y2))
+    elif mode == ShapeMode.CENTER:
+        return np.column_stack((x1 - x2 / 2, y1 - y2 / 2, x2, y2))
+    elif mode == ShapeMode.CORNER:
+        return rects
+    else:
+        return np.column_stack((x1, y1, x2 - x1, y2 - y1))
+
+
+def _to_coords_array(values, columns: int) -> np.ndarray:
+    """ convert values to a contiguous float64 array with the specified column count"""
+    return np.ascontiguousarray(values, dtype=np.float64).reshape(-1, columns)
+
+
+def _to_qpolygonf(points: np.ndarray) -> QtGui.QPolygonF:
+    """
+    Convert a Nx2 float64 array to QPolygonF.
+
+    The coordinates are copied directly into the polygon's buffer, without creating any QPointF object.
+    """
+    n = len(points)
+    polygon = QtGui.QPolygonF(n)
+    buffer = polygon.data()
+    buffer.setsize(n * 2 * 8)  # QPointF is 2 qreals (doubles)
+    np.frombuffer(buffer, dtype=np.float64).reshape(n, 2)[:] = points
+    return polygon
+
+
+def _to_rgba_array(colors, n: int) -> np.ndarray:
+    """ convert a color, a color list or an ARGB ndarray to a uint32 array of length n"""
+    if isinstance(colors, np.ndarray) and colors.dtype.kind in 'ui':
+        rgbas = colors.astype(np.uint32).reshape(-1)
+    elif isinstance(colors, (list, tuple, np.ndarray)):
+        rgbas = np.array([_to_qcolor(color).rgba() for color in colors], dtype=np.uint32)
     else:
-        color = QtGui.QColor(val)
-    return color
+        rgbas = np.array([_to_qcolor(colors).rgba()], dtype=np.uint32)
+    return np.broadcast_to(rgbas, (n,))
+
+
+def _create_pixmap_fragments(rects: np.ndarray, positions: np.ndarray, scales: np.ndarray = None, rotations=None,
+                             opacities=None) -> tuple:
+    """
+    Create the PixmapFragment array used by QPainter.drawPixmapFragments().
+
+    :param rects: Nx4 array of the source rects
+    :param positions: Nx2 array of the top-left points of the targets
+    :param scales: Nx2 array of the scale factors. None means no scale.
+    :param rotations: rotation angles of the fragments. None means no rotation.
+    :param opacities: opacities of the fragments. None means fully opaque.
+    :return: the fragments, and the (N x 10) float64 array view of them
+    """
+    n = len(positions)
+    fragments = sip.array(QtGui.QPainter.PixmapFragment, n)
+    # PixmapFragment is a struct of 10 doubles:
+    # x, y (center of the target), sourceLeft, sourceTop, width, height, scaleX, scaleY, rotation, opacity
+    data = np.frombuffer(memoryview(fragments), dtype=np.float64).reshape(n, 10)
+    sizes = rects[:, 2:] if scales is None else rects[:, 2:] * scales
+    data[:, 0:2] = positions + sizes / 2
+    data[:, 2:6] = rects
+    data[:, 6:8] = 1 if scales is None else scales
+    data[:, 8] = 0 if rotations is None else rotations
+    data[:, 9] = 1 if opacities is None else opacities
+    return fragments, data
+
+
+def _to_pixel_value(color: QtGui.QColor, image_format=QtGui.QImage.Format_ARGB32_Premultiplied) -> int:
+    """ convert the color to the pixel value stored in images of the specified format """
+    if image_format == QtGui.QImage.Format_ARGB32_Premultiplied:
+        return QtGui.qPremultiply(color.rgba())
+    if image_format == QtGui.QImage.Format_ARGB32:
+        return color.rgba()
+    pixel = QtGui.QImage(1, 1, image_format)
+    pixel.fill(color)
+    return int(qn.raw_view(pixel)[0, 0])
+
+
+def _color_channels(view: np.ndarray, image_format) -> np.ndarray:
+    """ split the pixel values in the view into color channels (a (..., channel count) int16 array) """
+    if image_format == QtGui.QImage.Format_RGB16:
+        view = view.astype(np.int32)
+        return np.stack((((view >> 11) & 0x1f) << 3, ((view >> 5) & 0x3f) << 2, (view & 0x1f) << 3), axis=-1)
+    return view.view(np.uint8).reshape(view.shape + (view.dtype.itemsize,)).astype(np.int16)
+
+
+def _same_color(view: np.ndarray, pixel_value: int, tolerance: int,
+                image_format=QtGui.QImage.Format_ARGB32_Premultiplied) -> np.ndarray:
+    """
+    Test if the pixels in the view have the same color with the pixel value.
+
+    :return: a boolean array
+    """
+    if tolerance <= 0:
+        return view == pixel_value
+    channels = _color_channels(view, image_format)
+    value_channels = _color_channels(np.array([pixel_value], dtype=view.dtype), image_format)
+    return np.abs(channels - value_channels).max(axis=-1) <= tolerance
+
+
+def _span_fill(fillable: np.ndarray, seed_x: int, seed_y: int):
+    """
+    Find the 4-connected area of the fillable pixels containing the seed, using scan line spans.
+
+    Each row of the fillable array is split into spans (runs of fillable pixels), then we walk from the seed's
+    span to the overlapping spans in the rows above and below. So the python loop runs once per span,
+    instead of once per pixel.
+
+    :param fillable: 2D boolean array
+    :param seed_x: x of the seed
+    :param seed_y: y of the seed
+    :return: the boolean array of the area and its bounding rect, or (None, None) if the seed is not fillable
+    """
+    if not fillable[seed_y, seed_x]:
+        return None, None
+    height, width = fillable.shape
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = fillable
+    edges = np.diff(padded, axis=1)
+    span_ys, span_starts = np.nonzero(edges == 1)
+    span_ends = np.nonzero(edges == -1)[1]  # exclusive
+    row_first_span = np.searchsorted(span_ys, np.arange(height + 1))
+    lo, hi = row_first_span[seed_y], row_first_span[seed_y + 1]
+    seed_span = lo + np.searchsorted(span_ends[lo:hi], seed_x, side='right')
+    visited = np.zeros(len(span_ys), dtype=bool)
+    visited[seed_span] = True
+    stack = [seed_span]
+    while stack:
+        i = stack.pop()
+        y, start, end = span_ys[i], span_starts[i], span_ends[i]
+        for ny in (y - 1, y + 1):
+            if ny < 0 or ny >= height:
+                continue
+            lo, hi = row_first_span[ny], row_first_span[ny + 1]
+            # spans in the row which overlap [start, end)
+            first = lo + np.searchsorted(span_ends[lo:hi], start, side='right')
+            last = lo + np.searchsorted(span_starts[lo:hi], end, side='left')
+            for j in range(first, last):
+                if not visited[j]:
+                    visited[j] = True
+                    stack.append(j)
+    ys, starts, ends = span_ys[visited], span_starts[visited], span_ends[visited]
+    counts = np.zeros((height, width + 1), dtype=np.int32)
+    np.add.at(counts, (ys, starts), 1)
+    np.add.at(counts, (ys, ends), -1)
+    region = np.cumsum(counts, axis=1)[:, :width] > 0
+    bounding = QtCore.QRect(QtCore.QPoint(int(starts.min()), int(ys.min())),
+                            QtCore.QPoint(int(ends.max()) - 1, int(ys.max())))
+    return region, bounding
+
+
+@lru_cache(maxsize=1024, typed=True)
+def _cached_color(factory: Callable[..., QtGui.QColor], *args) -> QtGui.QColor:
+    """
+    Create the color by factory(*args), and keep it in a (bounded) LRU cache.
+
+    The cache is typed, so Qt.GlobalColor consts (which are ints) don't share the cached colors of int RGB values.
+
+    The returned color is shared by all the callers with the same arguments, so don't change it.
+    """
+    return factory(*args)
+
+
+def _copy_style(style):
+    """ copy the pen or brush (other values, like the LineStyle/FillStyle consts, are immutable) """
+    if isinstance(style, QtGui.QPen):
+        return QtGui.QPen(style)
+    if isinstance(style, QtGui.QBrush):
+        return QtGui.QBrush(style)
+    return style
+
+
+def _to_qcolor(val: Union[int, str, QtGui.QColor]) -> Union[QtGui.QColor, int]:
+    if isinstance(val, QtGui.QColor):
+        return val
+    try:
+        return _cached_color(QtGui.QColor, val)
+    except TypeError:  # unhashable values
+        return QtGui.QColor(val)
+
+
+def _attach_shared_memory(name: str):
+    """ attach to an existing shared memory block, without letting the resource tracker unlink it """
+    from multiprocessing import shared_memory
+    try:
+        return shared_memory.SharedMemory(name, track=False)  # python 3.13+
+    except TypeError:
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name)
+        # the blocks created by this process are registered by it, don't remove the registration, or
+        # unlinking the block will fail in the resource tracker
+        if shm.name not in _created_shared_memory:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _unlink_shared_memory(shm):
+    """ unlink a shared memory block created by Image.create_shared() """
+    _created_shared_memory.discard(shm.name)
+    shm.unlink()
+
+
+def _pool_key(image: Image):
+    """ images with the same key can be reused for each other by ImagePool """
+    qimage = image.get_image()
+    return qimage.width(), qimage.height(), image.is_tracking_background(), qimage.format()
+
+
+def _image_bytes(image: Image) -> int:
+    """ memory used by the pixels and the mask of the image """
+    size = image.get_image().sizeInBytes()
+    if image.is_tracking_background():
+        size += image.get_mask().sizeInBytes()
+    return size
+
+
+def _bytes_view(qimage: QtGui.QImage) -> np.ndarray:
+    """ the (writable) uint8 array of all the bytes of the image """
+    pointer = qimage.bits()
+    pointer.setsize(qimage.sizeInBytes())
+    return np.frombuffer(pointer, dtype=np.uint8)
+
+
+def _render_tile_in_worker(draw_fn, names, layout, settings, rect):
+    """ draw a tile of Image.render_parallel() in a worker process """
+    width, height, image_format, bytes_per_line, mask_bytes_per_line = layout
+    from multiprocessing import shared_memory
+    # the workers share the resource tracker with the main process, which unlinks the blocks
+    blocks = [shared_memory.SharedMemory(name) for name in names]
+    try:
+        image = Image.from_buffer(blocks[0].buf, width, height, QtGui.QImage.Format(image_format), bytes_per_line,
+                                  track_background=False)
+        if len(blocks) > 1:
+            image._use_mask_buffer(np.frombuffer(blocks[1].buf, dtype=np.uint8).ctypes.data, mask_bytes_per_line)
+        tile = image._create_tile_view(QtCore.QRect(*rect), settings)
+        try:
+            draw_fn(tile, QtCore.QRect(*rect))
+        finally:
+            tile.close()
+            image.close()
+    finally:
+        for shm in blocks:
+            shm.close()
+
+
+@lru_cache(maxsize=16)
+def _mask_pixmap(width: int, height: int) -> QtGui.QPixmap:
+    """ the pixmap used to draw sprites on the mask """
+    pixmap = QtGui.QPixmap(width, height)
+    pixmap.fill(MASK_BLACK)
+    return pixmap
 
 
 def _prepare_image_for_copy(image: Image, with_background: bool) -> QtGui.QImage:
     img = image.get_image()
     if not with_background:
-        img = _get_foreground(image)
-    return img
-
-
-def _get_foreground(image):
-    img = QtGui.QImage(image.get_width(), image.get_height(), QtGui.QImage.Format_ARGB32_Premultiplied)
-    img.fill(Color.TRANSPARENT)
-    painter = QtGui.QPainter()
-    painter.begin(img)
-    mask = QtGui.QBitmap.fromImage(image.get_mask().createMaskFromColor(MASK_WHITE.rgba()))
-    region = QtGui.QRegion(mask)
-    painter.setClipRegion(region)
-    painter.drawImage(0, 0, image.get_image())
-    painter.end()
+        img = image._get_foreground()
     return img
 
 
-MASK_WHITE = _to_qcolor(Color.WHITE)
-MASK_BLACK = _to_qcolor(Color.BLACK)
+MASK_WHITE = QtGui.QColor(Color.WHITE)
+MASK_BLACK = QtGui.QColor(Color.BLACK)
+# pixel values of the (Format_Grayscale8) mask
+MASK_WHITE_VALUE = QtGui.qGray(MASK_WHITE.rgb())
+MASK_BLACK_VALUE = QtGui.qGray(MASK_BLACK.rgb())
@@ -97,7 +97,7 @@ class ProcessingWidget(QtWidgets.QWidget):
         self._timer.singleShot(duration, self._on_update_frame)
 
     def paintEvent(self, e: QtGui.QPaintEvent):
-        self._image.draw_to_device(self)
+        self._image.draw_to_device(self, e.rect())
 
     def redraw(self):
         """
@@ -108,7 +108,7 @@ class ProcessingWidget(QtWidgets.QWidget):
         self.mouse_y = pos.y()
         self.get_canvas().save_settings()
         self.draw()
-        self.update()
+        self.update(self._image.take_dirty_rect())
         self.get_canvas().restore_settings()
         self.prev_mouse_x = self.mouse_x
         self.prev_mouse_y = self.mouse_y
@@ -0,0 +1,725 @@
+import os
+import queue
+import struct
+import threading
+import zlib
+
+import numpy as np
+import qimage2ndarray as qn
+from PyQt5 import QtGui
+
+from easygraphics.image import Image, _prepare_image_for_copy, _take_snapshot, _filter_png_rows
+
+_has_pillow = False
+try:
+    # Pillow's GIF encoder is written in C, and releases the GIL while compressing
+    import PIL.Image
+    import PIL.GifImagePlugin
+
+    _has_pillow = True
+except ImportError:
+    pass
+
+__all__ = ['APNGRecorder', 'GIFRecorder', 'FrameSink']
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_DISPOSE_OP_NONE = 0
+_BLEND_OP_SOURCE = 0
+_MAX_DELAY = 0xffff
+_IOV_MAX = 1024  # max number of buffers in one os.writev() call
+_GIF_MAX_COLORS = 255  # the entry after the palette colors is used for the transparent (unchanged) pixels
+_GIF_DISPOSE_NONE = 1  # leave the frame in place
+_GIF_BINS = 1 << 15  # colors are counted in a histogram of 5 bits per channel
+
+
+class _FrameRecorder:
+    """
+    Base class of the recorders which encode and write the frames of an animation in a worker thread.
+
+    Subclasses implement _encode_frame(), _write_pending() and _finish(), which are called in the worker thread.
+    """
+
+    def __init__(self, filename: str, num_plays: int, max_queue: int):
+        self._file = open(filename, "wb")
+        self._num_plays = num_plays
+        self._queue = queue.Queue(max_queue)
+        self._error = None
+        self._closed = False
+        self._size = None
+        self._frame_count = 0  # only changed by the worker thread
+        self._worker = threading.Thread(target=self._run, name="easygraphics-" + type(self).__name__.lower(),
+                                        daemon=True)
+        self._worker.start()
+
+    def add_frame(self, image: Image, delay: int = 100, delay_den: int = 1000, with_background: bool = True):
+        """
+        Add the image's content as a frame.
+
+        The frame is shown for delay/delay_den seconds. All the frames must have the same size.
+
+        :param image: the image
+        :param delay: numerator of the frame's delay
+        :param delay_den: denominator of the frame's delay
+        :param with_background: True to record the background together. False not
+        """
+        self._check_open()
+        size = (image.get_width(), image.get_height())
+        if self._size is None:
+            self._size = size
+        elif size != self._size:
+            raise ValueError(f"The frame's size {size} is not the animation's size {self._size}!")
+        snapshot = _take_snapshot(_prepare_image_for_copy(image, with_background))
+        self._queue.put(("frame", (snapshot, delay, delay_den)))
+
+    def flush(self):
+        """
+        Wait until all the added frames are written to the file.
+        """
+        self._check_open()
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        done.wait()
+        self._raise_error()
+
+    def close(self):
+        """
+        Finish the animation file.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(("close", None))
+        self._worker.join()
+        self._raise_error()
+
+    def get_frame_count(self) -> int:
+        """
+        Get the number of the frames written to the file.
+
+        :return: the number of the frames
+        """
+        return self._frame_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _check_open(self):
+        if self._closed:
+            raise RuntimeError("The recorder is closed!")
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("Failed to record the animation!") from error
+
+    def _run(self):
+        while True:
+            kind, arg = self._queue.get()
+            try:
+                if self._error is None:
+                    if kind == "frame":
+                        self._encode_frame(*arg)
+                    elif kind == "flush":
+                        self._write_pending()
+                        self._file.flush()
+                    elif kind == "close":
+                        self._write_pending()
+                        self._finish()
+            except Exception as e:
+                self._error = e
+            finally:
+                if kind == "flush":
+                    arg.set()
+            if kind == "close":
+                self._file.close()
+                return
+
+    def _encode_frame(self, snapshot: QtGui.QImage, delay: int, delay_den: int):
+        """ compare the frame with the previous one, and keep it as the pending frame """
+        raise NotImplementedError()
+
+    def _write_pending(self):
+        """ write the pending frame to the file """
+        raise NotImplementedError()
+
+    def _finish(self):
+        """ write the end of the file """
+        raise NotImplementedError()
+
+
+class APNGRecorder(_FrameRecorder):
+    """
+    Record an animation to an APNG file, frame by frame.
+
+    The frames are not kept in memory: add_frame() only takes a snapshot of the image, and the snapshot is
+    encoded and written to the file by a worker thread. If the worker falls behind, add_frame() waits until
+    there is room in the queue (at most max_queue frames are waiting), so the memory used is bounded.
+
+    Only the changed area of each frame (compared with the previous one) is stored. Frames which are not
+    changed make the previous frame shown longer.
+
+    >>> recorder = APNGRecorder("animation.png")
+    >>> for i in range(100):
+    >>>     image.draw_line(i, 0, i, 100)
+    >>>     recorder.add_frame(image, delay=40)
+    >>> recorder.close()
+    """
+
+    def __init__(self, filename: str, num_plays: int = 0, max_queue: int = 8):
+        """
+        Create a recorder.
+
+        :param filename: the file to save the animation
+        :param num_plays: number of times to play the animation. 0 means infinitely.
+        :param max_queue: max number of the frames waiting to be encoded
+        """
+        # the followings are only used by the worker thread
+        self._sequence = 0
+        self._actl_offset = None
+        self._last_pixels = None
+        self._pending = None  # the frame to be written: [region pixels, x, y, delay, delay_den]
+        super().__init__(filename, num_plays, max_queue)
+
+    def _encode_frame(self, snapshot: QtGui.QImage, delay: int, delay_den: int):
+        rgba = snapshot.convertToFormat(QtGui.QImage.Format_RGBA8888)
+        pixels = qn.byte_view(rgba).copy()
+        if self._last_pixels is None:
+            self._write_header(rgba.width(), rgba.height())
+            x, y, region = 0, 0, pixels
+        else:
+            changed = (pixels.view(np.uint32) != self._last_pixels.view(np.uint32))[:, :, 0]
+            rows = np.flatnonzero(changed.any(axis=1))
+            pending = self._pending
+            if len(rows) == 0:
+                if pending is not None and pending[4] == delay_den and pending[3] + delay <= _MAX_DELAY:
+                    pending[3] += delay  # show the previous frame longer
+                    return
+                x, y, region = 0, 0, pixels[:1, :1]
+            else:
+                cols = np.flatnonzero(changed[rows[0]:rows[-1] + 1].any(axis=0))
+                x, y = cols[0], rows[0]
+                region = pixels[y:rows[-1] + 1, x:cols[-1] + 1]
+        self._write_pending()
+        self._pending = [region, int(x), int(y), delay, delay_den]
+        self._last_pixels = pixels
+
+    def _write_header(self, width: int, height: int):
+        self._file.write(_PNG_SIGNATURE)
+        self._write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        self._actl_offset = self._file.tell()
+        self._write_chunk(b"acTL", struct.pack(">II", 0, self._num_plays))  # frame count is set in _finish()
+
+    def _write_pending(self):
+        if self._pending is None:
+            return
+        region, x, y, delay, delay_den = self._pending
+        self._pending = None
+        height, width = region.shape[:2]
+        self._write_chunk(b"fcTL", struct.pack(">IIIIIHHBB", self._sequence, width, height, x, y, delay, delay_den,
+                                               _DISPOSE_OP_NONE, _BLEND_OP_SOURCE))
+        self._sequence += 1
+        data = zlib.compress(_filter_png_rows(region))
+        if self._frame_count == 0:
+            self._write_chunk(b"IDAT", data)
+        else:
+            self._write_chunk(b"fdAT", struct.pack(">I", self._sequence) + data)
+            self._sequence += 1
+        self._frame_count += 1
+
+    def _finish(self):
+        if self._actl_offset is None:  # no frames
+            return
+        self._write_chunk(b"IEND", b"")
+        self._file.seek(self._actl_offset)
+        self._write_chunk(b"acTL", struct.pack(">II", self._frame_count, self._num_plays))
+
+    def _write_chunk(self, tag: bytes, data: bytes):
+        self._file.write(struct.pack(">I", len(data)))
+        self._file.write(tag)
+        self._file.write(data)
+        self._file.write(struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff))
+
+
+class GIFRecorder(_FrameRecorder):
+    """
+    Record an animation to a GIF file, frame by frame.
+
+    Like APNGRecorder, the frames are encoded and written to the file by a worker thread, and only the changed
+    area of each frame is stored (the unchanged pixels in it are transparent).
+
+    The colors of the frames are reduced to 255 colors (median cut). The palette is reused by the following
+    frames as long as they can be drawn with it accurately, so it is only computed again when the colors
+    of the animation change.
+
+    GIF doesn't support semi-transparent pixels, so the frames are recorded without the alpha channel.
+    The delays are rounded to 1/100 seconds.
+
+    The frames are compressed with Pillow's encoder (which doesn't hold the GIL) if Pillow is installed.
+    """
+
+    def __init__(self, filename: str, num_plays: int = 0, max_queue: int = 8):
+        """
+        Create a recorder.
+
+        :param filename: the file to save the animation
+        :param num_plays: number of times to play the animation. 0 means infinitely.
+        :param max_queue: max number of the frames waiting to be encoded
+        """
+        # the followings are only used by the worker thread
+        self._palette = None  # current palette: (palette colors, lut of the color bins, error when it's created)
+        self._global_palette = None
+        self._palette_count = 0
+        self._last_pixels = None
+        self._time = 0  # start time of the next frame, in 1/100 seconds
+        self._pending = None  # the frame to be written: [indices, x, y, start time, duration, palette colors]
+        super().__init__(filename, num_plays, max_queue)
+
+    def get_palette_count(self) -> int:
+        """
+        Get the number of the palettes computed for the frames.
+
+        :return: the number of the palettes
+        """
+        return self._palette_count
+
+    def _encode_frame(self, snapshot: QtGui.QImage, delay: int, delay_den: int):
+        if snapshot.format() != QtGui.QImage.Format_RGB32:
+            snapshot = snapshot.convertToFormat(QtGui.QImage.Format_RGB32)
+        pixels = qn.raw_view(snapshot).copy()
+        rgb = qn.rgb_view(snapshot)
+        duration = delay * 100 / delay_den
+        if self._last_pixels is None:
+            area = np.s_[:, :]
+            changed = None
+        else:
+            changed = pixels != self._last_pixels
+            rows = np.flatnonzero(changed.any(axis=1))
+            pending = self._pending
+            if len(rows) == 0:
+                if pending is not None and round(pending[3] + pending[4] + duration) - round(pending[3]) <= _MAX_DELAY:
+                    pending[4] += duration  # show the previous frame longer
+                    self._time += duration
+                    return
+                area = np.s_[:1, :1]
+            else:
+                cols = np.flatnonzero(changed[rows[0]:rows[-1] + 1].any(axis=0))
+                area = np.s_[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+            changed = changed[area]
+        bins = _color_bins(rgb[area])
+        if self._palette is not None and changed is not None:
+            # can the changed pixels be drawn with the current palette?
+            palette, lut, palette_error = self._palette
+            used, counts, colors = _color_histogram(bins[changed], rgb[area][changed])
+            if len(used) > 0 and \
+                    _palette_error(colors, counts, palette[lut[used]]) > max(2 * palette_error, palette_error + 25):
+                self._palette = None
+        if self._palette is None:
+            used, counts, colors = _color_histogram(_color_bins(rgb).ravel(), rgb.reshape(-1, 3))
+            palette, lut = _median_cut(used, counts, colors)
+            self._palette = palette, lut, _palette_error(colors, counts, palette[lut[used]])
+            self._palette_count += 1
+        palette, lut, _ = self._palette
+        indices = lut[bins]
+        if changed is None:
+            self._write_header(rgb.shape[1], rgb.shape[0], palette)
+        else:
+            indices[~changed] = len(palette)
+        self._write_pending()
+        self._pending = [indices, int(area[1].start or 0), int(area[0].start or 0), self._time, duration, palette]
+        self._last_pixels = pixels
+        self._time += duration
+
+    def _write_header(self, width: int, height: int, palette: np.ndarray):
+        self._global_palette = palette
+        self._file.write(b"GIF89a")
+        # global color table, color resolution is 8 bits
+        bits = _gif_table_bits(palette)
+        self._file.write(struct.pack("<HHBBB", width, height, 0xf0 | (bits - 1), 0, 0))
+        self._file.write(_gif_color_table(palette, bits))
+        if self._num_plays != 1:  # NETSCAPE2.0 extension: number of repeats
+            self._file.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", max(self._num_plays - 1, 0))
+                             + b"\x00")
+
+    def _write_pending(self):
+        if self._pending is None:
+            return
+        indices, x, y, start, duration, palette = self._pending
+        self._pending = None
+        delay = min(round(start + duration) - round(start), _MAX_DELAY)
+        # graphic control extension: don't dispose the frame, with transparent color
+        self._file.write(struct.pack("<BBBBHBB", 0x21, 0xf9, 4, (_GIF_DISPOSE_NONE << 2) | 1, delay,
+                                     len(palette), 0))
+        height, width = indices.shape
+        bits = _gif_table_bits(palette)
+        if palette is self._global_palette:
+            self._file.write(struct.pack("<BHHHHB", 0x2c, x, y, width, height, 0))
+        else:
+            self._file.write(struct.pack("<BHHHHB", 0x2c, x, y, width, height, 0x80 | (bits - 1)))
+            self._file.write(_gif_color_table(palette, bits))
+        self._file.write(_gif_image_data(indices, max(bits, 2)))
+        self._frame_count += 1
+
+    def _finish(self):
+        if self._global_palette is None:  # no frames
+            return
+        self._file.write(b"\x3b")
+
+
+class FrameSink:
+    """
+    Write raw video frames to a file, a pipe or stdout, to be read by a video encoder (such as ffmpeg).
+
+    Supported formats:
+
+    * "y4m": YUV4MPEG2 stream, YUV 4:2:0 (BT.601, limited range). The width and height of the frames must be even.
+    * "rgba": raw RGBA frames (4 bytes per pixel), without any header.
+    * "ppm": a sequence of binary PPM (P6) images.
+
+    The frames are written synchronously, so the writing waits when the reader of a pipe falls behind.
+
+    >>> sink = FrameSink("out.y4m", fps=30)
+    >>> for i in range(300):
+    >>>     draw_frame(i)
+    >>>     sink.write(image)
+    >>> sink.close()
+    """
+
+    Formats = ("y4m", "rgba", "ppm")
+
+    def __init__(self, target, format: str = "y4m", fps: int = 25, fps_den: int = 1):
+        """
+        Create a frame sink.
+
+        :param target: the file name, the file descriptor, or the (binary) file object (e.g. sys.stdout.buffer)
+            to write to. File descriptors and file objects are not closed by close().
+        :param format: the format of the frames ("y4m", "rgba" or "ppm")
+        :param fps: numerator of the frame rate (only used by y4m)
+        :param fps_den: denominator of the frame rate (only used by y4m)
+        """
+        if format not in FrameSink.Formats:
+            raise ValueError(f"Unsupported frame format {format}!")
+        if isinstance(target, str):
+            self._fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0))
+            self._own_fd = True
+        else:
+            if not isinstance(target, int):
+                target.flush()
+                target = target.fileno()
+            self._fd = target
+            self._own_fd = False
+        self._format = format
+        self._fps = fps
+        self._fps_den = fps_den
+        self._size = None
+        self._frame_count = 0
+        self._yuv = None
+
+    def write(self, image: Image, with_background: bool = True):
+        """
+        Write the image's content as a frame.
+
+        All the frames must have the same size.
+
+        :param image: the image
+        :param with_background: True to write the background together. False not
+        """
+        if self._fd is None:
+            raise RuntimeError("The frame sink is closed!")
+        size = (image.get_width(), image.get_height())
+        if self._size is None:
+            if self._format == "y4m":
+                if size[0] % 2 != 0 or size[1] % 2 != 0:
+                    raise ValueError("The width and height of y4m (YUV 4:2:0) frames must be even!")
+                self._yuv = _YUV420Converter(*size)
+                _write_buffers(self._fd, [b"YUV4MPEG2 W%d H%d F%d:%d Ip A1:1 C420jpeg XCOLORRANGE=LIMITED\n" % (
+                    size[0], size[1], self._fps, self._fps_den)])
+            self._size = size
+        elif size != self._size:
+            raise ValueError(f"The frame's size {size} is not the sink's frame size {self._size}!")
+        img = _prepare_image_for_copy(image, with_background)
+        if self._format == "y4m":
+            if img.depth() != 32:
+                img = img.convertToFormat(QtGui.QImage.Format_RGB32)
+            _write_buffers(self._fd, [b"FRAME\n", self._yuv.convert(qn.rgb_view(img))])
+        elif self._format == "rgba":
+            img = img.convertToFormat(QtGui.QImage.Format_RGBA8888)
+            _write_buffers(self._fd, [_const_bytes_view(img)])
+        else:
+            img = img.convertToFormat(QtGui.QImage.Format_RGB888)
+            data = _const_bytes_view(img)
+            width, height, bytes_per_line = img.width(), img.height(), img.bytesPerLine()
+            header = b"P6\n%d %d\n255\n" % (width, height)
+            if bytes_per_line == width * 3:
+                _write_buffers(self._fd, [header, data])
+            else:  # rows are padded to 4 bytes
+                _write_buffers(self._fd, [header] + [data[y * bytes_per_line:y * bytes_per_line + width * 3]
+                                                     for y in range(height)])
+        self._frame_count += 1
+
+    def get_frame_count(self) -> int:
+        """
+        Get the number of the frames written.
+
+        :return: the number of the frames
+        """
+        return self._frame_count
+
+    def close(self):
+        """
+        Close the sink.
+        """
+        if self._fd is None:
+            return
+        if self._own_fd:
+            os.close(self._fd)
+        self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class _YUV420Converter:
+    """
+    Convert RGB pixels to YUV 4:2:0 planes (BT.601, limited range), using 16-bit integer arithmetic.
+
+    The buffers are allocated once and reused for each frame.
+    """
+
+    def __init__(self, width: int, height: int):
+        self._frame = np.empty(width * height * 3 // 2, dtype=np.uint8)
+        self._y = self._frame[:width * height].reshape(height, width)
+        self._u = self._frame[width * height:width * height * 5 // 4].reshape(height // 2, width // 2)
+        self._v = self._frame[width * height * 5 // 4:].reshape(height // 2, width // 2)
+        self._luma = np.empty((height, width), dtype=np.uint16)
+        self._luma_term = np.empty((height, width), dtype=np.uint16)
+        self._rgb = np.empty((height // 2, width // 2, 3), dtype=np.uint16)
+        self._chroma = np.empty((height // 2, width // 2), dtype=np.uint16)
+        self._chroma_term = np.empty((height // 2, width // 2), dtype=np.uint16)
+
+    def convert(self, rgb: np.ndarray) -> np.ndarray:
+        """
+        Convert the pixels.
+
+        :param rgb: (height, width, 3) uint8 array of the pixels
+        :return: the Y, U and V planes in one uint8 array. It's reused by the next convert() call.
+        """
+        luma, term = self._luma, self._luma_term
+        # the sums fit in 16 bits: 66*255 + 129*255 + 25*255 + 128 + 16*256 < 65536
+        np.multiply(rgb[:, :, 0], 66, out=luma, dtype=np.uint16)
+        np.multiply(rgb[:, :, 1], 129, out=term, dtype=np.uint16)
+        luma += term
+        np.multiply(rgb[:, :, 2], 25, out=term, dtype=np.uint16)
+        luma += term
+        luma += 128 + (16 << 8)
+        luma >>= 8
+        np.copyto(self._y, luma, casting="unsafe")
+        # average each 2x2 block before computing the chroma
+        height, width = self._y.shape
+        blocks = rgb.reshape(height // 2, 2, width // 2, 2, 3)
+        average = self._rgb
+        np.add(blocks[:, 0, :, 0], blocks[:, 0, :, 1], out=average, dtype=np.uint16)
+        average += blocks[:, 1, :, 0]
+        average += blocks[:, 1, :, 1]
+        average += 2
+        average >>= 2
+        red, green, blue = average[:, :, 0], average[:, :, 1], average[:, :, 2]
+        self._compute_chroma(blue, red, green, 112, 38, 74, self._u)
+        self._compute_chroma(red, blue, green, 112, 18, 94, self._v)
+        return self._frame
+
+    def _compute_chroma(self, a, b, c, ka, kb, kc, out):
+        """ out = (ka*a - kb*b - kc*c + 128) / 256 + 128, the intermediate values are wrapped in 16 bits """
+        chroma, term = self._chroma, self._chroma_term
+        np.multiply(a, ka, out=chroma)
+        np.multiply(b, kb, out=term)
+        chroma -= term
+        np.multiply(c, kc, out=term)
+        chroma -= term
+        chroma += 128 + (128 << 8)
+        chroma >>= 8
+        np.copyto(out, chroma, casting="unsafe")
+
+
+def _color_bins(rgb: np.ndarray) -> np.ndarray:
+    """ the histogram bins (5 bits per channel) of the (height, width, 3) uint8 pixels """
+    bins = (rgb[:, :, 0] >> 3).astype(np.uint16)
+    bins <<= 5
+    bins |= rgb[:, :, 1] >> 3
+    bins <<= 5
+    bins |= rgb[:, :, 2] >> 3
+    return bins
+
+
+def _color_histogram(bins: np.ndarray, rgb: np.ndarray) -> tuple:
+    """
+    Count the pixels in the histogram bins.
+
+    :param bins: the bins of the pixels
+    :param rgb: (n, 3) colors of the pixels
+    :return: the used bins, number of pixels in each used bin, and the mean color of each used bin
+    """
+    counts = np.bincount(bins, minlength=_GIF_BINS)
+    used = np.flatnonzero(counts)
+    counts = counts[used]
+    colors = np.stack([np.bincount(bins, weights=rgb[:, i], minlength=_GIF_BINS)[used] for i in range(3)], axis=1)
+    return used, counts, colors / counts[:, None]
+
+
+def _palette_error(colors: np.ndarray, counts: np.ndarray, mapped: np.ndarray) -> float:
+    """ mean squared error of the pixels when the colors are drawn as the mapped (palette) colors """
+    return float(counts @ ((colors - mapped) ** 2).sum(axis=1)) / counts.sum()
+
+
+def _median_cut(used: np.ndarray, counts: np.ndarray, colors: np.ndarray) -> tuple:
+    """
+    Compute the palette of the colors, with the median cut algorithm.
+
+    :param used: the used histogram bins
+    :param counts: number of the pixels in each used bin
+    :param colors: the mean color of each used bin
+    :return: palette colors ((n,3) uint8) and the lut of all the bins (uint8 palette indices)
+    """
+    def split_info(box):
+        """ (score, channel) of the box: its number of pixels times its largest range, and the channel to split """
+        if len(box) < 2:
+            return 0, 0
+        ranges = np.ptp(colors[box], axis=0)
+        channel = int(np.argmax(ranges))
+        return counts[box].sum() * ranges[channel], channel
+
+    boxes = [np.arange(len(used))]
+    infos = [split_info(boxes[0])]
+    while len(boxes) < _GIF_MAX_COLORS:
+        best = max(range(len(boxes)), key=lambda i: infos[i][0])
+        score, channel = infos[best]
+        if score == 0:
+            break
+        box = boxes[best]
+        box = box[np.argsort(colors[box, channel], kind="stable")]
+        cumulative = np.cumsum(counts[box])
+        cut = int(np.searchsorted(cumulative, cumulative[-1] / 2))
+        cut = min(max(cut, 1), len(box) - 1)
+        boxes[best:best + 1] = [box[:cut], box[cut:]]
+        infos[best:best + 1] = [split_info(box[:cut]), split_info(box[cut:])]
+    palette = np.empty((len(boxes), 3), dtype=np.float64)
+    used_lut = np.empty(len(used), dtype=np.uint8)
+    for i, box in enumerate(boxes):
+        palette[i] = counts[box] @ colors[box] / counts[box].sum()
+        used_lut[box] = i
+    palette = np.rint(palette).astype(np.uint8)
+    # the other bins are mapped to the nearest palette colors (of the bins' centers):
+    # |center - color|^2 = |center|^2 - 2 * center . color + |color|^2, the first term doesn't matter
+    all_bins = np.arange(_GIF_BINS)
+    centers = np.stack([all_bins >> 10, (all_bins >> 5) & 31, all_bins & 31], axis=1).astype(np.float32) * 8 + 4
+    float_palette = palette.astype(np.float32)
+    distances = centers @ (-2 * float_palette.T)
+    distances += (float_palette ** 2).sum(axis=1)
+    lut = np.argmin(distances, axis=1).astype(np.uint8)
+    lut[used] = used_lut
+    return palette, lut
+
+
+def _gif_table_bits(palette: np.ndarray) -> int:
+    """ bits of the color table's size, the table has room for the palette colors and the transparent color """
+    return max(int(len(palette)).bit_length(), 1)
+
+
+def _gif_color_table(palette: np.ndarray, bits: int) -> bytes:
+    """ the color table (with 2**bits colors) of the palette """
+    table = np.zeros((1 << bits, 3), dtype=np.uint8)
+    table[:len(palette)] = palette
+    return table.tobytes()
+
+
+def _gif_image_data(indices: np.ndarray, min_code_size: int) -> bytes:
+    """ the image data of a frame: the LZW minimum code size, the compressed indices in sub-blocks and the terminator """
+    indices = np.ascontiguousarray(indices)
+    if _has_pillow:
+        # the first item is the image descriptor. Pillow always uses 8 as the minimum code size.
+        return b"".join(PIL.GifImagePlugin.getdata(PIL.Image.fromarray(indices, "L"))[1:])
+    data = _lzw_encode(indices.tobytes(), min_code_size)
+    blocks = bytearray([min_code_size])
+    for i in range(0, len(data), 255):
+        block = data[i:i + 255]
+        blocks.append(len(block))
+        blocks += block
+    blocks.append(0)
+    return bytes(blocks)
+
+
+def _lzw_encode(data: bytes, min_code_size: int) -> bytes:
+    """ compress the pixel indices with GIF's variable-length-code LZW """
+    clear_code = 1 << min_code_size
+    end_code = clear_code + 1
+    first_code = clear_code + 2
+    code_size = min_code_size + 1
+    codes = [clear_code]
+    size_changes = [(0, code_size)]  # (index of the first code with the size, code size)
+    table = {}
+    next_code = first_code
+    pixels = iter(data)
+    prefix = next(pixels)
+    append = codes.append
+    for pixel in pixels:
+        key = (prefix << 8) | pixel
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        append(prefix)
+        prefix = pixel
+        if next_code == 4096:  # the table is full
+            append(clear_code)
+            table = {}
+            next_code = first_code
+            code_size = min_code_size + 1
+            size_changes.append((len(codes), code_size))
+            continue
+        table[key] = next_code
+        if next_code == 1 << code_size:
+            code_size += 1
+            size_changes.append((len(codes), code_size))
+        next_code += 1
+    append(prefix)
+    append(end_code)
+    # pack the codes (least significant bit first) with numpy
+    codes = np.array(codes, dtype=np.uint16)
+    sizes = np.empty(len(codes), dtype=np.uint8)
+    for (start, size), (stop, _) in zip(size_changes, size_changes[1:] + [(len(codes), 0)]):
+        sizes[start:stop] = size
+    bits = (codes[:, None] >> np.arange(12, dtype=np.uint16)) & 1
+    bits = bits[np.arange(12) < sizes[:, None]].astype(np.uint8)
+    return np.packbits(bits, bitorder="little").tobytes()
+
+
+def _const_bytes_view(qimage: QtGui.QImage) -> memoryview:
+    """ the read-only view of all the bytes of the image (doesn't detach a shared image) """
+    pointer = qimage.constBits()
+    pointer.setsize(qimage.sizeInBytes())
+    return memoryview(pointer)
+
+
+def _write_buffers(fd: int, buffers: list):
+    """ write all the buffers to the file descriptor, using os.writev() when it's available """
+    buffers = [view for view in (memoryview(buffer).cast("B") for buffer in buffers) if len(view) > 0]
+    i = 0
+    while i < len(buffers):
+        if hasattr(os, "writev"):
+            written = os.writev(fd, buffers[i:i + _IOV_MAX])
+        else:
+            written = os.write(fd, buffers[i])
+        # skip the written buffers (the writing may stop in the middle of a buffer, e.g. for pipes)
+        while written > 0:
+            if written >= len(buffers[i]):
+                written -= len(buffers[i])
+                i += 1
+            else:
+                buffers[i] = buffers[i][written:]
+                written = 0
@@ -292,7 +292,7 @@ class Turtle(object):
         """
         if not self.is_filling():
             return
-        image = eg.create_image(self._world.get_width(), self._world.get_height())
+        image = eg.acquire_image(self._world.get_width(), self._world.get_height())
         image.set_pen(QtGui.QPen(self._world.get_world_image().get_pen()))
         image.set_color(eg.Color.TRANSPARENT)
         image.set_line_style(eg.LineStyle.SOLID_LINE)
@@ -306,7 +306,7 @@ class Turtle(object):
         self._world.get_world_image().draw_image(0, 0, image, with_background=False,
                                                  composition_mode=eg.CompositionMode.SOURCE_OVER)
         self._world.get_world_image().set_transform(transform)
-        image.close()
+        eg.release_image(image)
         self._fillpath.clear()
 
     def forward(self, distance: float):
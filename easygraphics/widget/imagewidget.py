@@ -16,7 +16,7 @@ class ImageWidget(QtWidgets.QWidget):
         :param image: the underlying image object
         """
         self._image = image
-        image.add_updated_listener(self.update)
+        image.add_updated_rect_listener(self.update)
         self.setFixedWidth(image.get_width())
         self.setFixedHeight(image.get_height())
 
@@ -29,8 +29,8 @@ class ImageWidget(QtWidgets.QWidget):
         return self._image
 
     def paintEvent(self, e: QtGui.QPaintEvent):
-        self._image.draw_to_device(self)
+        self._image.draw_to_device(self, e.rect())
 
     def close(self):
-        self._image.remove_updated_listener(self.update)
+        self._image.remove_updated_rect_listener(self.update)
         super.close()
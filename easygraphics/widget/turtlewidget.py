@@ -64,7 +64,7 @@ class TurtleWidget(QtWidgets.QWidget):
         return self._turtle
 
     def paintEvent(self, e: QtGui.QPaintEvent):
-        self._canvas.draw_to_device(self)
+        self._canvas.draw_to_device(self, e.rect())
 
     def _refresh(self):
         self._world.snap_shot_to_image(self._canvas)
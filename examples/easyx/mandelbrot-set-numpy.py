@@ -0,0 +1,43 @@
+# demo from EasyX Library
+# Mandelbrot Set, calculated with numpy and drawn with pixels()
+# https://codebus.cn/yangw/post/mandelbrot-set
+
+from easygraphics import *
+import numpy as np
+
+
+def hsl_colors(count):
+    """ the palette used by mandelbrot-set.py """
+    colors = np.zeros(count + 1, dtype=np.uint32)
+    for k in range(count):
+        colors[k] = color_hsl((k << 5) % 360, 255, 127).rgba()
+    colors[count] = color_rgb(0, 0, 0).rgba()  # for points in the set
+    return colors
+
+
+def main():
+    width = 800
+    height = 600
+    max_iter = 180
+    init_graph(width, height)
+
+    x = np.linspace(-2.1, 1.1, width, endpoint=False)
+    y = np.linspace(-1.2, 1.2, height, endpoint=False)
+    c = x[np.newaxis, :] + 1j * y[:, np.newaxis]
+    z = np.zeros_like(c)
+    k = np.full(c.shape, max_iter, dtype=np.int32)
+    alive = np.ones(c.shape, dtype=bool)
+    for i in range(max_iter):
+        escaped = alive & (z.real * z.real + z.imag * z.imag > 4)
+        k[escaped] = i
+        alive &= ~escaped
+        z[alive] = z[alive] * z[alive] + c[alive]
+
+    with pixels() as arr:
+        arr[:, :] = hsl_colors(max_iter)[k]
+
+    pause()
+    close_graph()
+
+
+easy_run(main)
@@ -0,0 +1,27 @@
+from PyQt5 import QtGui
+from easygraphics import *
+
+init_graph(800, 600)
+set_render_mode(RenderMode.RENDER_MANUAL)
+
+with record_display_list() as board:
+    set_color(Color.LIGHT_GRAY)
+    for i in range(0, 800, 20):
+        draw_line(i, 0, i, 600)
+    for i in range(0, 600, 20):
+        draw_line(0, i, 800, i)
+    set_color(Color.BLACK)
+    set_fill_color(Color.LIGHT_YELLOW)
+    draw_rect(20, 20, 200, 80)
+    draw_text(40, 55, "display list")
+
+for i in range(200):
+    clear()
+    draw_display_list(board)
+    transform = QtGui.QTransform()
+    transform.translate(400, 300)
+    transform.rotate(i * 3)
+    transform.scale(0.5, 0.5)
+    draw_display_list(board, transform)
+    delay(30)
+close_graph()
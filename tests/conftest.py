@@ -0,0 +1,14 @@
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5 import QtWidgets  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def app():
+    """ the images need a (Gui) application, for fonts and pixmaps """
+    application = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    yield application
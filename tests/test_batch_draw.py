@@ -0,0 +1,92 @@
+import numpy as np
+from PyQt5 import QtCore
+
+from easygraphics import Color
+from easygraphics.image import Image
+
+
+def listen(image):
+    rects = []
+    image.add_updated_rect_listener(lambda rect: rects.append(QtCore.QRect(rect)))
+    return rects
+
+
+def test_fill_rects():
+    image = Image.create(200, 100)
+    rects = listen(image)
+    image.fill_rects(np.array([[10, 10, 50, 50], [120, 40, 180, 90]]), [Color.BLUE, Color.GREEN])
+    assert image.get_pixel(30, 30) == Color.BLUE
+    assert image.get_pixel(150, 60) == Color.GREEN
+    assert image.get_pixel(80, 30) == Color.WHITE
+    assert len(rects) == 1
+    assert rects[0].contains(QtCore.QRect(10, 10, 170, 80))
+    image.close()
+
+
+def test_fill_circles():
+    image = Image.create(200, 100)
+    rects = listen(image)
+    image.fill_circles(np.array([[30, 30], [150, 60]]), [10, 20], [Color.RED, Color.BLUE])
+    assert image.get_pixel(30, 30) == Color.RED
+    assert image.get_pixel(150, 60) == Color.BLUE
+    assert image.get_pixel(30, 45) == Color.WHITE
+    assert len(rects) == 1
+    assert rects[0].contains(QtCore.QRect(20, 20, 150, 60))
+    image.close()
+
+
+def test_draw_lines_and_points():
+    image = Image.create(200, 100)
+    rects = listen(image)
+    image.set_color(Color.BLACK)
+    ys = np.arange(5) * 20 + 10
+    image.draw_lines(np.column_stack((np.zeros(5), ys, np.full(5, 200), ys)))
+    image.draw_points(np.array([[50, 15], [150, 55]]))
+    for y in ys:
+        assert image.get_pixel(100, int(y)) != Color.WHITE
+    assert image.get_pixel(100, 20) == Color.WHITE
+    assert image.get_pixel(50, 15) != Color.WHITE
+    assert image.get_pixel(150, 55) != Color.WHITE
+    assert len(rects) == 2
+    image.close()
+
+
+def test_batch_draws_like_single_calls():
+    points = np.array([[20, 20], [60, 50], [150, 70]])
+    rects = np.array([[10, 60, 40, 90], [100, 10, 130, 30]])
+    single = Image.create(200, 100)
+    batched = Image.create(200, 100)
+    for image in (single, batched):
+        image.set_color(Color.BLACK)
+        image.set_fill_color(Color.RED)
+    for x1, y1, x2, y2 in rects:
+        single.fill_rect(x1, y1, x2, y2)
+    for x, y in points:
+        single.draw_point(x, y)
+    batched.fill_rects(rects)
+    batched.draw_points(points)
+    assert np.array_equal(single.to_ndarray(), batched.to_ndarray())
+    assert single.get_mask() == batched.get_mask()
+    single.close()
+    batched.close()
+
+
+def test_fill_circles_covers_the_circles():
+    image = Image.create(200, 100)
+    image.fill_circles(np.array([[30, 30], [150, 50]]), 20, Color.RED)
+    drawn = np.count_nonzero(image.to_ndarray() != 0xffffffff)
+    assert abs(drawn - 2 * np.pi * 20 ** 2) < 2 * 2 * np.pi * 20
+    image.close()
+
+
+def test_batch_notifies_once():
+    image = Image.create(200, 100)
+    rects = listen(image)
+    with image.batch():
+        with image.batch():
+            image.fill_rects(np.array([[10, 10, 20, 20]]))
+        image.draw_line(100, 50, 150, 90)
+        assert rects == []
+    assert len(rects) == 1
+    assert rects[0].contains(QtCore.QRect(10, 10, 141, 81))
+    image.close()
@@ -0,0 +1,26 @@
+from easygraphics import Color, color_gray, color_rgb, to_alpha
+from easygraphics.image import Image, _to_qcolor
+
+
+def test_color_functions_return_cached_colors():
+    assert color_rgb(10, 20, 30) is color_rgb(10, 20, 30)
+    assert color_gray(128) is color_gray(128)
+    assert to_alpha(Color.RED, 100) is to_alpha(Color.RED, 100)
+    assert color_rgb(10, 20, 30).name() == "#0a141e"
+
+
+def test_global_color_consts_dont_share_int_colors():
+    assert _to_qcolor(7).name() == "#000007"
+    assert _to_qcolor(Color.RED).name() == "#ff0000"
+
+
+def test_set_color_keeps_the_color():
+    image = Image.create(10, 10)
+    color = color_rgb(1, 2, 3)
+    image.set_fill_color(color)
+    assert image._fill_color is color
+    image.set_color(color_gray(50))
+    image.draw_point(5, 5)
+    assert image.get_color() == color_gray(50)
+    assert image.get_fill_color() == color
+    image.close()
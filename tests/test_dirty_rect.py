@@ -0,0 +1,26 @@
+from PyQt5 import QtCore
+
+from easygraphics.image import Image
+
+
+def test_dirty_rect_is_exact_after_it_is_read():
+    image = Image.create(400, 300)
+    image.draw_line(10, 10, 50, 50)
+    # nobody has read the dirty rect, so the exact area isn't computed
+    assert image.take_dirty_rect() == QtCore.QRect(0, 0, 400, 300)
+    image.draw_line(10, 10, 50, 50)
+    rect = image.take_dirty_rect()
+    assert rect.contains(QtCore.QRect(10, 10, 41, 41))
+    assert rect.width() < 60 and rect.height() < 60
+    image.close()
+
+
+def test_drawing_changes_the_content_generation_without_consumers():
+    image = Image.create(100, 100)
+    calls = []
+    image.add_updated_listener(lambda: calls.append(True))
+    generation = image._get_content_generation()
+    image.fill_rect(10, 10, 20, 20)
+    assert image._get_content_generation() != generation
+    assert calls == [True]
+    image.close()
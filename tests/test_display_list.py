@@ -0,0 +1,117 @@
+import numpy as np
+import qimage2ndarray as qn
+from PyQt5 import QtGui
+
+from easygraphics import Color
+from easygraphics.image import Image, MASK_WHITE_VALUE
+
+
+def drawn_pixels(image: Image) -> np.ndarray:
+    """ the (y, x) coordinates of the pixels which are not white """
+    return np.argwhere(image.to_ndarray() != 0xffffffff)
+
+
+def test_replay_text_marks_its_area_dirty():
+    image = Image.create(400, 300)
+    with image.record_display_list() as display_list:
+        image.set_color(Color.BLACK)
+        image.draw_text(200, 150, "display list")
+    assert not display_list.get_bounding_rect().isEmpty()
+
+    image.take_dirty_rect()
+    rects = []
+    calls = []
+    image.add_updated_rect_listener(rects.append)
+    image.add_updated_listener(lambda: calls.append(True))
+    generation = image._get_content_generation()
+    image.draw_display_list(display_list)
+
+    assert len(calls) == 1
+    assert len(rects) == 1
+    assert image._get_content_generation() != generation
+    pixels = drawn_pixels(image)
+    assert len(pixels) > 0
+    dirty = image.take_dirty_rect()
+    assert dirty == rects[0]
+    for y, x in pixels:
+        assert dirty.contains(int(x), int(y))
+    image.close()
+
+
+def test_replay_text_with_transform_marks_the_transformed_area_dirty():
+    image = Image.create(400, 300)
+    with image.record_display_list() as display_list:
+        image.draw_text(10, 30, "display list")
+    image.take_dirty_rect()
+    image.draw_display_list(display_list, QtGui.QTransform.fromTranslate(250, 200))
+    dirty = image.take_dirty_rect()
+    pixels = drawn_pixels(image)
+    assert len(pixels) > 0
+    assert pixels[:, 0].min() >= 200 and pixels[:, 1].min() >= 250
+    for y, x in pixels:
+        assert dirty.contains(int(x), int(y))
+    image.close()
+
+
+def draw_scene(image: Image):
+    image.set_color(Color.BLACK)
+    image.set_fill_color(Color.RED)
+    image.draw_line(10, 10, 150, 90)
+    image.draw_rect(20, 20, 80, 60)
+    image.fill_ellipse(120, 60, 30, 20)
+    image.draw_polygon(150, 10, 190, 10, 170, 40)
+    image.draw_text(30, 100, "display list")
+
+
+def assert_same_image(image1: Image, image2: Image, exact_mask: bool = True):
+    assert np.array_equal(image1.to_ndarray(), image2.to_ndarray())
+    if exact_mask:
+        assert image1.get_mask() == image2.get_mask()
+    else:
+        # the antialiased edges of the mask may be rounded differently, but the background must be the same
+        background1 = qn.raw_view(image1.get_mask()) == MASK_WHITE_VALUE
+        background2 = qn.raw_view(image2.get_mask()) == MASK_WHITE_VALUE
+        assert np.array_equal(background1, background2)
+
+
+def test_replay_draws_like_direct_drawing():
+    direct = Image.create(200, 120)
+    draw_scene(direct)
+    replayed = Image.create(200, 120)
+    with replayed.record_display_list() as display_list:
+        draw_scene(replayed)
+    assert drawn_pixels(replayed).size == 0
+    replayed.draw_display_list(display_list)
+    assert_same_image(direct, replayed)
+    direct.close()
+    replayed.close()
+
+
+def test_replay_recorded_with_image_transform():
+    direct = Image.create(200, 120)
+    direct.translate(20, 10)
+    direct.rotate(10)
+    draw_scene(direct)
+    replayed = Image.create(200, 120)
+    replayed.translate(20, 10)
+    replayed.rotate(10)
+    with replayed.record_display_list() as display_list:
+        draw_scene(replayed)
+    replayed.reset_transform()
+    replayed.draw_display_list(display_list)
+    assert_same_image(direct, replayed, exact_mask=False)
+    direct.close()
+    replayed.close()
+
+
+def test_replay_with_transform():
+    direct = Image.create(300, 200)
+    direct.translate(60, 40)
+    draw_scene(direct)
+    replayed = Image.create(300, 200)
+    with replayed.record_display_list() as display_list:
+        draw_scene(replayed)
+    replayed.draw_display_list(display_list, QtGui.QTransform.fromTranslate(60, 40))
+    assert_same_image(direct, replayed)
+    direct.close()
+    replayed.close()
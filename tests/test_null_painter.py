@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from PyQt5 import QtCore
+
+from easygraphics import Color
+from easygraphics.image import Image, _NullPainter
+
+
+def draw_shapes(image):
+    image.set_color(Color.BLACK)
+    image.set_fill_color(Color.RED)
+    image.draw_point(5, 5)
+    image.draw_line(0, 0, 50, 50)
+    image.draw_rect(10, 10, 30, 30)
+    image.draw_rounded_rect(10, 10, 30, 30, 5, 5)
+    image.draw_ellipse(50, 50, 20, 10)
+    image.draw_arc(50, 50, 0, 90, 20, 10)
+    image.draw_pie(50, 50, 0, 90, 20, 10)
+    image.draw_chord(50, 50, 0, 90, 20, 10)
+    image.draw_polygon(0, 0, 20, 0, 20, 20)
+    image.draw_poly_line(0, 0, 20, 0, 20, 20)
+    image.draw_text(20, 80, "text")
+    image.draw_rect_text(0, 0, 100, 20, QtCore.Qt.AlignCenter, "text")
+    image.flood_fill(90, 10, Color.BLACK)
+
+
+def test_image_without_background_draws_like_one_with_background():
+    with_mask = Image.create(100, 100)
+    without_mask = Image.create(100, 100, track_background=False)
+    draw_shapes(with_mask)
+    draw_shapes(without_mask)
+    assert without_mask.get_mask_painter().isActive() is False
+    assert np.array_equal(with_mask.to_ndarray(), without_mask.to_ndarray())
+    with_mask.close()
+    without_mask.close()
+
+
+def test_display_list_on_image_without_background():
+    image = Image.create(100, 100, track_background=False)
+    with image.record_display_list() as display_list:
+        image.set_fill_color(Color.RED)
+        image.fill_rect(10, 10, 30, 30)
+    image.draw_display_list(display_list)
+    assert image.get_pixel(20, 20) == Color.RED
+    image.close()
+
+
+def test_null_painter_has_no_catch_all():
+    with pytest.raises(AttributeError):
+        _NullPainter().hasClipping()
@@ -0,0 +1,41 @@
+from PyQt5 import QtGui
+
+from easygraphics import Color
+from easygraphics.image import Image
+
+
+def test_unchanged_settings_are_not_set_again():
+    image = Image.create(50, 50)
+    image.draw_point(1, 1)
+    state = image._painter_state
+    image.draw_point(2, 2)
+    assert image._painter_state is state
+    image.set_color(Color.RED)
+    image.draw_point(3, 3)
+    assert image._painter_state is not state
+    image.close()
+
+
+def test_alternating_colors():
+    image = Image.create(50, 50)
+    image.set_line_width(3)
+    for i, color in enumerate([Color.RED, Color.BLUE, Color.RED, Color.BLUE]):
+        image.set_color(color)
+        image.draw_line(0, 5 + i * 10, 49, 5 + i * 10)
+    assert image.get_pixel(25, 5) == QtGui.QColor(Color.RED)
+    assert image.get_pixel(25, 15) == QtGui.QColor(Color.BLUE)
+    assert image.get_pixel(25, 25) == QtGui.QColor(Color.RED)
+    assert image.get_pixel(25, 35) == QtGui.QColor(Color.BLUE)
+    image.close()
+
+
+def test_pen_changed_in_place_after_get_pen():
+    image = Image.create(50, 50)
+    pen = image.get_pen()
+    pen.setWidth(3)
+    image.draw_line(0, 10, 49, 10)
+    pen.setColor(QtGui.QColor(Color.RED))
+    image.draw_line(0, 30, 49, 30)
+    assert image.get_pixel(25, 10) == QtGui.QColor(Color.BLACK)
+    assert image.get_pixel(25, 30) == QtGui.QColor(Color.RED)
+    image.close()
@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from easygraphics.image import Image
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_ATTACH_IN_CREATOR = """
+from PyQt5 import QtWidgets
+app = QtWidgets.QApplication([])
+from easygraphics.image import Image
+image = Image.create_shared(20, 10)
+attached = Image.create_shared(20, 10, image.get_shared_name())
+attached.put_pixel(1, 1, 0xff0000ff)
+assert image.get_image().pixel(1, 1) == 0xff0000ff
+attached.close()
+image.close()
+"""
+
+
+def test_attach_in_the_creating_process_then_unlink():
+    # the resource tracker is a separate process, which reports the errors on stderr
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", PYTHONPATH=_ROOT)
+    result = subprocess.run([sys.executable, "-c", _ATTACH_IN_CREATOR], env=env, capture_output=True, text=True,
+                            timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert "Traceback" not in result.stderr
+    assert "leaked" not in result.stderr
+
+
+def test_attach_to_a_too_small_block():
+    image = Image.create_shared(10, 10)
+    with pytest.raises(ValueError):
+        Image.create_shared(20, 20, image.get_shared_name())
+    image.close()
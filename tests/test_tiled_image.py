@@ -0,0 +1,30 @@
+import numpy as np
+from PyQt5 import QtCore
+
+from easygraphics import Color
+from easygraphics.image import TiledImage
+
+
+def count_drawn(image, x, y, width, height) -> int:
+    part = image.copy(x, y, width, height)
+    count = int(np.count_nonzero(part.to_ndarray() != 0xffffffff))
+    part.close()
+    return count
+
+
+def test_draw_text_away_from_the_origin():
+    image = TiledImage(1024, 1024, tile_size=256)
+    image.set_color(Color.BLACK)
+    image.draw_text(600, 600, "tiled image")
+    assert count_drawn(image, 550, 550, 300, 100) > 0
+    assert image.get_allocated_tile_count() < 16
+    image.close()
+
+
+def test_draw_rect_text_across_tiles():
+    image = TiledImage(1024, 1024, tile_size=256)
+    image.set_color(Color.BLACK)
+    image.draw_rect_text(200, 480, 200, 60, QtCore.Qt.AlignCenter, "tiled image text")
+    assert count_drawn(image, 200, 480, 200, 60) > 0
+    assert count_drawn(image, 0, 0, 100, 100) == 0
+    image.close()